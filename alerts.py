@@ -1,8 +1,10 @@
 # alerts.py
+import os
 import threading
 import time
 import random
 import logging
+from collections import deque
 from pygame import mixer
 from PyQt6.QtWidgets import (
     QDialog,
@@ -12,25 +14,42 @@ from PyQt6.QtWidgets import (
     QLineEdit,
     QMessageBox,
 )
-from PyQt6.QtCore import Qt
-from config import load_config
-from utils import resource_path, send_email
+from PyQt6.QtCore import Qt, QObject, QTimer
+from config import load_config, config_path
+from challenges import next_challenge
+from events import new_alert_id, record_event
+from notifications import notify
+from tracing import trace
+from utils import resource_path, send_email_async
 
 
 class AlertDialog(QDialog):
     def __init__(
-        self, config, message="Security Alert", play_sound=True, solution=None
+        self,
+        config,
+        message="Security Alert",
+        play_sound=True,
+        solution=None,
+        alert_id=None,
     ):
         super().__init__()
         self.config = config
         self.message = message
         self.play_sound = play_sound
         self.solution = solution
+        self.alert_id = alert_id or new_alert_id()
         self.start_time = time.time()
         self.pressed = False
+        self.visible_traced = False
         self.sound_thread = None
         self.stop_sound_event = threading.Event()
         self.init_ui()
+        self.missed_timer = QTimer(self)
+        self.missed_timer.setSingleShot(True)
+        self.missed_timer.timeout.connect(self.send_email_not_pressed)
+        self.missed_timer.start(
+            int(config.get("email_if_not_pressed_after_minutes", 10) * 60000)
+        )
 
     def init_ui(self):
         self.setWindowTitle("Security Alert")
@@ -38,9 +57,9 @@ class AlertDialog(QDialog):
         self.setWindowFlags(self.windowFlags() | Qt.WindowType.WindowStaysOnTopHint)
 
         layout = QVBoxLayout()
-        label = QLabel(self.message, self)
-        label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        layout.addWidget(label)
+        self.label = QLabel(self.message, self)
+        self.label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(self.label)
 
         if self.solution is not None:
             self.answer_input = QLineEdit(self)
@@ -64,7 +83,7 @@ class AlertDialog(QDialog):
                     QMessageBox.information(
                         self, "Correct!", "Great job! You solved it correctly."
                     )
-                    self.accept()
+                    self.acknowledge()
                 else:
                     QMessageBox.warning(
                         self, "Incorrect", "That's not correct. Try another one."
@@ -75,16 +94,31 @@ class AlertDialog(QDialog):
                     self, "Invalid Input", "Please enter a valid number."
                 )
         else:
-            self.pressed = True
-            self.accept()
+            self.acknowledge()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self.visible_traced:
+            self.visible_traced = True
+            trace(self.alert_id, "dialog_visible")
+
+    def acknowledge(self):
+        self.pressed = True
+        trace(self.alert_id, "acknowledged", time.time() - self.start_time)
+        record_event(
+            "acknowledged",
+            self.alert_id,
+            self.config,
+            value=time.time() - self.start_time,
+        )
+        self.accept()
 
     def generate_new_problem(self):
-        num1 = random.randint(1, 100)
-        num2 = random.randint(1, 100)
-        operation = random.choice(["+", "-"])
-        self.solution = eval(f"{num1} {operation} {num2}")
-        self.message = f"Solve this: {num1} {operation} {num2}"
-        self.init_ui()
+        challenge = next_challenge(self.config)
+        self.solution = challenge.answer
+        self.message = f"Solve this: {challenge.prompt}"
+        self.label.setText(self.message)
+        self.answer_input.clear()
 
     def start_sound(self):
         def play_sound_loop():
@@ -111,18 +145,20 @@ class AlertDialog(QDialog):
                 logging.info(f"Loading sound from: {sound_path}")
                 mixer.music.load(sound_path)
                 mixer.music.play(-1)
-                while not self.stop_sound_event.is_set():
-                    time.sleep(0.1)
+                trace(self.alert_id, "sound_started")
+                self.stop_sound_event.wait()
                 mixer.music.stop()
             except Exception as e:
                 logging.error(f"Sound playback failed: {str(e)}")
-                send_email(
+                send_email_async(
                     self.config, "Sound Error", f"Failed to play sound: {str(e)}"
                 )
 
         if self.play_sound and not self.sound_thread:
             self.stop_sound_event.clear()
-            self.sound_thread = threading.Thread(target=play_sound_loop, daemon=True)
+            self.sound_thread = threading.Thread(
+                target=play_sound_loop, name=f"AlertSound-{self.alert_id}", daemon=True
+            )
             self.sound_thread.start()
 
     def stop_sound(self):
@@ -134,22 +170,127 @@ class AlertDialog(QDialog):
     def send_email_not_pressed(self):
         if not self.pressed:
             elapsed = (time.time() - self.start_time) / 60
+            record_event(
+                "escalated", self.alert_id, self.config, value=elapsed * 60
+            )
+            notify(f"Alert '{self.message}' not acknowledged after {elapsed:.0f} minutes", "escalated")
             message = f"The alert was not acknowledged after {elapsed:.2f} minutes."
-            send_email(self.config, "Alert Not Acknowledged", message)
+            send_email_async(self.config, "Alert Not Acknowledged", message, self.alert_id)
+
+    def done(self, result):
+        # accept() does not go through closeEvent, so stop the sound here too
+        self.missed_timer.stop()
+        self.stop_sound()
+        super().done(result)
 
     def closeEvent(self, event):
         if not self.pressed:
             elapsed = (time.time() - self.start_time) / 60
             message = f"The alert window was closed without acknowledging after {elapsed:.2f} minutes."
-            send_email(
-                self.config, "Alert Window Closed Without Acknowledging", message
+            record_event(
+                "closed_unacknowledged",
+                self.alert_id,
+                self.config,
+                value=elapsed * 60,
+            )
+            send_email_async(
+                self.config,
+                "Alert Window Closed Without Acknowledging",
+                message,
+                self.alert_id,
             )
-        self.stop_sound()
         event.accept()
+        # Go through done() so the sound and missed timer stop and finished frees the slot
+        self.reject()
+
+
+class AlertPresenter(QObject):
+    """
+    Shows alert dialogs modelessly so the Qt event loop keeps running.
+
+    Triggers that match an alert which is already open or waiting are
+    coalesced into it, and at most ``max_concurrent_popups`` dialogs are
+    open at once. Anything beyond that waits in FIFO order.
+    """
+
+    def __init__(self, max_concurrent=None):
+        super().__init__()
+        self.max_concurrent = max_concurrent
+        self.open_alerts = {}
+        self.pending = deque()
+        self.coalesced = {}
+
+    def _limit(self, config):
+        if self.max_concurrent is not None:
+            return max(1, self.max_concurrent)
+        return max(1, int(config.get("max_concurrent_popups", 3)))
+
+    def present(self, config, message, play_sound, solution=None, alert_id=None):
+        alert_id = alert_id or new_alert_id()
+        trace(alert_id, "slot_entry")
+        key = (message, play_sound, solution)
+        existing_id = self._alert_id_for(key)
+        if existing_id is not None:
+            self.coalesced[key] = self.coalesced.get(key, 0) + 1
+            record_event("coalesced", existing_id, config)
+            trace(alert_id, "coalesced", into=existing_id)
+            logging.info(f"Coalesced duplicate popup: {message}")
+            return None
+        record_event("fired", alert_id, config, detail=message)
+        if len(self.open_alerts) >= self._limit(config):
+            trace(alert_id, "queued", position=len(self.pending) + 1)
+            self.pending.append((key, config, alert_id))
+            logging.info(
+                f"Queued popup: {message} ({len(self.pending)} waiting)"
+            )
+            return None
+        return self._open(key, config, alert_id)
+
+    def _alert_id_for(self, key):
+        if key in self.open_alerts:
+            return self.open_alerts[key].alert_id
+        for pending_key, _, alert_id in self.pending:
+            if pending_key == key:
+                return alert_id
+        return None
+
+    def _open(self, key, config, alert_id):
+        message, play_sound, solution = key
+        dialog = AlertDialog(config, message, play_sound, solution, alert_id)
+        trace(alert_id, "dialog_created")
+        dialog.setModal(False)
+        dialog.finished.connect(lambda result, key=key: self._on_finished(key))
+        self.open_alerts[key] = dialog
+        logging.info(f"Showing popup: {message} with sound={play_sound}")
+        dialog.show()
+        dialog.raise_()
+        dialog.activateWindow()
+        record_event("shown", alert_id, config)
+        return dialog
+
+    def _on_finished(self, key):
+        dialog = self.open_alerts.pop(key, None)
+        duplicates = self.coalesced.pop(key, 0)
+        logging.info(
+            f"Popup {key[0]} completed"
+            + (f" ({duplicates} duplicate triggers coalesced)" if duplicates else "")
+        )
+        if dialog is not None:
+            dialog.deleteLater()
+        while self.pending and len(self.open_alerts) < self._limit(self.pending[0][1]):
+            next_key, next_config, next_alert_id = self.pending.popleft()
+            self._open(next_key, next_config, next_alert_id)
+
+
+_presenter = None
+
+
+def get_presenter():
+    global _presenter
+    if _presenter is None:
+        _presenter = AlertPresenter()
+    return _presenter
 
 
-def show_popup(config, message, play_sound):
-    dialog = AlertDialog(config, message, play_sound)
-    logging.info(f"Showing popup: {message} with sound={play_sound}")
-    dialog.exec()
-    logging.info(f"Popup {message} completed")
+def show_popup(config, message, play_sound, solution=None, alert_id=None):
+    return get_presenter().present(config, message, play_sound, solution, alert_id)
@@ -1,5 +1,9 @@
 # Copyright (c) 2025 DJ Kruger
 # Licensed under the MIT License. See LICENSE file in the repository root.
+#
+# The original single-file version of Hoogland, kept for reference. The app
+# is run and built from appmodular.py; this file's update checker and
+# integrity check are superseded by updater.py and integrity.py.
 import threading
 import time
 import json
@@ -29,6 +33,9 @@ from cryptography.fernet import Fernet
 import requests
 import webbrowser
 from argon2 import PasswordHasher
+from challenges import next_challenge
+from logsetup import setup_logging
+from notifications import notify, get_notification_feed
 
 # Generate or load encryption key
 key_path = os.path.join(os.getenv("APPDATA", os.path.expanduser("~/.hoogland")), "Hoogland", "key.bin")
@@ -52,11 +59,7 @@ def resource_path(relative_path):
 log_file = os.path.join(app_data_dir, "app.log")
 config_path = os.path.join(app_data_dir, "config.json")
 
-logging.basicConfig(
-    filename=log_file,
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
+setup_logging(app_data_dir)
 logging.info(f"Logging initialized to {log_file}")
 
 app = Flask(__name__, template_folder=resource_path("templates"))
@@ -79,7 +82,6 @@ def load_user(username):
             return User(username, user["role"])
     return None
 
-notifications = []
 popup_queue = Queue()
 stop_event = threading.Event()
 qt_app = None
@@ -107,9 +109,9 @@ class AlertDialog(QDialog):
         self.setWindowFlags(self.windowFlags() | Qt.WindowType.WindowStaysOnTopHint)
 
         layout = QVBoxLayout()
-        label = QLabel(self.message, self)
-        label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        layout.addWidget(label)
+        self.label = QLabel(self.message, self)
+        self.label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(self.label)
 
         if self.solution is not None:
             self.answer_input = QLineEdit(self)
@@ -142,12 +144,11 @@ class AlertDialog(QDialog):
             self.accept()
 
     def generate_new_problem(self):
-        num1 = random.randint(1, 100)
-        num2 = random.randint(1, 100)
-        operation = random.choice(['+', '-'])
-        self.solution = eval(f"{num1} {operation} {num2}")
-        self.message = f"Solve this: {num1} {operation} {num2}"
-        self.init_ui()
+        challenge = next_challenge(self.config)
+        self.solution = challenge.answer
+        self.message = f"Solve this: {challenge.prompt}"
+        self.label.setText(self.message)
+        self.answer_input.clear()
 
     def start_sound(self):
         def play_sound_loop():
@@ -720,15 +721,11 @@ def trigger_popup():
     play_sound = request.form.get("play_sound", "true").lower() == "true"
 
     if message == "Solve a math problem":
-        # Generate a random math problem
-        num1 = random.randint(1, 100)
-        num2 = random.randint(1, 100)
-        operation = random.choice(['+', '-'])
-        problem = f"{num1} {operation} {num2}"
-        solution = eval(problem)
+        # Take a precomputed problem from the challenge bank
+        challenge = next_challenge(load_config())
 
         # Add the math popup to the queue
-        popup_queue.put({"message": f"Solve this: {problem}", "play_sound": play_sound, "solution": solution})
+        popup_queue.put({"message": f"Solve this: {challenge.prompt}", "play_sound": play_sound, "solution": challenge.answer})
         flash("Math popup triggered successfully.", "success")
     else:
         # Add the regular popup to the queue
@@ -898,7 +895,8 @@ def get_notifications():
         return redirect(url_for('admin'))
 
     try:
-        return render_template("notifications.html", notifications=notifications)
+        notifications = list(reversed(get_notification_feed().recent()))
+        return render_template("notifications.html", notifications=notifications, stream_url=None)
     except Exception as e:
         logging.error(f"Failed to load notifications: {str(e)}")
         flash("Failed to load notifications.", "error")
@@ -938,15 +936,11 @@ def trigger_math_popup():
         flash("Access denied: Admin privileges required.", "error")
         return redirect(url_for('admin'))
 
-    # Generate a random math problem
-    num1 = random.randint(1, 100)
-    num2 = random.randint(1, 100)
-    operation = random.choice(['+', '-'])
-    problem = f"{num1} {operation} {num2}"
-    solution = eval(problem)
+    # Take a precomputed problem from the challenge bank
+    challenge = next_challenge(load_config())
 
     # Add the popup to the queue with the math problem
-    popup_queue.put({"message": f"Solve this: {problem}", "play_sound": False, "solution": solution})
+    popup_queue.put({"message": f"Solve this: {challenge.prompt}", "play_sound": False, "solution": challenge.answer})
     flash("Math popup triggered successfully.", "success")
     return redirect(url_for('admin'))
 
@@ -968,13 +962,9 @@ def validate_math_answer():
             flash("Correct! Great job!", "success")
         else:
             flash("Incorrect. Try another one.", "error")
-            # Generate a new math problem
-            num1 = random.randint(1, 100)
-            num2 = random.randint(1, 100)
-            operation = random.choice(['+', '-'])
-            problem = f"{num1} {operation} {num2}"
-            solution = eval(problem)
-            popup_queue.put({"message": f"Solve this: {problem}", "play_sound": False, "solution": solution})
+            # Hand out a new math problem
+            challenge = next_challenge(load_config())
+            popup_queue.put({"message": f"Solve this: {challenge.prompt}", "play_sound": False, "solution": challenge.answer})
     except ValueError:
         flash("Invalid input. Please enter a valid number.", "error")
 
@@ -1037,7 +1027,7 @@ if __name__ == "__main__":
 
     def show_update_notification(update_message):
         tray.showMessage("Hoogland Update", update_message, QSystemTrayIcon.MessageIcon.Information, 10000)
-        notifications.append(f"{time.strftime('%H:%M:%S')} - Update: {update_message}")
+        notify(f"Update: {update_message}", "update")
 
     logging.info("Starting MainLogicThread")
     main_thread = MainLogicThread()
@@ -1,9 +1,11 @@
-# app.py
+# appmodular.py
 # Copyright (c) 2025 DJ Kruger
 # Licensed under the MIT License.
 import os
 import sys
 import signal
+import subprocess
+import queue
 import threading
 import logging
 from PyQt6.QtWidgets import QApplication, QSystemTrayIcon, QMenu
@@ -12,17 +14,26 @@ from PyQt6.QtCore import Qt
 from waitress import serve
 from pygame import mixer
 from flask import Flask
-from config import load_config, save_config
+from config import load_config, save_config, app_data_dir
+from logsetup import setup_logging, configure_logging, shutdown_logging
+from logindex import get_log_index
 from auth import init_login_manager
 from threads import MainLogicThread, SoundThread, UpdateCheckerThread, ManualPopupThread
-from alerts import show_popup, AlertDialog
+from alerts import show_popup
 from routes import register_routes
+from events import get_event_store
+from reports import get_shift_reporter
+from rollups import get_rollups
+from notifications import notify, start_notification_stream
+from timing import install_request_timing
+from threadwatch import Watchdog
+from memdiag import get_memory_monitor
+from integrity import get_integrity_verifier
 from utils import resource_path, cleanup
 
 # Initialize logging
-app_data_dir = os.path.join(os.getenv("APPDATA", os.path.expanduser("~/.hoogland")), "Hoogland")
-log_file = os.path.join(app_data_dir, "app.log")
-logging.basicConfig(filename=log_file, level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+setup_logging(app_data_dir)
+get_log_index()
 logging.info("Application started")
 
 # Initialize Flask app
@@ -33,7 +44,8 @@ app.secret_key = os.urandom(24).hex()
 init_login_manager(app)
 
 # Register routes
-register_routes(app)
+popup_queue = queue.Queue()
+register_routes(app, popup_queue)
 
 # Initialize pygame mixer
 mixer.init()
@@ -44,11 +56,13 @@ stop_event = threading.Event()
 
 def run_waitress():
     logging.info("Starting Waitress server on 0.0.0.0:5000")
-    serve(app, host="0.0.0.0", port=5000, threads=2)
+    install_request_timing(app, int(load_config().get("slow_request_ms", 500)))
+    serve(app, host="0.0.0.0", port=5000, threads=6)
 
 if __name__ == "__main__":
     # Load configuration
     config = load_config()
+    configure_logging(config)
     if not config.get("users"):
         import webbrowser
 
@@ -72,36 +86,89 @@ if __name__ == "__main__":
     quit_action.triggered.connect(lambda: cleanup(qt_app=qt_app, stop_event=stop_event))
     tray.setContextMenu(tray_menu)
 
-    # Start threads
-    main_thread = MainLogicThread(stop_event)
-    main_thread.trigger_popup.connect(
-        lambda message, play_sound: show_popup(config, message, play_sound)
-    )
-    main_thread.start()
-
-    manual_thread = ManualPopupThread(stop_event)
-    manual_thread.trigger_popup.connect(
-        lambda message, play_sound: show_popup(config, message, play_sound)
-    )
-    manual_thread.start()
-
-    sound_thread = SoundThread(config, stop_event)
-    sound_thread.start()
-
-    update_thread = UpdateCheckerThread(config, stop_event)
-    update_thread.update_available.connect(
-        lambda update_message: tray.showMessage(
-            "Hoogland Update",
-            update_message,
-            QSystemTrayIcon.MessageIcon.Information,
-            10000,
+    # Open the alert event log before any popup can record into it
+    get_event_store()
+    get_shift_reporter().start()
+    get_rollups()
+    if config.get("memory_diagnostics_enabled", False):
+        get_memory_monitor(config).start()
+    if config.get("integrity_check_enabled", True):
+        get_integrity_verifier(config).start()
+
+    # Start threads under the watchdog, which rebuilds a worker from its
+    # factory if it stops sending heartbeats
+    watchdog = None
+    if config.get("watchdog_enabled", True):
+        watchdog = Watchdog(config, systemd_notify=config.get("watchdog_systemd_notify", False))
+    deadline = int(config.get("watchdog_deadline_seconds", 180))
+
+    def make_main_thread():
+        thread = MainLogicThread(stop_event)
+        thread.trigger_popup.connect(
+            lambda message, play_sound, solution, alert_id: show_popup(
+                config, message, play_sound, solution, alert_id
+            )
         )
-    )
-    update_thread.start()
+        return thread
+
+    def make_manual_thread():
+        thread = ManualPopupThread(stop_event, popup_queue)
+        thread.trigger_popup.connect(
+            lambda message, play_sound, solution, alert_id: show_popup(
+                config, message, play_sound, solution, alert_id
+            )
+        )
+        return thread
+
+    restart_command = []
+
+    def restart_after_update(command):
+        # Runs on the GUI thread; the new process is started once this one has wound down
+        logging.info("Shutting down to restart into the update")
+        restart_command[:] = command
+        stop_event.set()
+        if watchdog is not None:
+            watchdog.stop()
+        qt_app.quit()
+
+    def make_update_thread():
+        thread = UpdateCheckerThread(config, stop_event)
+        thread.update_available.connect(
+            lambda update_message: tray.showMessage(
+                "Hoogland Update",
+                update_message,
+                QSystemTrayIcon.MessageIcon.Information,
+                10000,
+            )
+        )
+        thread.update_available.connect(
+            lambda update_message: notify(f"Update: {update_message}", "update")
+        )
+        thread.restart_requested.connect(restart_after_update)
+        return thread
+
+    factories = {
+        "MainLogicThread": (make_main_thread, deadline),
+        "ManualPopupThread": (make_manual_thread, deadline),
+        "SoundThread": (lambda: SoundThread(config, stop_event), deadline),
+        # Applying an update can run pip install, so allow it much longer
+        "UpdateCheckerThread": (make_update_thread, max(deadline, 900)),
+    }
+    workers = []
+    for name, (factory, worker_deadline) in factories.items():
+        if watchdog is not None:
+            watchdog.watch(name, factory, worker_deadline)
+        else:
+            workers.append(factory())
+            workers[-1].start()
 
     # Start Waitress server
     waitress_thread = threading.Thread(target=run_waitress, daemon=True)
     waitress_thread.start()
+    if config.get("sse_port"):
+        start_notification_stream(
+            app.secret_key, port=int(config["sse_port"]), max_streams=int(config.get("sse_max_streams", 20))
+        )
 
     # Signal handlers
     signal.signal(signal.SIGINT, lambda s, f: cleanup(qt_app=qt_app, stop_event=stop_event))
@@ -113,3 +180,14 @@ if __name__ == "__main__":
     except Exception as e:
         logging.error(f"Qt app crashed: {str(e)}")
         cleanup(qt_app=qt_app, stop_event=stop_event)
+
+    if restart_command:
+        running = list(workers)
+        if watchdog is not None:
+            running += [entry.worker for entry in watchdog.watched.values()] + watchdog.retired
+        for worker in running:
+            worker.wait(20000)
+        get_event_store().close()
+        logging.info(f"Starting {restart_command[0]}")
+        subprocess.Popen(restart_command)
+        shutdown_logging()
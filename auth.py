@@ -3,8 +3,22 @@ from flask_login import LoginManager, UserMixin, login_user, logout_user, curren
 from argon2 import PasswordHasher
 import re
 from config import load_config, save_config, cipher
+from timing import phase
 
-ph = PasswordHasher()
+
+class TimedPasswordHasher(PasswordHasher):
+    """Argon2 hasher that reports its time to the request timing middleware."""
+
+    def hash(self, password, **kwargs):
+        with phase("hashing"):
+            return super().hash(password, **kwargs)
+
+    def verify(self, hash, password):
+        with phase("hashing"):
+            return super().verify(hash, password)
+
+
+ph = TimedPasswordHasher()
 
 
 class User(UserMixin):
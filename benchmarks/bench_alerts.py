@@ -0,0 +1,151 @@
+# benchmarks/bench_alerts.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+"""
+Offscreen latency benchmark for the alert popup UI.
+
+Drives alerts.AlertDialog and alerts.show_popup without a display and with
+the pygame mixer replaced by a stub, then reports p50/p99 timings and the
+memory retained per popup.
+
+Usage:
+    python benchmarks/bench_alerts.py --iterations 200 [--json results.json]
+"""
+import os
+import sys
+import gc
+import time
+import argparse
+import tempfile
+import threading
+import tracemalloc
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+# Keep config.json and key.bin out of the real user profile; APPDATA is always set on Windows
+os.environ["APPDATA"] = tempfile.mkdtemp(prefix="hoogland-bench-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt6.QtWidgets import QApplication  # noqa: E402
+
+import alerts  # noqa: E402
+from common import summarize, report  # noqa: E402
+from config import load_config  # noqa: E402
+
+
+class StubMusic:
+    def __init__(self):
+        self.started = threading.Event()
+        self.started_at = None
+
+    def load(self, path):
+        pass
+
+    def play(self, loops=0):
+        self.started_at = time.perf_counter()
+        self.started.set()
+
+    def stop(self):
+        pass
+
+
+class StubMixer:
+    def __init__(self):
+        self.music = StubMusic()
+
+
+def bench_dialog(qt_app, config, iterations, play_sound):
+    construct_to_show = []
+    sound_start = []
+    click_to_accept = []
+    for _ in range(iterations):
+        stub = StubMixer()
+        alerts.mixer = stub
+
+        started = time.perf_counter()
+        dialog = alerts.AlertDialog(config, "Benchmark Alert", play_sound)
+        dialog.show()
+        qt_app.processEvents()
+        construct_to_show.append(time.perf_counter() - started)
+
+        if play_sound:
+            stub.music.started.wait(timeout=5)
+            if stub.music.started_at is not None:
+                sound_start.append(stub.music.started_at - started)
+
+        finished = []
+        dialog.finished.connect(lambda result: finished.append(time.perf_counter()))
+        button = dialog.findChild(alerts.QPushButton)
+        clicked = time.perf_counter()
+        button.click()
+        qt_app.processEvents()
+        if finished:
+            click_to_accept.append(finished[0] - clicked)
+        dialog.deleteLater()
+        qt_app.processEvents()
+
+    results = {
+        "construct_to_show": summarize(construct_to_show),
+        "click_to_accept": summarize(click_to_accept),
+    }
+    if play_sound:
+        results["construct_to_sound_start"] = summarize(sound_start)
+    return results
+
+
+def bench_show_popup(qt_app, config, iterations):
+    present_to_show = []
+    for i in range(iterations):
+        alerts.mixer = StubMixer()
+        started = time.perf_counter()
+        dialog = alerts.show_popup(config, f"Benchmark Popup {i}", False)
+        qt_app.processEvents()
+        present_to_show.append(time.perf_counter() - started)
+        if dialog is not None:
+            dialog.findChild(alerts.QPushButton).click()
+        qt_app.processEvents()
+    return {"present_to_show": summarize(present_to_show)}
+
+
+def bench_memory(qt_app, config, iterations):
+    alerts.mixer = StubMixer()
+    # Warm up caches so one-off allocations do not count as growth
+    bench_show_popup(qt_app, config, 5)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    bench_show_popup(qt_app, config, iterations)
+    qt_app.processEvents()
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    growth = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return {
+        "retained_bytes": growth,
+        "retained_bytes_per_popup": round(growth / max(1, iterations), 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark alert popup latency offscreen.")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    qt_app = QApplication.instance() or QApplication(sys.argv)
+    config = load_config()
+    config["use_custom_sounds"] = False
+    config["max_concurrent_popups"] = 1
+
+    results = {
+        "iterations": args.iterations,
+        "dialog_silent": bench_dialog(qt_app, config, args.iterations, False),
+        "dialog_with_sound": bench_dialog(qt_app, config, args.iterations, True),
+        "show_popup": bench_show_popup(qt_app, config, args.iterations),
+        "memory": bench_memory(qt_app, config, args.iterations),
+    }
+
+    return report("alerts", results, args.json)
+
+
+if __name__ == "__main__":
+    main()
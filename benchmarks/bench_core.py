@@ -0,0 +1,161 @@
+# benchmarks/bench_core.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+"""
+Benchmarks for the config, auth, web and scheduling hot paths.
+
+Runs against a throwaway data directory with a large generated config, so
+it needs no display, network or mail server.
+
+Usage:
+    python benchmarks/bench_core.py [--iterations 200] [--users 500] [--sounds 200] [--json core.json]
+    python benchmarks/compare.py baseline.json core.json
+"""
+import os
+import sys
+import random
+import logging
+import argparse
+import datetime
+import tempfile
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+# Keep config.json and key.bin out of the real user profile; APPDATA is always set on Windows
+os.environ["APPDATA"] = tempfile.mkdtemp(prefix="hoogland-bench-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+
+from common import REPO_DIR, measure, report  # noqa: E402
+from config import load_config, save_config  # noqa: E402
+from auth import init_login_manager, validate_password, ph  # noqa: E402
+from routes import register_routes  # noqa: E402
+from reports import shift_window  # noqa: E402
+from threads import schedule_window  # noqa: E402
+
+ADMIN_PASSWORD = "Bench-Passw0rd!"
+
+
+def build_config(users, sounds):
+    config = load_config()
+    # One real hash reused for every user; hashing hundreds would dominate setup
+    password_hash = ph.hash(ADMIN_PASSWORD)
+    config["users"] = [
+        {
+            "username": "admin" if i == 0 else f"user{i}",
+            "password_hash": password_hash,
+            "role": "admin" if i % 50 == 0 else "user",
+            "email": f"user{i}@example.com",
+        }
+        for i in range(users)
+    ]
+    config["custom_sounds"] = [
+        {"filename": f"sound_{i}.mp3", "active": i % 3 != 0, "duration": 4.5} for i in range(sounds)
+    ]
+    config["use_custom_sounds"] = True
+    save_config(config)
+    return config
+
+
+def bench_config(config, iterations):
+    return {
+        "load_config": measure(load_config, iterations),
+        "save_config": measure(lambda: save_config(config), iterations),
+    }
+
+
+def bench_auth(config, iterations):
+    policy = config["password_policy"]
+    candidates = ["short", "alllowercase123!", "NoSymbols123", ADMIN_PASSWORD, "x" * 64 + "A1!"]
+    password_hash = config["users"][0]["password_hash"]
+    # Argon2 is deliberately slow; a handful of samples is enough
+    argon_iterations = max(5, iterations // 20)
+    return {
+        "validate_password": measure(lambda: [validate_password(p, policy) for p in candidates], iterations),
+        "argon2_verify": measure(lambda: ph.verify(password_hash, ADMIN_PASSWORD), argon_iterations, warmup=1),
+        "argon2_hash": measure(lambda: ph.hash(ADMIN_PASSWORD), argon_iterations, warmup=1),
+    }
+
+
+def make_app():
+    app = Flask(
+        "hoogland_bench",
+        template_folder=os.path.join(REPO_DIR, "templates"),
+        static_folder=os.path.join(REPO_DIR, "static"),
+    )
+    app.secret_key = "benchmark"
+    init_login_manager(app)
+    register_routes(app)
+    return app
+
+
+def bench_routes(iterations):
+    app = make_app()
+    anonymous = app.test_client()
+    client = app.test_client()
+    client.post("/login", data={"username": "admin", "password": ADMIN_PASSWORD})
+
+    def get(path):
+        response = client.get(path)
+        assert response.status_code == 200, f"{path} returned {response.status_code}"
+        response.close()
+
+    def login():
+        response = anonymous.post("/login", data={"username": "admin", "password": ADMIN_PASSWORD})
+        response.close()
+        anonymous.get("/logout").close()
+
+    return {
+        "get_admin": measure(lambda: get("/admin"), iterations),
+        "get_manage_users": measure(lambda: get("/manage_users"), iterations),
+        "post_login": measure(login, max(5, iterations // 20), warmup=1),
+    }
+
+
+def bench_schedule(iterations):
+    rng = random.Random(42)
+    day = datetime.datetime(2025, 1, 15)
+    minutes = [day + datetime.timedelta(minutes=m) for m in range(24 * 60)]
+    configs = {
+        "same_day": {"start_time": "08:00", "end_time": "17:00"},
+        "overnight": {"start_time": "18:00", "end_time": "06:00"},
+    }
+
+    def sweep(config):
+        # Every decision MainLogicThread could make over one day, one per minute
+        for now in minutes:
+            start_dt, end_dt = schedule_window(config, now)
+            if start_dt <= now < end_dt:
+                rng.uniform(0, (end_dt - now).total_seconds())
+
+    results = {}
+    for name, config in configs.items():
+        results[f"schedule_window_day_{name}"] = measure(lambda: sweep(config), max(10, iterations // 10))
+        results[f"shift_window_day_{name}"] = measure(
+            lambda: [shift_window(config, now) for now in minutes], max(10, iterations // 10)
+        )
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark config, auth, route and scheduling hot paths.")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--sounds", type=int, default=200)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    config = build_config(args.users, args.sounds)
+    results = {
+        "parameters": {"iterations": args.iterations, "users": args.users, "sounds": args.sounds},
+        "config": bench_config(config, args.iterations),
+        "auth": bench_auth(config, args.iterations),
+        "routes": bench_routes(args.iterations),
+        "schedule": bench_schedule(args.iterations),
+    }
+    return report("core", results, args.json)
+
+
+if __name__ == "__main__":
+    main()
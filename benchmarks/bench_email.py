@@ -0,0 +1,163 @@
+# benchmarks/bench_email.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+"""
+Email throughput benchmark against the local SMTP sink.
+
+Sends the same volume of mail through each delivery mode and reports
+messages per second and submit-to-delivered latency:
+
+    connect_per_message  utils.send_email, one connection + STARTTLS + login each
+    reused_connection    one utils.smtp_session, messages sent one at a time
+    batched              utils.send_batch in groups of --batch-size
+    async_queue          utils.send_email_async, drained by the background worker
+
+Usage:
+    python benchmarks/bench_email.py [--messages 200] [--latency-ms 2] [--fail-rate 0] [--drop-on-failure] [--json email.json]
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from email.mime.text import MIMEText
+from email.parser import HeaderParser
+
+# Keep config.json and key.bin out of the real user profile; APPDATA is always set on Windows
+os.environ["APPDATA"] = tempfile.mkdtemp(prefix="hoogland-bench-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils  # noqa: E402
+from common import summarize, report  # noqa: E402
+from config import load_config, cipher  # noqa: E402
+from smtp_sink import SMTPSink  # noqa: E402
+
+
+def sink_config(sink):
+    config = load_config()
+    config.update({
+        "smtp_server": sink.host,
+        "smtp_port": sink.port,
+        "sender_email": "hoogland@example.com",
+        "recipient_email": "ops@example.com",
+        "password": cipher.encrypt(b"benchmark").decode(),
+    })
+    return config
+
+
+def mode_connect_per_message(config, subjects):
+    submitted = {}
+    for subject in subjects:
+        submitted[subject] = time.perf_counter()
+        utils.send_email(config, subject, "Benchmark message body")
+    return submitted
+
+
+def mode_reused_connection(config, subjects):
+    submitted = {}
+    with utils.smtp_session(config) as server:
+        for subject in subjects:
+            submitted[subject] = time.perf_counter()
+            msg = MIMEText("Benchmark message body")
+            msg["Subject"] = subject
+            msg["From"] = config["sender_email"]
+            msg["To"] = config["recipient_email"]
+            try:
+                server.sendmail(config["sender_email"], config["recipient_email"], msg.as_string())
+            except Exception:
+                pass
+    return submitted
+
+
+def make_batched(batch_size):
+    def mode_batched(config, subjects):
+        submitted = {}
+        for start in range(0, len(subjects), batch_size):
+            group = subjects[start:start + batch_size]
+            now = time.perf_counter()
+            submitted.update((subject, now) for subject in group)
+            utils.send_batch(config, [(subject, "Benchmark message body") for subject in group])
+        return submitted
+    return mode_batched
+
+
+def mode_async_queue(config, subjects):
+    submitted = {}
+    enqueue = []
+    for subject in subjects:
+        submitted[subject] = started = time.perf_counter()
+        utils.send_email_async(config, subject, "Benchmark message body")
+        enqueue.append(time.perf_counter() - started)
+    utils._email_queue.join()
+    mode_async_queue.enqueue = summarize(enqueue)
+    return submitted
+
+
+def run_mode(name, mode, sink, config, count):
+    sink.messages.clear()
+    connections_before = sink.connections
+    subjects = [f"bench {name} {i}" for i in range(count)]
+    # The sink stamps messages with time.time(); convert to perf_counter
+    offset = time.perf_counter() - time.time()
+    started = time.perf_counter()
+    submitted = mode(config, subjects)
+    elapsed = time.perf_counter() - started
+
+    parser = HeaderParser()
+    latencies = []
+    for message in list(sink.messages):
+        subject = parser.parsestr(message.data).get("Subject")
+        if subject in submitted:
+            latencies.append(message.received_at + offset - submitted[subject])
+    result = {
+        "messages": count,
+        "delivered": len(latencies),
+        "connections": sink.connections - connections_before,
+        "elapsed_s": round(elapsed, 3),
+        "messages_per_sec": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency": summarize(latencies),
+    }
+    if hasattr(mode, "enqueue"):
+        result["enqueue_latency"] = mode.enqueue
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark email delivery modes against a local SMTP sink.")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="Sink delay before answering DATA")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Chance the sink rejects a DATA command")
+    parser.add_argument("--drop-on-failure", action="store_true",
+                        help="Drop the connection instead of replying 451 on an injected failure")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.CRITICAL)
+    modes = {
+        "connect_per_message": mode_connect_per_message,
+        "reused_connection": mode_reused_connection,
+        "batched": make_batched(args.batch_size),
+        "async_queue": mode_async_queue,
+    }
+    # utils.smtp_session always negotiates STARTTLS, so the sink always offers it
+    with SMTPSink(latency=args.latency_ms / 1000, fail_rate=args.fail_rate, drop_on_failure=args.drop_on_failure,
+                  seed=1) as sink:
+        config = sink_config(sink)
+        results = {
+            "parameters": {
+                "messages": args.messages,
+                "batch_size": args.batch_size,
+                "latency_ms": args.latency_ms,
+                "fail_rate": args.fail_rate,
+                "drop_on_failure": args.drop_on_failure,
+            },
+        }
+        for name, mode in modes.items():
+            results[name] = run_mode(name, mode, sink, config, args.messages)
+    return report("email", results, args.json)
+
+
+if __name__ == "__main__":
+    main()
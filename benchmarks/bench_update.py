@@ -0,0 +1,279 @@
+# benchmarks/bench_update.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+"""
+End-to-end update pipeline harness against the local update server.
+
+Each scenario publishes a release on an UpdateServer, seeds a temporary
+app_dir with the old files and drives UpdateCheckerThread through
+check -> download -> verify -> apply without starting the thread. It
+reports wall time, bytes and requests served, and what the app_dir looked
+like afterwards: "new" (every file updated), "old" (nothing touched) or
+"mixed" (a partial update that left old and new files side by side).
+
+The release never includes requirements.txt, which would make apply_update
+run pip. The restart it requests for changed modules goes to a signal
+nothing is connected to here, so the harness keeps running.
+
+The executable scenarios stage a frozen build the way apply_update does
+for PyInstaller installs: from a binary delta keyed by the installed
+build's hash, from the full build, or from a corrupted delta that must
+fall back to the full build.
+
+Usage:
+    python benchmarks/bench_update.py [--iterations 5] [--large-mb 8] [--json update.json]
+"""
+import os
+import sys
+import time
+import random
+import hashlib
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+# Keep config.json and key.bin out of the real user profile; APPDATA is always set on Windows
+os.environ["APPDATA"] = tempfile.mkdtemp(prefix="hoogland-bench-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import summarize, report  # noqa: E402
+from config import load_config, cipher  # noqa: E402
+from delta import make_delta  # noqa: E402
+from threads import UpdateCheckerThread  # noqa: E402
+from updater import fetch_manifest, install_staged, stage_executable  # noqa: E402
+from smtp_sink import SMTPSink  # noqa: E402
+from update_server import UpdateServer  # noqa: E402
+
+OLD_VERSION = "1.0.0"
+NEW_VERSION = "1.0.1"
+
+
+def make_release(large_mb):
+    """Return (old, new) file sets: a few small modules and one large binary."""
+    old, new = {}, {}
+    for name in ("alerts.py", "threads.py", "routes.py", "utils.py"):
+        body = f"# {name}\n".encode() + os.urandom(24 * 1024).hex().encode()
+        old[name] = body
+        new[name] = body.replace(b"# ", b"# updated ", 1)
+    blob = os.urandom(large_mb * 1024 * 1024)
+    old["resources.bin"] = blob
+    new["resources.bin"] = blob[:-4096] + os.urandom(4096)
+    return old, new
+
+
+SCENARIOS = {
+    "clean": {},
+    "latency_50ms": {"latency": 0.05},
+    "partial_failure": {"fail_rate": 0.3, "seed": 7},
+    "truncated_body": {"fail_rate": 0.3, "failure_mode": "truncate", "seed": 7},
+    "hash_mismatch": {"corrupt": ("routes.py",)},
+}
+
+
+EXECUTABLE_SCENARIOS = {
+    "executable_full": {"delta": False},
+    "executable_delta": {"delta": True},
+    "executable_delta_corrupt": {"delta": True, "corrupt_delta": True},
+}
+
+
+def make_builds(size_mb):
+    """Return (installed, latest) executables: the latest has scattered small edits."""
+    rng = random.Random(3)
+    installed = os.urandom(size_mb * 1024 * 1024)
+    latest = bytearray(installed)
+    for _ in range(40):
+        position = rng.randrange(len(latest))
+        latest[position:position + rng.randrange(0, 512)] = os.urandom(rng.randrange(0, 2048))
+    return installed, bytes(latest)
+
+
+def run_executable_once(server, installed, latest):
+    app_dir = tempfile.mkdtemp(prefix="hoogland-app-")
+    try:
+        exe_path = os.path.join(app_dir, "app.exe")
+        with open(exe_path, "wb") as f:
+            f.write(installed)
+        server.reset_stats()
+        error = None
+        started = time.perf_counter()
+        try:
+            update_data = fetch_manifest(server.manifest_url)
+            name, staged_path = stage_executable(
+                update_data, app_dir, exe_path, hashlib.sha256(installed).hexdigest()
+            )
+            install_staged({name: staged_path}, app_dir, update_data["version"])
+        except Exception as e:
+            error = type(e).__name__
+        elapsed = time.perf_counter() - started
+        with open(exe_path, "rb") as f:
+            content = f.read()
+        return {
+            "total_s": elapsed,
+            "server": server.stats(),
+            "state": "new" if content == latest else "old" if content == installed else "corrupt",
+            "error": error,
+        }
+    finally:
+        shutil.rmtree(app_dir, ignore_errors=True)
+
+
+def run_executable_scenario(options, installed, latest, iterations):
+    delta = make_delta(installed, latest)
+    with UpdateServer(version=NEW_VERSION) as server:
+        deltas = {hashlib.sha256(installed).hexdigest(): delta} if options["delta"] else {}
+        server.publish_executable("app.exe", latest, deltas)
+        if options.get("corrupt_delta"):
+            server.corrupt = {name for name in server.assets if name.endswith(".delta")}
+        runs = [run_executable_once(server, installed, latest) for _ in range(iterations)]
+    states = {}
+    for run in runs:
+        states[run["state"]] = states.get(run["state"], 0) + 1
+    total_bytes = sum(run["server"]["bytes_sent"] for run in runs)
+    return {
+        "total": summarize([run["total_s"] for run in runs]),
+        "bytes_per_update": total_bytes // len(runs),
+        "requests_per_update": sum(run["server"]["requests"] for run in runs) / len(runs),
+        "delta_bytes": len(delta) if options["delta"] else 0,
+        "final_states": states,
+        "errors": [run["error"] for run in runs if run["error"]],
+    }
+
+
+def app_dir_state(app_dir, old, new):
+    states = set()
+    for name in new:
+        with open(os.path.join(app_dir, name), "rb") as f:
+            content = f.read()
+        states.add("new" if content == new[name] else "old" if content == old[name] else "corrupt")
+    if states == {"new"}:
+        return "new"
+    if states == {"old"}:
+        return "old"
+    return "corrupt" if "corrupt" in states else "mixed"
+
+
+def run_once(server, sink, old, new):
+    app_dir = tempfile.mkdtemp(prefix="hoogland-app-")
+    try:
+        for name, content in old.items():
+            with open(os.path.join(app_dir, name), "wb") as f:
+                f.write(content)
+        config = load_config()
+        config.update({
+            "update_url": server.manifest_url,
+            "smtp_server": sink.host,
+            "smtp_port": sink.port,
+            "sender_email": "hoogland@example.com",
+            "recipient_email": "ops@example.com",
+            "password": cipher.encrypt(b"benchmark").decode(),
+        })
+        updater = UpdateCheckerThread(config, threading.Event())
+        updater.current_version = OLD_VERSION
+        updater.app_dir = app_dir
+
+        server.reset_stats()
+        emails_before = len(sink.messages)
+        error = None
+        started = time.perf_counter()
+        update_data = updater.check_for_update()
+        checked = time.perf_counter()
+        try:
+            if update_data and updater.apply_update(update_data) is False:
+                error = "aborted"
+        except Exception as e:
+            error = type(e).__name__
+        finished = time.perf_counter()
+
+        # Second check with nothing new published: what revalidation costs
+        server_stats = server.stats()
+        server.reset_stats()
+        recheck_started = time.perf_counter()
+        updater.check_for_update()
+        recheck = time.perf_counter() - recheck_started
+        recheck_stats = server.stats()
+
+        return {
+            "check_s": checked - started,
+            "apply_s": finished - checked,
+            "total_s": finished - started,
+            "recheck_s": recheck,
+            "server": server_stats,
+            "recheck_bytes": recheck_stats["bytes_sent"],
+            "recheck_not_modified": recheck_stats["not_modified"],
+            "state": app_dir_state(app_dir, old, new),
+            "error": error,
+            "emails": len(sink.messages) - emails_before,
+        }
+    finally:
+        shutil.rmtree(app_dir, ignore_errors=True)
+
+
+def run_scenario(options, sink, old, new, iterations):
+    runs = []
+    with UpdateServer(version=NEW_VERSION, files=new, **options) as server:
+        for _ in range(iterations):
+            runs.append(run_once(server, sink, old, new))
+    states = {}
+    errors = {}
+    for run in runs:
+        states[run["state"]] = states.get(run["state"], 0) + 1
+        if run["error"]:
+            errors[run["error"]] = errors.get(run["error"], 0) + 1
+    total_bytes = sum(run["server"]["bytes_sent"] for run in runs)
+    total_time = sum(run["total_s"] for run in runs)
+    return {
+        "check": summarize([run["check_s"] for run in runs]),
+        "apply": summarize([run["apply_s"] for run in runs]),
+        "total": summarize([run["total_s"] for run in runs]),
+        "recheck": summarize([run["recheck_s"] for run in runs]),
+        "bytes_per_update": total_bytes // len(runs),
+        "requests_per_update": sum(run["server"]["requests"] for run in runs) / len(runs),
+        "megabytes_per_sec": round(total_bytes / total_time / 1e6, 2) if total_time else 0.0,
+        "recheck_bytes": runs[-1]["recheck_bytes"],
+        "recheck_not_modified": runs[-1]["recheck_not_modified"],
+        "injected_failures": sum(run["server"]["failures"] for run in runs),
+        "final_states": states,
+        "errors": errors,
+        "alert_emails": sum(run["emails"] for run in runs),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the update pipeline end to end against a local server.")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--large-mb", type=int, default=8, help="Size of the large binary in the release")
+    parser.add_argument("--executable-mb", type=int, default=16, help="Size of the frozen build")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS) + sorted(EXECUTABLE_SCENARIOS),
+                        help="Only run these scenarios (repeatable)")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.CRITICAL)
+    old, new = make_release(args.large_mb)
+    results = {
+        "parameters": {
+            "iterations": args.iterations,
+            "files": len(new),
+            "release_bytes": sum(len(content) for content in new.values()),
+        },
+    }
+    selected = args.scenario or list(SCENARIOS) + list(EXECUTABLE_SCENARIOS)
+    with SMTPSink() as sink:
+        for name in selected:
+            if name in SCENARIOS:
+                results[name] = run_scenario(SCENARIOS[name], sink, old, new, args.iterations)
+    if any(name in EXECUTABLE_SCENARIOS for name in selected):
+        installed, latest = make_builds(args.executable_mb)
+        results["parameters"]["executable_bytes"] = len(latest)
+        for name in selected:
+            if name in EXECUTABLE_SCENARIOS:
+                results[name] = run_executable_scenario(EXECUTABLE_SCENARIOS[name], installed, latest, args.iterations)
+    return report("update", results, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/common.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+"""Helpers shared by the benchmark scripts: timing, percentiles and result files."""
+import os
+import json
+import time
+import platform
+import datetime
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3) if samples else 0.0,
+    }
+
+
+def measure(fn, iterations, warmup=3):
+    """Call ``fn`` ``warmup`` times untimed, then ``iterations`` times; return the summary."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def report(name, results, path=None):
+    """Print ``results`` with run metadata and optionally write them to ``path``."""
+    document = {"benchmark": name, "environment": environment(), "results": results}
+    print(json.dumps(document, indent=4))
+    if path:
+        with open(path, "w") as f:
+            json.dump(document, f, indent=4)
+    return document
+
+
+def load_results(path):
+    with open(path) as f:
+        document = json.load(f)
+    # Files written before report() existed hold the bare results
+    return document["results"] if "benchmark" in document else document
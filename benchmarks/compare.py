@@ -0,0 +1,70 @@
+# benchmarks/compare.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+"""
+Compare two benchmark result files and flag regressions.
+
+Latencies (keys ending in ``_ms``) regress when they grow; rates (keys
+ending in ``_per_sec``) regress when they shrink. Exits with status 1 if
+any metric moved the wrong way by more than ``--threshold`` percent.
+
+Usage:
+    python benchmarks/compare.py baseline.json current.json [--threshold 10] [--metric p50_ms]
+"""
+import sys
+import argparse
+
+from common import load_results
+
+
+def flatten(results, prefix=""):
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from flatten(value, path)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield path, value
+
+
+def compare(baseline, current, threshold=10.0, metrics=None):
+    """Return rows of (name, before, after, change_pct, regressed) for metrics in both files."""
+    before = dict(flatten(baseline))
+    rows = []
+    for name, after in flatten(current):
+        metric = name.rsplit(".", 1)[-1]
+        if name not in before or not (metric.endswith("_ms") or metric.endswith("_per_sec")):
+            continue
+        if metrics and metric not in metrics:
+            continue
+        old = before[name]
+        if old == 0:
+            continue
+        change = (after - old) / old * 100
+        worse = change if metric.endswith("_ms") else -change
+        rows.append((name, old, after, round(change, 1), worse > threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark JSON files.")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed slowdown in percent")
+    parser.add_argument(
+        "--metric", action="append", help="Only compare these metric names, e.g. p50_ms (repeatable)"
+    )
+    args = parser.parse_args(argv)
+
+    rows = compare(load_results(args.baseline), load_results(args.current), args.threshold, args.metric)
+    width = max((len(row[0]) for row in rows), default=10)
+    regressions = 0
+    for name, old, new, change, regressed in rows:
+        regressions += regressed
+        flag = "REGRESSION" if regressed else ""
+        print(f"{name:<{width}}  {old:>12.3f}  {new:>12.3f}  {change:>+7.1f}%  {flag}")
+    print(f"\n{len(rows)} metrics compared, {regressions} regressed beyond {args.threshold}%")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
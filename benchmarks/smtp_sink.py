@@ -0,0 +1,279 @@
+# benchmarks/smtp_sink.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+"""
+Local SMTP server that accepts and keeps every message, for tests and benchmarks.
+
+Speaks enough SMTP for smtplib: EHLO/HELO, optional STARTTLS with a
+throwaway self-signed certificate, AUTH PLAIN/LOGIN (any credentials),
+MAIL, RCPT, DATA, RSET, NOOP and QUIT. Latency and failures can be
+injected per command.
+
+Usage:
+    python benchmarks/smtp_sink.py --port 1025 [--starttls] [--latency-ms 20] [--fail-rate 0.1]
+
+or from Python:
+    with SMTPSink(starttls=True) as sink:
+        config["smtp_server"], config["smtp_port"] = sink.host, sink.port
+        ...
+        print(len(sink.messages))
+"""
+import os
+import ssl
+import time
+import random
+import argparse
+import datetime
+import tempfile
+import threading
+import socketserver
+from collections import namedtuple
+
+Message = namedtuple("Message", "mail_from rcpt_to data received_at")
+
+
+def make_self_signed_context(hostname="localhost"):
+    """Server-side SSLContext with a freshly generated self-signed certificate."""
+    from cryptography import x509
+    from cryptography.x509.oid import NameOID
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, hostname)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=5))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    directory = tempfile.mkdtemp(prefix="hoogland-smtp-")
+    cert_path = os.path.join(directory, "cert.pem")
+    key_path = os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.TraditionalOpenSSL,
+            serialization.NoEncryption(),
+        ))
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_path, key_path)
+    return context
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+        self.wfile.flush()
+
+    def readline(self):
+        line = self.rfile.readline(65537)
+        if not line:
+            raise ConnectionError("client closed the connection")
+        return line.decode("utf-8", errors="replace").rstrip("\r\n")
+
+    def handle(self):
+        sink = self.server.sink
+        with sink.lock:
+            sink.connections += 1
+        self.tls = False
+        self.reset()
+        self.reply("220 hoogland-sink ESMTP ready")
+        try:
+            while True:
+                line = self.readline()
+                verb, _, argument = line.partition(" ")
+                verb = verb.upper()
+                sink.pause(verb)
+                if sink.should_fail(verb):
+                    if sink.drop_on_failure:
+                        return
+                    self.reply("451 4.3.0 Injected failure")
+                    continue
+                handler = getattr(self, f"do_{verb}", None)
+                if handler is None:
+                    self.reply("502 5.5.2 Command not recognised")
+                elif handler(argument) is False:
+                    return
+        except (ConnectionError, ssl.SSLError, OSError):
+            return
+
+    def reset(self):
+        self.mail_from = None
+        self.rcpt_to = []
+
+    def do_EHLO(self, argument):
+        features = ["250-hoogland-sink", "250-AUTH PLAIN LOGIN", "250-8BITMIME"]
+        if self.server.sink.tls_context is not None and not self.tls:
+            features.append("250-STARTTLS")
+        features.append("250 SIZE 10485760")
+        self.wfile.write("\r\n".join(features).encode() + b"\r\n")
+        self.wfile.flush()
+
+    def do_HELO(self, argument):
+        self.reply("250 hoogland-sink")
+
+    def do_STARTTLS(self, argument):
+        context = self.server.sink.tls_context
+        if context is None or self.tls:
+            self.reply("454 4.7.0 TLS not available")
+            return
+        self.reply("220 2.0.0 Ready to start TLS")
+        self.connection = context.wrap_socket(self.connection, server_side=True)
+        self.rfile = self.connection.makefile("rb")
+        self.wfile = self.connection.makefile("wb")
+        self.tls = True
+        self.reset()
+
+    def do_AUTH(self, argument):
+        # Any credentials are accepted; only the exchange itself is emulated
+        mechanism, _, initial = argument.partition(" ")
+        if mechanism.upper() == "PLAIN":
+            if not initial:
+                self.reply("334 ")
+                self.readline()
+        elif mechanism.upper() == "LOGIN":
+            if not initial:
+                self.reply("334 VXNlcm5hbWU6")
+                self.readline()
+            self.reply("334 UGFzc3dvcmQ6")
+            self.readline()
+        else:
+            self.reply("504 5.5.4 Unrecognised authentication type")
+            return
+        self.reply("235 2.7.0 Authentication successful")
+
+    def do_MAIL(self, argument):
+        self.mail_from = argument.partition(":")[2].strip().strip("<>")
+        self.rcpt_to = []
+        self.reply("250 2.1.0 OK")
+
+    def do_RCPT(self, argument):
+        if self.mail_from is None:
+            self.reply("503 5.5.1 Need MAIL first")
+            return
+        self.rcpt_to.append(argument.partition(":")[2].strip().strip("<>"))
+        self.reply("250 2.1.5 OK")
+
+    def do_DATA(self, argument):
+        if not self.rcpt_to:
+            self.reply("503 5.5.1 Need RCPT first")
+            return
+        self.reply("354 End data with <CR><LF>.<CR><LF>")
+        lines = []
+        while True:
+            line = self.readline()
+            if line == ".":
+                break
+            lines.append(line[1:] if line.startswith("..") else line)
+        self.server.sink.store(Message(self.mail_from, list(self.rcpt_to), "\n".join(lines), time.time()))
+        self.reset()
+        self.reply("250 2.0.0 Queued")
+
+    def do_RSET(self, argument):
+        self.reset()
+        self.reply("250 2.0.0 OK")
+
+    def do_NOOP(self, argument):
+        self.reply("250 2.0.0 OK")
+
+    def do_QUIT(self, argument):
+        self.reply("221 2.0.0 Bye")
+        return False
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """
+    Threaded in-process SMTP server that records what it receives.
+
+    ``latency`` (seconds) is slept before answering each command in
+    ``latency_commands``; ``fail_rate`` is the chance that a command in
+    ``fail_commands`` gets a 451 reply, or a dropped connection with
+    ``drop_on_failure``. ``seed`` makes the failures repeatable.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, starttls=True, latency=0.0, latency_commands=("DATA",),
+                 fail_rate=0.0, fail_commands=("DATA",), drop_on_failure=False, seed=None):
+        self.tls_context = make_self_signed_context() if starttls else None
+        self.latency = latency
+        self.latency_commands = {c.upper() for c in latency_commands}
+        self.fail_rate = fail_rate
+        self.fail_commands = {c.upper() for c in fail_commands}
+        self.drop_on_failure = drop_on_failure
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.messages = []
+        self.connections = 0
+        self.failures = 0
+        self.server = _Server((host, port), SMTPHandler)
+        self.server.sink = self
+        self.host, self.port = self.server.server_address[:2]
+        self.thread = None
+
+    def pause(self, verb):
+        if self.latency and verb in self.latency_commands:
+            time.sleep(self.latency)
+
+    def should_fail(self, verb):
+        if not self.fail_rate or verb not in self.fail_commands:
+            return False
+        with self.lock:
+            failed = self.random.random() < self.fail_rate
+            self.failures += failed
+        return failed
+
+    def store(self, message):
+        with self.lock:
+            self.messages.append(message)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="SMTPSink", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a local SMTP sink.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    parser.add_argument("--starttls", action="store_true", help="Offer STARTTLS with a self-signed certificate")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay before answering DATA")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Chance of answering DATA with 451")
+    args = parser.parse_args(argv)
+
+    sink = SMTPSink(args.host, args.port, args.starttls, args.latency_ms / 1000, fail_rate=args.fail_rate)
+    print(f"SMTP sink listening on {sink.host}:{sink.port} (STARTTLS {'on' if args.starttls else 'off'})")
+    sink.start()
+    try:
+        while True:
+            time.sleep(5)
+            print(f"{len(sink.messages)} messages, {sink.connections} connections, {sink.failures} injected failures")
+    except KeyboardInterrupt:
+        sink.stop()
+
+
+if __name__ == "__main__":
+    main()
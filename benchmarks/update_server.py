@@ -0,0 +1,332 @@
+# benchmarks/update_server.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+"""
+Local HTTP server that stands in for the GitHub-hosted update feed.
+
+Serves a ``latest_version.json`` manifest in the same shape as the one in
+the repository (version, download_url, changes, hashes) plus the files it
+points at under ``/files/``. Latency, ETag/Last-Modified revalidation,
+byte ranges, injected failures and deliberately corrupted files can all
+be switched on per server. A frozen build and binary deltas to it can be
+published alongside with ``publish_executable``.
+
+Usage:
+    python benchmarks/update_server.py --port 8765 [--version 1.0.1] [--latency-ms 50] [--fail-rate 0.2]
+
+or from Python:
+    with UpdateServer(version="1.0.1", files={"alerts.py": b"..."}) as server:
+        config["update_url"] = server.manifest_url
+        ...
+        print(server.bytes_sent)
+"""
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MANIFEST_PATH = "/latest_version.json"
+FILES_PREFIX = "/files/"
+
+
+class UpdateHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "HooglandUpdateServer/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server.fixture
+        server.count_request(self.path)
+        server.pause()
+        if self.path == MANIFEST_PATH:
+            self.send_manifest(server)
+        elif self.path.startswith(FILES_PREFIX):
+            self.send_file(server, self.path[len(FILES_PREFIX):])
+        else:
+            self.send_body(404, b"Not found", "text/plain")
+
+    def not_modified(self, etag, last_modified):
+        if not self.server.fixture.etags:
+            return False
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since).timestamp() >= int(last_modified)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def validators(self, etag, last_modified):
+        server = self.server.fixture
+        headers = {}
+        if server.etags:
+            headers["ETag"] = etag
+            headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+        if server.cache_control:
+            headers["Cache-Control"] = server.cache_control
+        return headers
+
+    def send_manifest(self, server):
+        body, etag, last_modified = server.manifest_body()
+        headers = self.validators(etag, last_modified)
+        if self.not_modified(etag, last_modified):
+            server.count_not_modified()
+            self.send_body(304, b"", None, headers)
+            return
+        self.send_body(200, body, "application/json", headers)
+
+    def send_file(self, server, name):
+        if name not in server.files and name not in server.assets:
+            self.send_body(404, b"Not found", "text/plain")
+            return
+        content, etag, last_modified = server.file_body(name)
+        headers = self.validators(etag, last_modified)
+        headers["Accept-Ranges"] = "bytes"
+        if self.not_modified(etag, last_modified):
+            server.count_not_modified()
+            self.send_body(304, b"", None, headers)
+            return
+        failure = server.should_fail()
+        if failure == "status":
+            if server.retry_after is not None:
+                headers["Retry-After"] = str(server.retry_after)
+            self.send_body(503, b"Injected failure", "text/plain", headers)
+            return
+
+        status, start, end = 200, 0, len(content)
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match:
+            start = int(match.group(1))
+            end = min(len(content), int(match.group(2)) + 1) if match.group(2) else len(content)
+            if start >= len(content) or start >= end:
+                headers["Content-Range"] = f"bytes */{len(content)}"
+                self.send_body(416, b"", None, headers)
+                return
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{end - 1}/{len(content)}"
+        body = content[start:end]
+        # A truncated response promises the full length and hangs up halfway
+        self.send_body(status, body, "application/octet-stream", headers, truncate=failure == "truncate")
+
+    def send_body(self, status, body, content_type, headers=None, truncate=False):
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        if truncate:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        if truncate:
+            body = body[:len(body) // 2]
+        self.wfile.write(body)
+        self.wfile.flush()
+        self.server.fixture.count_bytes(len(body))
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class UpdateServer:
+    """
+    Threaded in-process update feed for tests and benchmarks.
+
+    ``files`` maps file names to their new contents; the manifest lists
+    each one with its SHA-256. Names in ``corrupt`` are served with a
+    flipped byte while the manifest keeps the good hash. ``latency``
+    (seconds) is slept before every response, and ``fail_rate`` is the
+    chance that a file request fails, either with a 503 (``failure_mode``
+    "status", carrying ``retry_after`` if set) or with a body cut off
+    halfway ("truncate"). ``etags`` turns ETag/Last-Modified validators
+    and 304 answers on or off. ``seed`` makes the failures repeatable.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, version="1.0.1", files=None, corrupt=(), latency=0.0,
+                 fail_rate=0.0, failure_mode="status", retry_after=None, etags=True, cache_control=None,
+                 seed=None):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.failure_mode = failure_mode
+        self.retry_after = retry_after
+        self.etags = etags
+        self.cache_control = cache_control
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.server = _Server((host, port), UpdateHandler)
+        self.server.fixture = self
+        self.host, self.port = self.server.server_address[:2]
+        self.base_url = f"http://{self.host}:{self.port}"
+        self.manifest_url = self.base_url + MANIFEST_PATH
+        self.thread = None
+        self.reset_stats()
+        self.publish(version, files or {}, corrupt)
+
+    def publish(self, version, files, corrupt=()):
+        """Replace the release being served."""
+        with self.lock:
+            self.version = version
+            self.files = dict(files)
+            self.corrupt = set(corrupt)
+            self.assets = {}
+            self.executable = None
+            self.published_at = int(time.time())
+            self._manifest = None
+
+    def publish_executable(self, name, content, deltas=None):
+        """
+        Add a frozen build to the release. ``deltas`` maps the SHA-256 of an
+        installed build to a delta (see delta.make_delta) that upgrades it.
+        """
+        with self.lock:
+            url = f"{self.base_url}{FILES_PREFIX}{name}"
+            self.assets[name] = content
+            self.executable = {
+                "name": name,
+                "url": url,
+                "hash": hashlib.sha256(content).hexdigest(),
+                "size": len(content),
+                "deltas": {},
+            }
+            for installed_hash, delta in (deltas or {}).items():
+                delta_name = f"{name}.{installed_hash[:12]}.delta"
+                self.assets[delta_name] = delta
+                self.executable["deltas"][installed_hash] = {
+                    "url": f"{self.base_url}{FILES_PREFIX}{delta_name}",
+                    "hash": hashlib.sha256(delta).hexdigest(),
+                    "size": len(delta),
+                }
+            self._manifest = None
+
+    def manifest(self):
+        manifest = {
+            "version": self.version,
+            "download_url": f"{self.base_url}{FILES_PREFIX}HooglandInstaller.exe",
+            "changes": {name: f"{self.base_url}{FILES_PREFIX}{name}" for name in self.files},
+            "hashes": {name: hashlib.sha256(content).hexdigest() for name, content in self.files.items()},
+        }
+        if self.executable:
+            manifest["executable"] = self.executable
+        return manifest
+
+    def manifest_body(self):
+        with self.lock:
+            if self._manifest is None:
+                body = json.dumps(self.manifest(), indent=2).encode()
+                self._manifest = (body, f'"{hashlib.sha256(body).hexdigest()[:16]}"', self.published_at)
+            return self._manifest
+
+    def file_body(self, name):
+        with self.lock:
+            content = self.files[name] if name in self.files else self.assets[name]
+            if name in self.corrupt and content:
+                content = bytes([content[0] ^ 0xFF]) + content[1:]
+            return content, f'"{hashlib.sha256(content).hexdigest()[:16]}"', self.published_at
+
+    def pause(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def should_fail(self):
+        if not self.fail_rate:
+            return None
+        with self.lock:
+            failed = self.random.random() < self.fail_rate
+            self.failures += failed
+        return self.failure_mode if failed else None
+
+    def reset_stats(self):
+        with self.lock:
+            self.requests = 0
+            self.bytes_sent = 0
+            self.not_modified = 0
+            self.failures = 0
+            self.paths = {}
+
+    def count_request(self, path):
+        with self.lock:
+            self.requests += 1
+            self.paths[path] = self.paths.get(path, 0) + 1
+
+    def count_bytes(self, size):
+        with self.lock:
+            self.bytes_sent += size
+
+    def count_not_modified(self):
+        with self.lock:
+            self.not_modified += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "bytes_sent": self.bytes_sent,
+                "not_modified": self.not_modified,
+                "failures": self.failures,
+            }
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="UpdateServer", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a local update server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--version", default="1.0.1")
+    parser.add_argument("--file", action="append", default=[], metavar="PATH",
+                        help="Publish this file under its base name (repeatable)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay before every response")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Chance of failing a file request")
+    parser.add_argument("--failure-mode", choices=("status", "truncate"), default="status")
+    parser.add_argument("--corrupt", action="append", default=[], metavar="NAME",
+                        help="Serve this file with a bad hash (repeatable)")
+    args = parser.parse_args(argv)
+
+    files = {}
+    for path in args.file:
+        with open(path, "rb") as f:
+            files[os.path.basename(path)] = f.read()
+    server = UpdateServer(args.host, args.port, args.version, files, args.corrupt, args.latency_ms / 1000,
+                          args.fail_rate, args.failure_mode)
+    print(f"Update server on {server.manifest_url} serving {len(files)} files as {args.version}")
+    server.start()
+    try:
+        while True:
+            time.sleep(5)
+            stats = server.stats()
+            print(f"{stats['requests']} requests, {stats['bytes_sent']} bytes, "
+                  f"{stats['not_modified']} not modified, {stats['failures']} injected failures")
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# challenges.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+import random
+import logging
+import threading
+from collections import deque, namedtuple
+
+Challenge = namedtuple("Challenge", ["kind", "difficulty", "prompt", "answer"])
+
+# difficulty -> (operand range, number of terms, allow multiplication)
+ARITHMETIC_LEVELS = {
+    1: ((1, 20), 2, False),
+    2: ((1, 100), 2, False),
+    3: ((1, 100), 3, False),
+    4: ((2, 12), 3, True),
+    5: ((2, 25), 4, True),
+}
+
+
+def generate_arithmetic(rng, difficulty):
+    """
+    Build an arithmetic problem and its answer without evaluating any text.
+
+    Multiplication binds tighter than +/-, so the problem is built as a sum of
+    signed terms where each term is a number or a product of two numbers.
+    """
+    (low, high), terms, allow_multiply = ARITHMETIC_LEVELS.get(
+        difficulty, ARITHMETIC_LEVELS[2]
+    )
+    parts = []
+    answer = 0
+    for index in range(terms):
+        if allow_multiply and rng.random() < 0.5:
+            a, b = rng.randint(low, high), rng.randint(low, high)
+            text, value = f"{a} × {b}", a * b
+        else:
+            value = rng.randint(low, high)
+            text = str(value)
+        if index == 0:
+            parts.append(text)
+            answer = value
+        elif rng.random() < 0.5:
+            parts.append(f"+ {text}")
+            answer += value
+        else:
+            parts.append(f"- {text}")
+            answer -= value
+    return Challenge("arithmetic", difficulty, " ".join(parts), answer)
+
+
+CHALLENGE_TYPES = {"arithmetic": generate_arithmetic}
+
+
+def register_challenge_type(kind, generator):
+    """Register a generator(rng, difficulty) -> Challenge for a new challenge kind."""
+    CHALLENGE_TYPES[kind] = generator
+
+
+class ChallengeBank:
+    """
+    Pre-generated pool of challenges for one kind and difficulty.
+
+    ``next()`` pops from a deque in O(1). Prompts handed out since the last
+    ``start_shift()`` are not repeated, and a background thread tops the bank
+    back up once it drops below the low-water mark.
+    """
+
+    def __init__(self, kind="arithmetic", difficulty=2, size=200, low_water=None, seed=None):
+        if kind not in CHALLENGE_TYPES:
+            raise ValueError(f"Unknown challenge type: {kind}")
+        self.kind = kind
+        self.difficulty = difficulty
+        self.size = size
+        self.low_water = low_water if low_water is not None else max(1, size // 4)
+        self.rng = random.Random(seed)
+        self.bank = deque()
+        self.banked = set()
+        self.issued = set()
+        self.lock = threading.Lock()
+        self.refill_needed = threading.Event()
+        self.refill()
+        self.refill_thread = threading.Thread(
+            target=self._refill_loop, name=f"ChallengeBank-{kind}-{difficulty}", daemon=True
+        )
+        self.refill_thread.start()
+
+    def _generate(self):
+        generator = CHALLENGE_TYPES[self.kind]
+        # Small difficulty levels have a limited problem space; give up on
+        # uniqueness after a few tries rather than spin forever
+        for _ in range(20):
+            challenge = generator(self.rng, self.difficulty)
+            if challenge.prompt not in self.issued and challenge.prompt not in self.banked:
+                return challenge
+        return challenge
+
+    def refill(self):
+        with self.lock:
+            while len(self.bank) < self.size:
+                challenge = self._generate()
+                self.bank.append(challenge)
+                self.banked.add(challenge.prompt)
+
+    def _refill_loop(self):
+        while True:
+            self.refill_needed.wait()
+            self.refill_needed.clear()
+            try:
+                self.refill()
+            except Exception as e:
+                logging.error(f"Challenge bank refill failed: {str(e)}")
+
+    def next(self):
+        with self.lock:
+            if self.bank:
+                challenge = self.bank.popleft()
+                self.banked.discard(challenge.prompt)
+            else:
+                challenge = self._generate()
+            self.issued.add(challenge.prompt)
+            if len(self.bank) < self.low_water:
+                self.refill_needed.set()
+        return challenge
+
+    def start_shift(self):
+        with self.lock:
+            self.issued.clear()
+
+
+_banks = {}
+_banks_lock = threading.Lock()
+
+
+def get_bank(kind="arithmetic", difficulty=2, size=200):
+    with _banks_lock:
+        bank = _banks.get((kind, difficulty))
+        if bank is None:
+            bank = ChallengeBank(kind, difficulty, size)
+            _banks[(kind, difficulty)] = bank
+        return bank
+
+
+def next_challenge(config):
+    return get_bank(
+        config.get("challenge_type", "arithmetic"),
+        int(config.get("math_difficulty", 2)),
+        int(config.get("challenge_bank_size", 200)),
+    ).next()
+
+
+def start_shift():
+    with _banks_lock:
+        banks = list(_banks.values())
+    for bank in banks:
+        bank.start_shift()
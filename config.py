@@ -4,6 +4,8 @@ import os
 import threading
 import logging
 from cryptography.fernet import Fernet
+import metrics
+from timing import phase
 
 # Paths
 app_data_dir = os.path.join(os.getenv("APPDATA", os.path.expanduser("~/.hoogland")), "Hoogland")
@@ -22,8 +24,9 @@ else:
 cipher = Fernet(key)
 
 def load_config():
+    metrics.CONFIG_LOADS.inc()
     config_lock = threading.Lock()
-    with config_lock:
+    with config_lock, phase("config_load"):
         default_config = {
             "users": [],
             "sender_email": "",
@@ -56,6 +59,35 @@ def load_config():
                 "symbols": "!@#$%^&*()-_=+[]{}|;:'\",.<>?/`~"
             },
             "enable_math_popup": False,
+            "max_concurrent_popups": 3,
+            "challenge_type": "arithmetic",
+            "math_difficulty": 2,
+            "challenge_bank_size": 200,
+            "operator_name": "",
+            "event_retention_days": 180,
+            "log_max_bytes": 5242880,
+            "log_backup_count": 14,
+            "log_jsonl_enabled": False,
+            "sse_port": 5001,
+            "sse_max_streams": 20,
+            "metrics_token": "",
+            "slow_request_ms": 500,
+            "watchdog_enabled": True,
+            "watchdog_deadline_seconds": 180,
+            "watchdog_systemd_notify": False,
+            "memory_diagnostics_enabled": False,
+            "memory_snapshot_interval_minutes": 30,
+            "memory_growth_warn_mb": 50,
+            "memory_trace_frames": 10,
+            "update_download_workers": 4,
+            "update_check_interval_minutes": 60,
+            "update_check_jitter_percent": 20,
+            "update_retry_minutes": 5,
+            "update_backoff_max_minutes": 360,
+            "update_mirror_url": "",
+            "update_mirror_serve": False,
+            "integrity_check_enabled": True,
+            "integrity_reverify_minutes": 0,
         }
 
         config = None
@@ -0,0 +1,178 @@
+# delta.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+"""
+Binary deltas between two builds of the executable.
+
+A delta is a header (magic, target size, target SHA-256) followed by
+operations that rebuild the target from the installed file:
+
+    b"C" <offset:u64> <length:u32>   copy bytes from the source
+    b"I" <length:u32> <data>         insert literal bytes
+    b"E"                             end
+
+Usage (release side):
+    python delta.py old/app.exe new/app.exe app-1.0.0-to-1.1.0.delta \
+        --base-url https://github.com/coff33ninja/Hoogland/releases/download/v1.1.0
+"""
+import os
+import sys
+import json
+import argparse
+import struct
+import hashlib
+
+MAGIC = b"HGDELTA1"
+BLOCK_SIZE = 64
+CHUNK_SIZE = 64 * 1024
+MAX_OP_LENGTH = 0xFFFFFFFF
+
+_HEADER = struct.Struct("<8sQ32s")
+_COPY = struct.Struct("<QI")
+_INSERT = struct.Struct("<I")
+
+
+class DeltaError(Exception):
+    """A delta is malformed or does not rebuild the expected file."""
+
+
+def _match_forward(source, source_pos, target, target_pos):
+    """Length of the common run starting at the two positions."""
+    length = 0
+    limit = min(len(source) - source_pos, len(target) - target_pos)
+    step = 4096
+    while length < limit:
+        size = min(step, limit - length)
+        if source[source_pos + length:source_pos + length + size] == target[target_pos + length:target_pos + length + size]:
+            length += size
+            continue
+        if size == 1:
+            break
+        step = max(1, size // 8)
+    return length
+
+
+def make_delta(source, target, block_size=BLOCK_SIZE):
+    """Return a delta (bytes) that turns ``source`` into ``target``."""
+    index = {}
+    for offset in range(0, len(source) - block_size + 1, block_size):
+        index.setdefault(source[offset:offset + block_size], offset)
+
+    out = [_HEADER.pack(MAGIC, len(target), hashlib.sha256(target).digest())]
+
+    def insert(start, end):
+        while start < end:
+            length = min(end - start, MAX_OP_LENGTH)
+            out.append(b"I" + _INSERT.pack(length) + target[start:start + length])
+            start += length
+
+    pending = 0
+    position = 0
+    while position + block_size <= len(target):
+        offset = index.get(target[position:position + block_size])
+        if offset is None:
+            position += 1
+            continue
+        # Grow the match backwards into bytes not yet emitted
+        back = 0
+        while back < position - pending and back < offset and source[offset - back - 1] == target[position - back - 1]:
+            back += 1
+        start, source_start = position - back, offset - back
+        length = back + _match_forward(source, offset, target, position)
+        insert(pending, start)
+        while length:
+            run = min(length, MAX_OP_LENGTH)
+            out.append(b"C" + _COPY.pack(source_start, run))
+            source_start += run
+            start += run
+            length -= run
+        position = pending = start
+    insert(pending, len(target))
+    out.append(b"E")
+    return b"".join(out)
+
+
+def _read_exact(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise DeltaError("Delta is truncated")
+    return data
+
+
+def apply_delta(source_path, delta_path, output_path, progress=None):
+    """
+    Rebuild the target into ``output_path`` from ``source_path`` and the
+    delta, streaming both. Returns the SHA-256 hex digest of the output;
+    raises DeltaError if the result does not match the delta's header.
+    ``progress`` is called after every operation.
+    """
+    digest = hashlib.sha256()
+    written = 0
+    with open(delta_path, "rb") as delta, open(source_path, "rb") as source, open(output_path, "wb") as out:
+        magic, target_size, target_hash = _HEADER.unpack(_read_exact(delta, _HEADER.size))
+        if magic != MAGIC:
+            raise DeltaError("Not a Hoogland delta")
+        source_size = os.fstat(source.fileno()).st_size
+        while True:
+            op = _read_exact(delta, 1)
+            if op == b"E":
+                break
+            if op == b"C":
+                offset, length = _COPY.unpack(_read_exact(delta, _COPY.size))
+                if offset + length > source_size:
+                    raise DeltaError("Delta copies past the end of the installed file")
+                source.seek(offset)
+                while length:
+                    chunk = _read_exact(source, min(length, CHUNK_SIZE))
+                    out.write(chunk)
+                    digest.update(chunk)
+                    written += len(chunk)
+                    length -= len(chunk)
+            elif op == b"I":
+                (length,) = _INSERT.unpack(_read_exact(delta, _INSERT.size))
+                while length:
+                    chunk = _read_exact(delta, min(length, CHUNK_SIZE))
+                    out.write(chunk)
+                    digest.update(chunk)
+                    written += len(chunk)
+                    length -= len(chunk)
+            else:
+                raise DeltaError(f"Unknown delta operation {op!r}")
+            if progress:
+                progress()
+            if written > target_size:
+                raise DeltaError("Delta produces more data than its header declares")
+    if written != target_size or digest.digest() != target_hash:
+        raise DeltaError("Patched file does not match the delta's target hash")
+    return digest.hexdigest()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a delta between two executables.")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("output")
+    parser.add_argument("--base-url", required=True, help="Where OUTPUT will be published, e.g. a release download URL")
+    args = parser.parse_args(argv)
+
+    with open(args.old, "rb") as f:
+        source = f.read()
+    with open(args.new, "rb") as f:
+        target = f.read()
+    delta = make_delta(source, target)
+    with open(args.output, "wb") as f:
+        f.write(delta)
+    # The manifest entry for this delta, keyed by the installed build's hash
+    print(json.dumps({
+        hashlib.sha256(source).hexdigest(): {
+            "url": f"{args.base_url.rstrip('/')}/{os.path.basename(args.output)}",
+            "hash": hashlib.sha256(delta).hexdigest(),
+            "size": len(delta),
+        }
+    }, indent=4))
+    print(f"{len(delta)} bytes ({len(delta) / max(1, len(target)):.1%} of the new build)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+# events.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+import os
+import time
+import uuid
+import queue
+import getpass
+import logging
+import sqlite3
+import threading
+from config import app_data_dir, load_config
+import metrics
+
+events_path = os.path.join(app_data_dir, "alert_events.db")
+
+# Lifecycle events are stored as small integers to keep rows compact
+EVENT_CODES = {
+    "fired": 1,
+    "shown": 2,
+    "acknowledged": 3,
+    "closed_unacknowledged": 4,
+    # Still unacknowledged when its shift ended; recorded by the shift reporter
+    "missed": 5,
+    "coalesced": 6,
+    # Not acknowledged within email_if_not_pressed_after_minutes; the alert stays open
+    "escalated": 7,
+}
+EVENT_NAMES = {code: name for name, code in EVENT_CODES.items()}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    ts INTEGER NOT NULL,
+    alert_id TEXT NOT NULL,
+    event INTEGER NOT NULL,
+    operator TEXT,
+    value REAL,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS events_operator_ts ON events (operator, ts);
+CREATE INDEX IF NOT EXISTS events_alert ON events (alert_id);
+"""
+
+
+def new_alert_id():
+    return uuid.uuid4().hex[:16]
+
+
+def current_operator(config=None):
+    if config and config.get("operator_name"):
+        return config["operator_name"]
+    try:
+        return getpass.getuser()
+    except Exception:
+        return "unknown"
+
+
+class AlertEventStore:
+    """
+    Append-only SQLite log of alert lifecycle events.
+
+    ``record()`` only enqueues, so callers on the GUI thread never touch the
+    disk. A writer thread commits events in batches and runs the retention
+    job once a day.
+    """
+
+    def __init__(self, path=events_path, batch_size=100, flush_interval=1.0,
+                 retention_days=180, compact_interval=86400):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self.compact_interval = compact_interval
+        self.queue = queue.Queue()
+        self.stopped = threading.Event()
+        self.subscribers = []
+        conn = self.connect()
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+        self.last_compaction = time.time()
+        self.writer = threading.Thread(target=self._writer_loop, name="AlertEventWriter", daemon=True)
+        self.writer.start()
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def record(self, event, alert_id, operator=None, value=None, detail=None, ts=None):
+        if event not in EVENT_CODES:
+            raise ValueError(f"Unknown alert event: {event}")
+        ts_ms = int((ts if ts is not None else time.time()) * 1000)
+        self.queue.put((ts_ms, alert_id, EVENT_CODES[event], operator, value, detail))
+
+    def subscribe(self, callback):
+        """
+        Call ``callback(rows)`` on the writer thread after each committed batch.
+
+        Rows are ``(ts_ms, alert_id, event_code, operator, value, detail)`` tuples.
+        """
+        self.subscribers.append(callback)
+
+    def _notify(self, batch):
+        for callback in list(self.subscribers):
+            try:
+                callback(batch)
+            except Exception as e:
+                logging.error(f"Alert event subscriber failed: {str(e)}")
+
+    def _drain(self):
+        batch = []
+        try:
+            batch.append(self.queue.get(timeout=self.flush_interval))
+            while len(batch) < self.batch_size:
+                batch.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _write(self, conn, batch):
+        with conn:
+            conn.executemany(
+                "INSERT INTO events (ts, alert_id, event, operator, value, detail) VALUES (?, ?, ?, ?, ?, ?)",
+                batch,
+            )
+
+    def _writer_loop(self):
+        conn = self.connect()
+        try:
+            while not (self.stopped.is_set() and self.queue.empty()):
+                batch = self._drain()
+                if batch:
+                    try:
+                        self._write(conn, batch)
+                        self._notify(batch)
+                    except Exception as e:
+                        logging.error(f"Failed to write {len(batch)} alert events: {str(e)}")
+                    finally:
+                        for _ in batch:
+                            self.queue.task_done()
+                if time.time() - self.last_compaction >= self.compact_interval:
+                    self.compact()
+        finally:
+            conn.close()
+
+    def flush(self):
+        """Block until every event recorded so far has been committed."""
+        self.queue.join()
+
+    def close(self):
+        self.stopped.set()
+        self.writer.join(timeout=self.flush_interval + 5)
+
+    def _select(self, start=None, end=None, operator=None, alert_id=None, event=None, limit=None):
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(int(start * 1000))
+        if end is not None:
+            clauses.append("ts < ?")
+            params.append(int(end * 1000))
+        if operator is not None:
+            clauses.append("operator = ?")
+            params.append(operator)
+        if alert_id is not None:
+            clauses.append("alert_id = ?")
+            params.append(alert_id)
+        if event is not None:
+            clauses.append("event = ?")
+            params.append(EVENT_CODES[event])
+        sql = "SELECT ts, alert_id, event, operator, value, detail FROM events"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY ts"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return sql, params
+
+    def iter_events(self, start=None, end=None, operator=None, alert_id=None, event=None,
+                    limit=None, chunk_size=1000):
+        """
+        Yield events as dicts, oldest first, reading ``chunk_size`` rows at a time.
+
+        ``start`` and ``end`` are Unix timestamps in seconds; ``end`` is exclusive.
+        """
+        sql, params = self._select(start, end, operator, alert_id, event, limit)
+        conn = self.connect()
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for ts, row_alert_id, code, row_operator, value, detail in rows:
+                    yield {
+                        "ts": ts / 1000,
+                        "alert_id": row_alert_id,
+                        "event": EVENT_NAMES.get(code, str(code)),
+                        "operator": row_operator,
+                        "value": value,
+                        "detail": detail,
+                    }
+        finally:
+            conn.close()
+
+    def query(self, start=None, end=None, operator=None, alert_id=None, event=None, limit=None):
+        """Return the events matching the same filters as ``iter_events`` as a list."""
+        return list(self.iter_events(start, end, operator, alert_id, event, limit))
+
+    def compact(self, retention_days=None):
+        """Drop events older than the retention window and reclaim the space."""
+        retention_days = self.retention_days if retention_days is None else retention_days
+        cutoff = int((time.time() - retention_days * 86400) * 1000)
+        self.last_compaction = time.time()
+        conn = self.connect()
+        try:
+            with conn:
+                deleted = conn.execute("DELETE FROM events WHERE ts < ?", (cutoff,)).rowcount
+            if deleted:
+                conn.execute("VACUUM")
+            logging.info(f"Alert event compaction removed {deleted} events older than {retention_days} days")
+            return deleted
+        except Exception as e:
+            logging.error(f"Alert event compaction failed: {str(e)}")
+            return 0
+        finally:
+            conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_event_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = AlertEventStore(
+                retention_days=int(load_config().get("event_retention_days", 180))
+            )
+        return _store
+
+
+def record_event(event, alert_id, config=None, value=None, detail=None):
+    metrics.ALERT_EVENTS.labels(event).inc()
+    if event == "fired":
+        metrics.ALERTS_FIRED.inc()
+    elif event == "acknowledged":
+        metrics.ALERTS_ACKNOWLEDGED.inc()
+        if value is not None:
+            metrics.ACK_LATENCY.observe(value)
+    try:
+        get_event_store().record(event, alert_id, current_operator(config), value, detail)
+    except Exception as e:
+        logging.error(f"Failed to record alert event '{event}': {str(e)}")
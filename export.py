@@ -0,0 +1,122 @@
+# export.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+"""
+Streaming export of the alert event history as CSV or JSONL.
+
+Rows are read from SQLite a chunk at a time and encoded as they go, so
+neither the web endpoint nor the CLI ever holds the whole history in memory.
+
+Usage:
+    python export.py --start 2025-01-01 --end 2025-04-01 [--operator NAME]
+                     [--format csv|jsonl] [--gzip] --output history.csv
+"""
+import io
+import csv
+import sys
+import json
+import zlib
+import argparse
+import datetime
+
+EXPORT_FIELDS = ["time", "ts", "alert_id", "event", "operator", "value", "detail"]
+
+
+def _export_row(event):
+    return {
+        "time": datetime.datetime.fromtimestamp(event["ts"]).isoformat(timespec="milliseconds"),
+        **event,
+    }
+
+
+def iter_csv(events, rows_per_chunk=500):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    pending = 1
+    for event in events:
+        writer.writerow(_export_row(event))
+        pending += 1
+        if pending >= rows_per_chunk:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_jsonl(events, rows_per_chunk=500):
+    lines = []
+    for event in events:
+        lines.append(json.dumps(_export_row(event)))
+        if len(lines) >= rows_per_chunk:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def iter_gzip(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def iter_export(store, start=None, end=None, operator=None, fmt="csv", compress=False):
+    """Yield encoded byte chunks for the events matching the filters."""
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError(f"Unsupported export format: {fmt}")
+    events = store.iter_events(start=start, end=end, operator=operator)
+    chunks = iter_csv(events) if fmt == "csv" else iter_jsonl(events)
+    return iter_gzip(chunks) if compress else chunks
+
+
+def parse_time(value):
+    """Accept Unix seconds or an ISO date/datetime in local time."""
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def export_filename(fmt, compress):
+    stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"hoogland_history_{stamp}.{fmt}" + (".gz" if compress else "")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export Hoogland alert history.")
+    parser.add_argument("--start", help="Unix seconds or ISO date, inclusive")
+    parser.add_argument("--end", help="Unix seconds or ISO date, exclusive")
+    parser.add_argument("--operator")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--output", help="Output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    from events import get_event_store
+
+    store = get_event_store()
+    chunks = iter_export(
+        store, parse_time(args.start), parse_time(args.end), args.operator, args.format, args.gzip
+    )
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    written = 0
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+            written += len(chunk)
+    finally:
+        if args.output:
+            out.close()
+    print(f"Wrote {written} bytes", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
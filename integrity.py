@@ -0,0 +1,355 @@
+# integrity.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import datetime
+import platform
+import threading
+from config import app_data_dir, load_config
+import metrics
+
+cache_path = os.path.join(app_data_dir, "integrity_cache.json")
+baseline_path = os.path.join(app_data_dir, "integrity_baseline.json")
+
+CHUNK_SIZE = 1024 * 1024
+# Directories under the install root that are not part of the installation
+SKIPPED_DIRS = {"__pycache__", ".hoogland_update"}
+
+INTEGRITY_BYTES_HASHED = metrics.counter(
+    "hoogland_integrity_bytes_hashed_total", "Bytes read to hash installed files."
+)
+INTEGRITY_FILES = metrics.counter(
+    "hoogland_integrity_files_total", "Installed files checked, by whether they had to be rehashed.", ["result"]
+)
+INTEGRITY_VERIFY_SECONDS = metrics.histogram(
+    "hoogland_integrity_verify_seconds", "Duration of one installation integrity check."
+)
+INTEGRITY_PROBLEMS = metrics.gauge(
+    "hoogland_integrity_problems", "Installed files changed or missing at the last integrity check."
+)
+
+
+def install_dir():
+    return os.path.dirname(sys.executable) if getattr(sys, "frozen", False) else os.path.dirname(os.path.abspath(__file__))
+
+
+def hash_file(path, chunk_size=CHUNK_SIZE):
+    """SHA-256 of ``path``, read in fixed-size chunks into one reused buffer."""
+    digest = hashlib.sha256()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            size = f.readinto(buffer)
+            if not size:
+                break
+            digest.update(view[:size])
+            INTEGRITY_BYTES_HASHED.inc(size)
+    return digest.hexdigest()
+
+
+def lower_io_priority():
+    """
+    Best effort: move the calling thread to background scheduling so hashing
+    yields disk and CPU to everything else. Returns True if it took effect.
+    """
+    try:
+        if sys.platform == "win32":
+            import ctypes
+
+            THREAD_MODE_BACKGROUND_BEGIN = 0x00010000
+            kernel32 = ctypes.windll.kernel32
+            return bool(kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_MODE_BACKGROUND_BEGIN))
+        if sys.platform.startswith("linux"):
+            import ctypes
+
+            # IO and CPU priority are per thread on Linux; address this one by its TID
+            tid = threading.get_native_id()
+            os.setpriority(os.PRIO_PROCESS, tid, 19)
+            syscall_numbers = {"x86_64": 251, "aarch64": 30, "armv7l": 314, "i686": 289}
+            number = syscall_numbers.get(platform.machine())
+            if number is None:
+                return False
+            IOPRIO_WHO_PROCESS, IOPRIO_CLASS_IDLE, IOPRIO_CLASS_SHIFT = 1, 3, 13
+            libc = ctypes.CDLL(None, use_errno=True)
+            return libc.syscall(number, IOPRIO_WHO_PROCESS, tid, IOPRIO_CLASS_IDLE << IOPRIO_CLASS_SHIFT) == 0
+    except Exception as e:
+        logging.warning(f"Could not lower IO priority for integrity checks: {str(e)}")
+    return False
+
+
+class HashCache:
+    """
+    SHA-256 of files keyed by path, reused while (size, mtime, inode) match.
+
+    Saved to ``integrity_cache.json`` so a restart does not rehash an
+    unchanged installation.
+    """
+
+    def __init__(self, path=cache_path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(self.path, "r") as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.error(f"Failed to read integrity cache: {str(e)}")
+
+    def hash(self, path):
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        key = [st.st_size, st.st_mtime_ns, st.st_ino]
+        with self.lock:
+            entry = self.entries.get(path)
+        if entry and entry[:3] == key:
+            INTEGRITY_FILES.labels("cached").inc()
+            return entry[3]
+        digest = hash_file(path)
+        INTEGRITY_FILES.labels("hashed").inc()
+        with self.lock:
+            self.entries[path] = key + [digest]
+            self.dirty = True
+        return digest
+
+    def prune(self, keep):
+        with self.lock:
+            for path in set(self.entries) - set(keep):
+                del self.entries[path]
+                self.dirty = True
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            try:
+                temp_path = f"{self.path}.tmp"
+                with open(temp_path, "w") as f:
+                    json.dump(self.entries, f)
+                os.replace(temp_path, self.path)
+                self.dirty = False
+            except Exception as e:
+                logging.error(f"Failed to save integrity cache: {str(e)}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_hash_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = HashCache()
+        return _cache
+
+
+def iter_files(root):
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIPPED_DIRS and not d.startswith("."))
+        for filename in sorted(filenames):
+            if filename.startswith("."):
+                continue
+            yield os.path.join(directory, filename)
+
+
+class IntegrityVerifier:
+    """
+    Hashes every installed file into a manifest and checks it against a baseline.
+
+    The install directory (executable, templates, static files and the
+    bundled sound) is strict: a changed or missing file is reported by
+    email and in the notification feed. Custom sounds are tracked but
+    expected to change, so differences there are only logged. The first
+    run, and every update, records the baseline. With
+    ``reverify_minutes`` the check repeats in the background at low IO
+    priority.
+    """
+
+    def __init__(self, config, roots=None, reverify_minutes=0):
+        self.config = config
+        self.roots = roots or [
+            ("app", install_dir(), True),
+            ("sounds", os.path.join(app_data_dir, "sounds"), False),
+        ]
+        self.interval = reverify_minutes * 60
+        self.lock = threading.Lock()
+        # One check at a time; the updater may call verify() while the background loop runs
+        self.verify_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.last_report = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        with self.lock:
+            if self.running:
+                return False
+            self.stopped = threading.Event()
+            self.thread = threading.Thread(target=self._run, args=(self.stopped,), name="IntegrityVerifier", daemon=True)
+            self.thread.start()
+            return True
+
+    def stop(self):
+        self.stopped.set()
+
+    def _run(self, stopped):
+        lower_io_priority()
+        while not stopped.is_set():
+            try:
+                self.verify()
+            except Exception as e:
+                logging.error(f"Integrity check failed to run: {str(e)}")
+            if not self.interval:
+                break
+            stopped.wait(self.interval)
+
+    def build_manifest(self, progress=None):
+        cache = get_hash_cache()
+        manifest = {}
+        seen = []
+        for name, root, _ in self.roots:
+            if not os.path.isdir(root):
+                continue
+            for path in iter_files(root):
+                if self.stopped.is_set():
+                    return None
+                try:
+                    manifest[f"{name}/{os.path.relpath(path, root).replace(os.sep, '/')}"] = cache.hash(path)
+                    seen.append(os.path.abspath(path))
+                    if progress:
+                        progress()
+                except OSError as e:
+                    logging.warning(f"Cannot hash {path}: {str(e)}")
+        cache.prune(seen)
+        cache.save()
+        return manifest
+
+    def _load_baseline(self):
+        try:
+            with open(baseline_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.error(f"Failed to read integrity baseline: {str(e)}")
+            return None
+
+    def _save_baseline(self, manifest):
+        temp_path = f"{baseline_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"created": datetime.datetime.now().isoformat(timespec="seconds"), "files": manifest}, f, indent=1)
+        os.replace(temp_path, baseline_path)
+
+    def verify(self, rebaseline=False, progress=None):
+        """
+        Check the installation now; returns a report of what differs from the
+        baseline. ``progress`` is called after every file hashed.
+        """
+        with self.verify_lock:
+            return self._verify(rebaseline, progress)
+
+    def _verify(self, rebaseline, progress=None):
+        started = time.perf_counter()
+        manifest = self.build_manifest(progress)
+        if manifest is None:
+            return None
+        strict = {name for name, _, is_strict in self.roots if is_strict}
+        baseline = None if rebaseline else self._load_baseline()
+        report = {
+            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+            "files": len(manifest),
+            "changed": [],
+            "missing": [],
+            "added": [],
+            "problems": [],
+        }
+        if baseline is None:
+            self._save_baseline(manifest)
+            logging.info(f"Recorded integrity baseline of {len(manifest)} installed files")
+        else:
+            expected = baseline.get("files", {})
+            report["changed"] = sorted(k for k in manifest.keys() & expected.keys() if manifest[k] != expected[k])
+            report["missing"] = sorted(expected.keys() - manifest.keys())
+            report["added"] = sorted(manifest.keys() - expected.keys())
+            report["problems"] = [
+                k for k in report["changed"] + report["missing"] if k.split("/", 1)[0] in strict
+            ]
+            relaxed = [k for k in report["changed"] + report["missing"] + report["added"] if k.split("/", 1)[0] not in strict]
+            if relaxed or report["added"]:
+                logging.info(f"Integrity: {len(report['added'])} added files, {len(relaxed)} tracked changes outside the install")
+                # Tracked roots such as custom sounds move the baseline with them
+                for key in relaxed:
+                    if key in manifest:
+                        expected[key] = manifest[key]
+                    else:
+                        expected.pop(key, None)
+                if relaxed:
+                    self._save_baseline(expected)
+
+        executable_problem = self.check_executable(manifest)
+        if executable_problem:
+            report["problems"].append(executable_problem)
+        duration = time.perf_counter() - started
+        report["duration_s"] = round(duration, 3)
+        INTEGRITY_VERIFY_SECONDS.observe(duration)
+        INTEGRITY_PROBLEMS.set(len(report["problems"]))
+        self.last_report = report
+        if report["problems"]:
+            self.alert(report)
+        else:
+            logging.info(f"Integrity check passed: {report['files']} files in {duration:.2f}s")
+        return report
+
+    def check_executable(self, manifest):
+        """Compare the frozen executable against ``expected_hash``; returns a problem string or None."""
+        if not getattr(sys, "frozen", False):
+            return None
+        # Read fresh: the updater records a new expected_hash after installing a build
+        expected_hash = load_config().get("expected_hash")
+        if not expected_hash:
+            return None
+        current_hash = manifest.get(f"app/{os.path.basename(sys.executable)}")
+        if current_hash and current_hash != expected_hash:
+            return f"executable hash mismatch: expected {expected_hash}, got {current_hash}"
+        return None
+
+    def alert(self, report):
+        from utils import send_email_async
+        from notifications import notify
+
+        problems = report["problems"]
+        summary = f"Integrity check found {len(problems)} changed or missing installed files"
+        details = "\n".join(problems[:50])
+        logging.error(f"{summary}:\n{details}")
+        notify(summary, "integrity")
+        send_email_async(self.config, "Integrity Check Failed", f"{summary}:\n{details}")
+
+    def status(self):
+        return {"running": self.running, "interval_minutes": self.interval / 60, "last_report": self.last_report}
+
+
+_verifier = None
+_verifier_lock = threading.Lock()
+
+
+def get_integrity_verifier(config=None):
+    global _verifier
+    with _verifier_lock:
+        if _verifier is None:
+            config = config or {}
+            _verifier = IntegrityVerifier(
+                config, reverify_minutes=float(config.get("integrity_reverify_minutes", 0))
+            )
+        return _verifier
@@ -0,0 +1,258 @@
+# logindex.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+import os
+import re
+import gzip
+import json
+import logging
+import threading
+from logviewer import parse_line, matches
+
+TOKEN = re.compile(r"[a-z0-9][a-z0-9_@.\-]*[a-z0-9]|[a-z0-9]")
+INDEX_VERSION = 1
+
+
+def tokenize(text):
+    return set(TOKEN.findall(text.lower()))
+
+
+class SegmentIndex:
+    """
+    Inverted index for one log file, at block granularity.
+
+    Lines are grouped into blocks of ``block_lines``; each term maps to the
+    blocks that contain it, and each block remembers its byte offset and
+    time range. A query only reads the blocks every term points at.
+    """
+
+    def __init__(self, block_lines=64):
+        self.block_lines = block_lines
+        self.blocks = []
+        self.terms = {}
+        self.indexed_bytes = 0
+        self.lines_in_block = block_lines
+
+    @property
+    def min_ts(self):
+        return next((b[1] for b in self.blocks if b[1] is not None), None)
+
+    @property
+    def max_ts(self):
+        return next((b[2] for b in reversed(self.blocks) if b[2] is not None), None)
+
+    def add_line(self, offset, line):
+        if self.lines_in_block >= self.block_lines:
+            self.blocks.append([offset, None, None])
+            self.lines_in_block = 0
+        self.lines_in_block += 1
+        block_id = len(self.blocks) - 1
+        timestamp, _ = parse_line(line)
+        if timestamp is not None:
+            ts = timestamp.timestamp()
+            block = self.blocks[block_id]
+            if block[1] is None:
+                block[1] = ts
+            block[2] = ts
+        for term in tokenize(line):
+            postings = self.terms.setdefault(term, [])
+            if not postings or postings[-1] != block_id:
+                postings.append(block_id)
+
+    def feed(self, f):
+        """Index everything from ``indexed_bytes`` to the end of an open binary file."""
+        f.seek(self.indexed_bytes)
+        offset = self.indexed_bytes
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                # Partial line still being written; pick it up next time
+                break
+            self.add_line(offset, raw.decode("utf-8", errors="replace").rstrip("\r\n"))
+            offset += len(raw)
+        self.indexed_bytes = offset
+
+    def candidate_blocks(self, terms, since=None, until=None):
+        postings = [self.terms.get(term) for term in terms]
+        if any(p is None for p in postings):
+            return []
+        if postings:
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for p in postings[1:]:
+                candidates.intersection_update(p)
+        else:
+            candidates = set(range(len(self.blocks)))
+        selected = []
+        for block_id in sorted(candidates):
+            _, first_ts, last_ts = self.blocks[block_id]
+            if since is not None and last_ts is not None and last_ts < since:
+                continue
+            if until is not None and first_ts is not None and first_ts >= until:
+                continue
+            selected.append(block_id)
+        return selected
+
+    def to_dict(self):
+        return {
+            "version": INDEX_VERSION,
+            "block_lines": self.block_lines,
+            "indexed_bytes": self.indexed_bytes,
+            "blocks": self.blocks,
+            "terms": self.terms,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls(data["block_lines"])
+        index.blocks = data["blocks"]
+        index.terms = data["terms"]
+        index.indexed_bytes = data["indexed_bytes"]
+        return index
+
+
+def _open_log(path):
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+class LogIndex:
+    """
+    Term and time-range search over app.log and its rotated segments.
+
+    The active log is indexed incrementally, reading only bytes appended
+    since the last query. When the log rotates, its index is finished and
+    saved next to the compressed segment as ``<segment>.idx``.
+    """
+
+    def __init__(self, log_path):
+        self.log_path = log_path
+        self.lock = threading.Lock()
+        self.active = SegmentIndex()
+        self.active_inode = None
+        self.segment_cache = {}
+
+    def _catch_up(self):
+        if not os.path.exists(self.log_path):
+            return
+        stat = os.stat(self.log_path)
+        if stat.st_ino != self.active_inode or stat.st_size < self.active.indexed_bytes:
+            self.active = SegmentIndex()
+            self.active_inode = stat.st_ino
+        if stat.st_size > self.active.indexed_bytes:
+            with open(self.log_path, "rb") as f:
+                self.active.feed(f)
+
+    def on_rotate(self, active_path, segment_path):
+        """Called by the log handler just before ``active_path`` is rotated to ``segment_path``."""
+        with self.lock:
+            try:
+                self._catch_up()
+                self._save(segment_path, self.active)
+            except Exception as e:
+                logging.error(f"Failed to save log index for {segment_path}: {str(e)}")
+            self.active = SegmentIndex()
+            self.active_inode = None
+
+    def _save(self, segment_path, index):
+        with gzip.open(segment_path + ".idx", "wt", encoding="utf-8") as f:
+            json.dump(index.to_dict(), f, separators=(",", ":"))
+
+    def _segment_index(self, segment_path):
+        cached = self.segment_cache.get(segment_path)
+        if cached is not None:
+            return cached
+        index = None
+        try:
+            with gzip.open(segment_path + ".idx", "rt", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                index = SegmentIndex.from_dict(data)
+        except (OSError, ValueError, KeyError):
+            index = None
+        if index is None:
+            # Segment rotated before indexing existed; index it once and persist
+            index = SegmentIndex()
+            with _open_log(segment_path) as f:
+                index.feed(f)
+            self._save(segment_path, index)
+        self.segment_cache[segment_path] = index
+        return index
+
+    def segments(self):
+        """Rotated segments, newest first."""
+        directory, base = os.path.split(self.log_path)
+        if not os.path.isdir(directory):
+            return []
+        paths = [
+            os.path.join(directory, name)
+            for name in os.listdir(directory)
+            if name.startswith(base + ".") and name.endswith(".gz")
+        ]
+        return sorted(paths, key=os.path.getmtime, reverse=True)
+
+    def _read_blocks(self, path, index, block_ids):
+        opener = _open_log(path)
+        with opener as f:
+            for block_id in block_ids:
+                start = index.blocks[block_id][0]
+                end = index.blocks[block_id + 1][0] if block_id + 1 < len(index.blocks) else index.indexed_bytes
+                f.seek(start)
+                for raw in f.read(end - start).split(b"\n"):
+                    if raw:
+                        yield raw.decode("utf-8", errors="replace")
+
+    def search(self, query, since=None, until=None, limit=200, level=None):
+        """
+        Return up to ``limit`` lines containing every term in ``query``, newest first.
+
+        ``since``/``until`` are datetimes; whole segments and blocks outside
+        the range are skipped using the timestamps stored in the index.
+        ``level`` keeps only lines at or above that level, before ``limit``
+        is applied.
+        """
+        terms = sorted(tokenize(query))
+        since_ts = since.timestamp() if since else None
+        until_ts = until.timestamp() if until else None
+        with self.lock:
+            self._catch_up()
+            sources = [(self.log_path, self.active)]
+            live = set(self.segments())
+            for path in list(self.segment_cache):
+                if path not in live:
+                    del self.segment_cache[path]
+            for path in self.segments():
+                sources.append((path, self._segment_index(path)))
+
+        results = []
+        for path, index in sources:
+            if since_ts is not None and index.max_ts is not None and index.max_ts < since_ts:
+                continue
+            if until_ts is not None and index.min_ts is not None and index.min_ts >= until_ts:
+                continue
+            block_ids = index.candidate_blocks(terms, since_ts, until_ts)
+            matched = []
+            for line in self._read_blocks(path, index, block_ids):
+                if terms and not set(terms) <= tokenize(line):
+                    continue
+                if not matches(line, level, since, until):
+                    continue
+                matched.append(line)
+            results.extend(reversed(matched))
+            if len(results) >= limit:
+                break
+        return results[:limit]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_log_index(log_path=None):
+    global _index
+    with _index_lock:
+        if _index is None:
+            from config import app_data_dir
+            from logsetup import add_rotation_listener
+
+            _index = LogIndex(log_path or os.path.join(app_data_dir, "app.log"))
+            add_rotation_listener(_index.on_rotate)
+        return _index
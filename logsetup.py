@@ -0,0 +1,193 @@
+# logsetup.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+import os
+import sys
+import gzip
+import json
+import time
+import queue
+import atexit
+import shutil
+import logging
+import datetime
+from logging.handlers import BaseRotatingHandler, QueueHandler, QueueListener
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+_listener = None
+_file_handler = None
+_jsonl_handler = None
+_rotation_listeners = []
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves all formatting to the listener thread.
+
+    The stock prepare() formats the message and traceback on the calling
+    thread; records never leave this process, so they can be queued as-is.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class CompressingRotatingFileHandler(BaseRotatingHandler):
+    """
+    Rolls the log over when it passes ``max_bytes`` or at local midnight.
+
+    Old segments are renamed with a timestamp suffix, gzipped, and pruned to
+    the newest ``backup_count``. This handler only ever runs on the listener
+    thread, so rotation and compression never block a logging caller.
+    """
+
+    def __init__(self, filename, max_bytes=5 * 1024 * 1024, backup_count=14, daily=True, encoding="utf-8"):
+        super().__init__(filename, "a", encoding=encoding, delay=True)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.daily = daily
+        self.rollover_at = self._next_midnight()
+        self.rotation_listeners = []
+
+    def _next_midnight(self):
+        tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+        return datetime.datetime.combine(tomorrow, datetime.time()).timestamp()
+
+    def shouldRollover(self, record):
+        if self.daily and time.time() >= self.rollover_at:
+            return True
+        if self.max_bytes > 0:
+            if self.stream is None:
+                self.stream = self._open()
+            if self.stream.tell() + len(self.format(record)) + 1 >= self.max_bytes:
+                return True
+        return False
+
+    def segments(self):
+        """Return rotated segment paths, oldest first."""
+        directory, base = os.path.split(self.baseFilename)
+        return sorted(
+            (
+                os.path.join(directory, name)
+                for name in os.listdir(directory)
+                if name.startswith(base + ".") and name.endswith(".gz")
+            ),
+            key=os.path.getmtime,
+        )
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        self.rollover_at = self._next_midnight()
+        if not os.path.exists(self.baseFilename) or os.path.getsize(self.baseFilename) == 0:
+            return
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        rotated = f"{self.baseFilename}.{stamp}"
+        suffix = 1
+        while os.path.exists(rotated) or os.path.exists(rotated + ".gz"):
+            rotated = f"{self.baseFilename}.{stamp}-{suffix}"
+            suffix += 1
+        for callback in list(self.rotation_listeners):
+            try:
+                callback(self.baseFilename, rotated + ".gz")
+            except Exception as e:
+                print(f"Log rotation listener failed: {str(e)}", file=sys.stderr)
+        os.replace(self.baseFilename, rotated)
+        try:
+            with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(rotated)
+        except Exception as e:
+            # Keep the uncompressed segment rather than lose it
+            print(f"Failed to compress log segment {rotated}: {str(e)}", file=sys.stderr)
+        if self.backup_count > 0:
+            for old in self.segments()[: -self.backup_count]:
+                for path in (old, old + ".idx"):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def setup_logging(log_dir, level=logging.INFO, max_bytes=5 * 1024 * 1024, backup_count=14, jsonl=False):
+    """
+    Route all logging through a queue to a background listener thread.
+
+    Replaces any handlers already on the root logger. ``app.log`` keeps the
+    existing text format; with ``jsonl`` a parallel ``app.jsonl`` is written
+    for cheap parsing by the web UI.
+    """
+    global _listener, _file_handler, _jsonl_handler
+    shutdown_logging()
+    os.makedirs(log_dir, exist_ok=True)
+
+    _file_handler = CompressingRotatingFileHandler(
+        os.path.join(log_dir, "app.log"), max_bytes=max_bytes, backup_count=backup_count
+    )
+    _file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    _file_handler.rotation_listeners = _rotation_listeners
+    _jsonl_handler = CompressingRotatingFileHandler(
+        os.path.join(log_dir, "app.jsonl"), max_bytes=max_bytes, backup_count=backup_count
+    )
+    _jsonl_handler.setFormatter(JsonLinesFormatter())
+
+    log_queue = queue.Queue(-1)
+    handlers = (_file_handler, _jsonl_handler) if jsonl else (_file_handler,)
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(log_queue))
+    root.setLevel(level)
+    return _listener
+
+
+def add_rotation_listener(callback):
+    """Call ``callback(active_path, segment_path)`` just before app.log is rotated."""
+    _rotation_listeners.append(callback)
+
+
+def configure_logging(config):
+    """Apply the rotation and JSONL settings from config.json to the running pipeline."""
+    if _listener is None:
+        return
+    max_bytes = int(config.get("log_max_bytes", 5 * 1024 * 1024))
+    backup_count = int(config.get("log_backup_count", 14))
+    for handler in (_file_handler, _jsonl_handler):
+        handler.max_bytes = max_bytes
+        handler.backup_count = backup_count
+    if config.get("log_jsonl_enabled", False):
+        _listener.handlers = (_file_handler, _jsonl_handler)
+    else:
+        _listener.handlers = (_file_handler,)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
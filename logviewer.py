@@ -0,0 +1,115 @@
+# logviewer.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+import os
+import re
+import datetime
+
+# Matches the "%(asctime)s - %(levelname)s - %(message)s" format used for app.log
+LOG_LINE = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),\d{3} - ([A-Z]+) - ")
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+
+def parse_line(line):
+    """Return (datetime, level) for a log line, or (None, None) for continuation lines."""
+    match = LOG_LINE.match(line)
+    if not match:
+        return None, None
+    return datetime.datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S"), match.group(2)
+
+
+def iter_lines_backwards(path, before=None, block_size=65536):
+    """
+    Yield (offset, line) pairs from the end of ``path`` towards the start.
+
+    ``offset`` is the byte position where the line begins, so it can be used
+    as the ``before`` cursor for the next, older page. Only the blocks that
+    are actually read are kept in memory.
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell() if before is None else min(before, f.tell())
+        remainder = b""
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            block = f.read(read_size) + remainder
+            lines = block.split(b"\n")
+            # The first piece may be a partial line; carry it into the next block
+            remainder = lines.pop(0)
+            offset = position + len(remainder) + 1
+            parsed = []
+            for raw in lines:
+                parsed.append((offset, raw))
+                offset += len(raw) + 1
+            for line_offset, raw in reversed(parsed):
+                if raw:
+                    yield line_offset, raw.decode("utf-8", errors="replace")
+        if remainder:
+            yield 0, remainder.decode("utf-8", errors="replace")
+
+
+def iter_records_backwards(path, before=None):
+    """
+    Yield (offset, lines) for each log record from the end of ``path``.
+
+    A record is a timestamped line plus the traceback or ``Stack:`` lines
+    logged with it, oldest first; ``offset`` is where the record begins.
+    Continuation lines at the very start of the file form a record of
+    their own.
+    """
+    continuation = []
+    first_offset = None
+    for offset, line in iter_lines_backwards(path, before):
+        timestamp, _ = parse_line(line)
+        if timestamp is None:
+            continuation.append(line)
+            first_offset = offset
+            continue
+        yield offset, [line] + continuation[::-1]
+        continuation = []
+    if continuation:
+        yield first_offset, continuation[::-1]
+
+
+def matches(line, level=None, since=None, until=None):
+    if not (level or since or until):
+        return True
+    timestamp, line_level = parse_line(line)
+    if timestamp is None:
+        return False
+    if level and (line_level not in LEVELS or LEVELS.index(line_level) < LEVELS.index(level)):
+        return False
+    if since and timestamp < since:
+        return False
+    if until and timestamp >= until:
+        return False
+    return True
+
+
+def tail(path, limit=200, before=None, level=None, since=None, until=None):
+    """
+    Return about ``limit`` matching lines ending before byte offset ``before``.
+
+    Lines come back oldest first together with the cursor for the previous
+    page (None once the start of the file is reached). ``level`` keeps that
+    level and anything more severe. Filters apply to whole records, so a
+    matching line keeps its traceback. Scanning stops early once lines are
+    older than ``since``.
+    """
+    if not os.path.exists(path):
+        return [], None
+    found = []
+    next_before = None
+    for offset, record in iter_records_backwards(path, before):
+        if since:
+            timestamp, _ = parse_line(record[0])
+            if timestamp is not None and timestamp < since:
+                return list(reversed(found)), None
+        if matches(record[0], level, since, until):
+            found.extend(reversed(record))
+            if len(found) >= limit:
+                next_before = offset if offset > 0 else None
+                break
+    return list(reversed(found)), next_before
@@ -0,0 +1,251 @@
+# memdiag.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+import os
+import gc
+import sys
+import logging
+import datetime
+import threading
+import tracemalloc
+from collections import deque, Counter
+import metrics
+import utils
+from events import get_event_store
+from logindex import get_log_index
+from notifications import get_notification_feed, notify
+from tracing import get_tracer
+
+# Python wrapper types worth watching for leaks; counted with one gc pass on request
+WATCHED_TYPES = ("AlertDialog", "QTimer", "QLabel", "QVBoxLayout", "Thread", "dict", "list")
+
+def current_rss():
+    """Resident set size in bytes, or None where it cannot be read."""
+    try:
+        if sys.platform.startswith("linux"):
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [
+                    ("cb", wintypes.DWORD),
+                    ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t),
+                    ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t),
+                    ("PeakPagefileUsage", ctypes.c_size_t),
+                ]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            process = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize
+            return None
+        import resource
+
+        # ru_maxrss is the peak, in bytes on macOS and KiB elsewhere
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except Exception:
+        return None
+
+
+PROCESS_RSS = metrics.gauge("hoogland_process_rss_bytes", "Resident set size of the Hoogland process.")
+PROCESS_RSS.set_function(current_rss)
+
+
+def subsystem_counts():
+    """Sizes of the app's in-memory buffers."""
+    counts = {}
+    probes = {
+        "notification feed entries": lambda: len(get_notification_feed().items),
+        "event store write queue": lambda: get_event_store().queue.qsize(),
+        "email queue": lambda: utils._email_queue.qsize(),
+        "trace write queue": lambda: get_tracer().queue.qsize(),
+        "log index cached segments": lambda: len(get_log_index().segment_cache),
+    }
+    # Read the presenter without creating it: it is a QObject and must be
+    # built on the GUI thread, not on a waitress worker
+    presenter = getattr(sys.modules.get("alerts"), "_presenter", None)
+    if presenter is not None:
+        probes["open alert dialogs"] = lambda: len(presenter.open_alerts)
+        probes["queued alerts"] = lambda: len(presenter.pending)
+    for name, probe in probes.items():
+        try:
+            counts[name] = probe()
+        except Exception as e:
+            logging.error(f"Memory probe '{name}' failed: {str(e)}")
+    return counts
+
+
+def object_counts():
+    """Live instances of WATCHED_TYPES. Walks the whole heap, so only run on request."""
+    types = Counter(type(obj).__name__ for obj in gc.get_objects())
+    return {type_name: types.get(type_name, 0) for type_name in WATCHED_TYPES}
+
+
+class MemoryMonitor:
+    """
+    Periodic tracemalloc snapshots for tracking slow growth over weeks.
+
+    Only the baseline and the two most recent snapshots are kept, so the
+    monitor's own footprint stays flat. Each new
+    snapshot is diffed against both, and a warning goes out whenever RSS
+    grows another ``warn_mb`` past the baseline.
+    """
+
+    def __init__(self, interval_minutes=30, warn_mb=50, frames=10, history=96):
+        self.interval = interval_minutes * 60
+        self.warn_bytes = warn_mb * 1024 * 1024
+        self.frames = frames
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.baseline = None
+        self.previous = None
+        self.latest = None
+        self.baseline_rss = None
+        self.next_warning_rss = None
+        self.samples = deque(maxlen=history)
+        self.growth_since_previous = []
+        self.growth_since_baseline = []
+        self.object_counts = None
+        self.object_counts_time = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        with self.lock:
+            if self.running:
+                return False
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+            # A fresh event, so a previous thread still waking up cannot carry on
+            self.stopped = threading.Event()
+            self.thread = threading.Thread(target=self._run, args=(self.stopped,), name="MemoryMonitor", daemon=True)
+            self.thread.start()
+            logging.info("Memory diagnostics started")
+            return True
+
+    def stop(self):
+        with self.lock:
+            self.stopped.set()
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            self.baseline = self.previous = self.latest = None
+            self.baseline_rss = self.next_warning_rss = None
+            logging.info("Memory diagnostics stopped")
+
+    def _run(self, stopped):
+        while not stopped.is_set():
+            self.take_snapshot()
+            stopped.wait(self.interval)
+
+    def _snapshot(self):
+        snapshot = tracemalloc.take_snapshot()
+        return snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+    @staticmethod
+    def _top_growth(snapshot, reference, limit):
+        rows = []
+        for stat in snapshot.compare_to(reference, "lineno")[: limit * 2]:
+            if stat.size_diff <= 0:
+                continue
+            frame = stat.traceback[0]
+            rows.append({
+                "site": f"{frame.filename}:{frame.lineno}",
+                "size_diff_kb": round(stat.size_diff / 1024, 1),
+                "size_kb": round(stat.size / 1024, 1),
+                "count_diff": stat.count_diff,
+            })
+        return rows[:limit]
+
+    def take_snapshot(self, limit=15):
+        """Snapshot now, update the growth reports and warn if RSS crossed the threshold."""
+        with self.lock:
+            if not tracemalloc.is_tracing():
+                return None
+            snapshot = self._snapshot()
+            traced, peak = tracemalloc.get_traced_memory()
+            rss = current_rss()
+            self.samples.append({
+                "time": datetime.datetime.now().isoformat(timespec="seconds"),
+                "rss": rss,
+                "traced": traced,
+                "traced_peak": peak,
+            })
+            if self.baseline is None:
+                self.baseline = snapshot
+                self.baseline_rss = rss
+                if rss is not None:
+                    self.next_warning_rss = rss + self.warn_bytes
+            else:
+                self.previous = self.latest
+                self.growth_since_baseline = self._top_growth(snapshot, self.baseline, limit)
+                if self.previous is not None:
+                    self.growth_since_previous = self._top_growth(snapshot, self.previous, limit)
+            self.latest = snapshot
+            if rss is not None and self.next_warning_rss is not None and rss >= self.next_warning_rss:
+                grown_mb = (rss - self.baseline_rss) / (1024 * 1024)
+                top = self.growth_since_baseline[0]["site"] if self.growth_since_baseline else "unknown"
+                message = f"Memory grew {grown_mb:.0f} MB since diagnostics started (RSS {rss / (1024 * 1024):.0f} MB); top growth at {top}"
+                logging.warning(message)
+                notify(message, "memory")
+                while self.next_warning_rss <= rss:
+                    self.next_warning_rss += self.warn_bytes
+            return self.samples[-1]
+
+    def count_objects(self):
+        """Run the gc walk once and keep the result for the page."""
+        counts = object_counts()
+        with self.lock:
+            self.object_counts = counts
+            self.object_counts_time = datetime.datetime.now().isoformat(timespec="seconds")
+        return counts
+
+    def status(self):
+        with self.lock:
+            return {
+                "running": self.running,
+                "interval_minutes": self.interval / 60,
+                "warn_mb": self.warn_bytes / (1024 * 1024),
+                "rss": current_rss(),
+                "baseline_rss": self.baseline_rss,
+                "traced": tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else None,
+                "samples": list(self.samples),
+                "growth_since_previous": list(self.growth_since_previous),
+                "growth_since_baseline": list(self.growth_since_baseline),
+                "object_counts": self.object_counts,
+                "object_counts_time": self.object_counts_time,
+            }
+
+
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+def get_memory_monitor(config=None):
+    global _monitor
+    with _monitor_lock:
+        if _monitor is None:
+            config = config or {}
+            _monitor = MemoryMonitor(
+                interval_minutes=float(config.get("memory_snapshot_interval_minutes", 30)),
+                warn_mb=float(config.get("memory_growth_warn_mb", 50)),
+                frames=int(config.get("memory_trace_frames", 10)),
+            )
+        return _monitor
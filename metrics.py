@@ -0,0 +1,279 @@
+# metrics.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+import time
+import bisect
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        self.lock = threading.Lock()
+        if not self.labelnames:
+            self.children[()] = self._new_child()
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        child = self.children.get(values)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(values, self._new_child())
+        return child
+
+    def _default(self):
+        return self.children[()]
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self.children.items()):
+            lines.extend(self._expose_child(values, child))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def _expose_child(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class _GaugeChild:
+    def __init__(self):
+        self.value = 0.0
+        self.function = None
+        self.lock = threading.Lock()
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set_function(self, function):
+        """Compute the value at scrape time instead of storing it."""
+        self.function = function
+
+    def get(self):
+        return self.function() if self.function else self.value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default().set(value)
+
+    def set_function(self, function):
+        self._default().set_function(function)
+
+    def _expose_child(self, values, child):
+        try:
+            value = child.get()
+        except Exception:
+            return []
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(float(value))}"]
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+    def _expose_child(self, values, child):
+        with child.lock:
+            counts = list(child.counts)
+            total_sum = child.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, ("le", _format_value(float(bound))))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total_sum)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    Process-wide set of metrics rendered by ``/metrics``.
+
+    Updates take only the per-series lock, and scrapes read values without
+    touching config.json or the event store.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def expose(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=()):
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name, documentation, labelnames=()):
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+ALERTS_FIRED = counter("hoogland_alerts_fired_total", "Alerts fired, including queued ones.")
+ALERTS_ACKNOWLEDGED = counter("hoogland_alerts_acknowledged_total", "Alerts acknowledged by an operator.")
+ALERT_EVENTS = counter("hoogland_alert_events_total", "Alert lifecycle events recorded.", ["event"])
+ACK_LATENCY = histogram(
+    "hoogland_acknowledgement_latency_seconds",
+    "Time from an alert being shown to its acknowledgement.",
+    buckets=(1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 1800),
+)
+EMAIL_QUEUE_DEPTH = gauge("hoogland_email_queue_depth", "Emails waiting for the background sender.")
+EMAIL_SEND_SECONDS = histogram("hoogland_email_send_seconds", "Time spent sending one email over SMTP.")
+SMTP_FAILURES = counter("hoogland_smtp_failures_total", "Emails that failed to send.")
+CONFIG_LOADS = counter("hoogland_config_loads_total", "Times config.json was loaded from disk.")
+UPDATE_CHECK_SECONDS = histogram("hoogland_update_check_seconds", "Duration of one update check.")
+UPDATE_MANIFEST_FETCHES = counter(
+    "hoogland_update_manifest_fetches_total", "Update manifest requests by outcome.", ["result"]
+)
+UPDATE_DOWNLOAD_BYTES = counter("hoogland_update_download_bytes_total", "Bytes downloaded for updates.")
+UPDATE_MIRROR_FETCHES = counter(
+    "hoogland_update_mirror_fetches_total", "Update files requested from the LAN mirror, by outcome.", ["result"]
+)
+UPDATE_DELTAS = counter(
+    "hoogland_update_deltas_total", "Executable delta updates, applied or fallen back to a full download.", ["result"]
+)
+WATCHDOG_RESTARTS = counter("hoogland_watchdog_restarts_total", "Workers restarted after missing a heartbeat.", ["thread"])
+THREAD_HEARTBEAT_AGE = gauge(
+    "hoogland_thread_heartbeat_age_seconds", "Seconds since a worker thread last reported progress.", ["thread"]
+)
+
+_heartbeats = {}
+
+
+def heartbeat(thread_name):
+    """Record that ``thread_name`` is alive; exported as a heartbeat age."""
+    first = thread_name not in _heartbeats
+    _heartbeats[thread_name] = time.monotonic()
+    if first:
+        THREAD_HEARTBEAT_AGE.labels(thread_name).set_function(
+            lambda: time.monotonic() - _heartbeats[thread_name]
+        )
+
+
+def heartbeat_age(thread_name):
+    """Seconds since ``thread_name`` last beat, or None if it never has."""
+    last = _heartbeats.get(thread_name)
+    return None if last is None else time.monotonic() - last
+
+
+def expose():
+    return REGISTRY.expose()
@@ -0,0 +1,286 @@
+# notifications.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+import os
+import json
+import time
+import logging
+import threading
+import socketserver
+from collections import deque
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlsplit
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from config import app_data_dir
+from logviewer import iter_lines_backwards
+
+notifications_path = os.path.join(app_data_dir, "notifications.jsonl")
+
+
+class NotificationFeed:
+    """
+    Bounded in-memory ring of recent notifications, backed by a JSONL file.
+
+    Only the newest ``capacity`` entries are kept in memory. The file is
+    appended to on every publish and trimmed back to ``capacity`` entries
+    once it grows past ``4 * capacity``, so neither grows without bound.
+    """
+
+    def __init__(self, path=notifications_path, capacity=200):
+        self.path = path
+        self.capacity = capacity
+        self.items = deque(maxlen=capacity)
+        self.condition = threading.Condition()
+        self.last_id = 0
+        self.lines_on_disk = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        loaded = []
+        try:
+            for _, line in iter_lines_backwards(self.path):
+                loaded.append(json.loads(line))
+                if len(loaded) >= self.capacity:
+                    break
+        except Exception as e:
+            logging.error(f"Failed to load notifications: {str(e)}")
+        self.items.extend(reversed(loaded))
+        self.lines_on_disk = len(loaded)
+        if self.items:
+            self.last_id = self.items[-1]["id"]
+
+    def publish(self, text, kind="info"):
+        with self.condition:
+            self.last_id += 1
+            item = {"id": self.last_id, "ts": time.time(), "kind": kind, "text": text}
+            self.items.append(item)
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(item) + "\n")
+                self.lines_on_disk += 1
+                if self.lines_on_disk > 4 * self.capacity:
+                    self._trim()
+            except Exception as e:
+                logging.error(f"Failed to persist notification: {str(e)}")
+            self.condition.notify_all()
+        return item
+
+    def _trim(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for item in self.items:
+                f.write(json.dumps(item) + "\n")
+        os.replace(temp_path, self.path)
+        self.lines_on_disk = len(self.items)
+
+    def recent(self, limit=None):
+        with self.condition:
+            items = list(self.items)
+        return items[-limit:] if limit else items
+
+    def since(self, last_id):
+        with self.condition:
+            return [item for item in self.items if item["id"] > last_id]
+
+    def wait(self, last_id, timeout):
+        """Block until something newer than ``last_id`` is published or ``timeout`` passes."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.last_id > last_id, timeout)
+            return [item for item in self.items if item["id"] > last_id]
+
+
+def format_sse(item):
+    return f"id: {item['id']}\nevent: notification\ndata: {json.dumps(item)}\n\n"
+
+
+STREAM_TOKEN_SALT = "notification-stream"
+# A page keeps reconnecting with the token it was rendered with
+STREAM_TOKEN_MAX_AGE = 12 * 3600
+
+
+def stream_token(secret_key, user_id):
+    return URLSafeTimedSerializer(secret_key, salt=STREAM_TOKEN_SALT).dumps(str(user_id))
+
+
+def check_stream_token(secret_key, token):
+    try:
+        URLSafeTimedSerializer(secret_key, salt=STREAM_TOKEN_SALT).loads(token, max_age=STREAM_TOKEN_MAX_AGE)
+        return True
+    except BadSignature:
+        return False
+
+
+class _StreamHandler(BaseHTTPRequestHandler):
+    timeout = 10
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        stream = self.server.stream
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if url.path != "/notifications/stream" or not check_stream_token(
+            stream.secret_key, query.get("token", [""])[0]
+        ):
+            self.send_error(403)
+            return
+        try:
+            last_id = int(self.headers.get("Last-Event-ID") or query.get("last_id", ["0"])[0])
+        except ValueError:
+            last_id = 0
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        # The page is served from the waitress port; the token, not a cookie, authorizes the stream
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+        stream.park(self.connection, last_id)
+
+
+class _StreamListener(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def shutdown_request(self, request):
+        # Parked sockets belong to the broadcaster now
+        if not self.stream.is_parked(request):
+            super().shutdown_request(request)
+
+
+class NotificationStream:
+    """
+    Pushes the notification feed to browsers as Server-Sent Events without
+    holding waitress workers.
+
+    It listens on its own port. A short-lived thread per connection checks
+    the signed token and writes the response headers, then parks the
+    socket. One broadcaster thread writes each new notification, or a
+    keep-alive every ``heartbeat_seconds``, to every parked socket. At most
+    ``max_streams`` sockets are parked; further browsers are told to retry
+    later.
+    """
+
+    def __init__(self, feed, secret_key, host="0.0.0.0", port=5001, max_streams=20, heartbeat_seconds=15):
+        self.feed = feed
+        self.secret_key = secret_key
+        self.max_streams = max_streams
+        self.heartbeat_seconds = heartbeat_seconds
+        self.lock = threading.Lock()
+        # socket -> id of the last notification written to it
+        self.clients = {}
+        self.stopped = threading.Event()
+        self.listener = _StreamListener((host, port), _StreamHandler)
+        self.listener.stream = self
+        self.port = self.listener.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.listener.serve_forever, name="NotificationStream", daemon=True).start()
+        threading.Thread(target=self._broadcast_loop, name="NotificationBroadcast", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.listener.shutdown()
+        self.listener.server_close()
+        with self.lock:
+            for sock in list(self.clients):
+                self._drop(sock)
+
+    def url(self, host, token, last_id):
+        return f"http://{host}:{self.port}/notifications/stream?token={token}&last_id={last_id}"
+
+    def is_parked(self, sock):
+        with self.lock:
+            return sock in self.clients
+
+    def park(self, sock, last_id):
+        with self.lock:
+            if len(self.clients) >= self.max_streams:
+                self._send(sock, b"retry: 15000\n\n")
+                return
+            sock.settimeout(2)
+            self.clients[sock] = last_id
+            self._write(sock, self.feed.since(last_id), b"retry: 2000\n\n")
+
+    def _broadcast_loop(self):
+        last_id = self.feed.last_id
+        while not self.stopped.is_set():
+            items = self.feed.wait(last_id, self.heartbeat_seconds)
+            with self.lock:
+                for sock, seen in list(self.clients.items()):
+                    fresh = [item for item in items if item["id"] > seen]
+                    if fresh or not items:
+                        self._write(sock, fresh, b"" if fresh else b": keep-alive\n\n")
+            if items:
+                last_id = items[-1]["id"]
+
+    def _write(self, sock, items, prefix=b""):
+        """Send ``items`` to a parked socket, or drop it if the browser is gone. Called under self.lock."""
+        if not self._send(sock, prefix + "".join(format_sse(item) for item in items).encode()):
+            self._drop(sock)
+        elif items:
+            self.clients[sock] = items[-1]["id"]
+
+    @staticmethod
+    def _send(sock, data):
+        try:
+            sock.sendall(data)
+            return True
+        except OSError:
+            return False
+
+    def _drop(self, sock):
+        self.clients.pop(sock, None)
+        try:
+            sock.close()
+        except OSError:
+            pass
+
+    def status(self):
+        with self.lock:
+            return {"port": self.port, "streams": len(self.clients), "max_streams": self.max_streams}
+
+
+_feed = None
+_feed_lock = threading.Lock()
+
+
+def get_notification_feed():
+    global _feed
+    with _feed_lock:
+        if _feed is None:
+            _feed = NotificationFeed()
+        return _feed
+
+
+def notify(text, kind="info"):
+    try:
+        return get_notification_feed().publish(text, kind)
+    except Exception as e:
+        logging.error(f"Failed to publish notification: {str(e)}")
+        return None
+
+
+_stream = None
+_stream_lock = threading.Lock()
+
+
+def start_notification_stream(secret_key, host="0.0.0.0", port=5001, max_streams=20):
+    """Start the SSE listener once; returns it, or None if the port is unavailable."""
+    global _stream
+    with _stream_lock:
+        if _stream is None:
+            try:
+                _stream = NotificationStream(get_notification_feed(), secret_key, host, port, max_streams).start()
+            except OSError as e:
+                logging.error(f"Failed to start notification stream on port {port}: {str(e)}")
+        return _stream
+
+
+def get_notification_stream():
+    return _stream
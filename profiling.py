@@ -0,0 +1,204 @@
+# profiling.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+import os
+import sys
+import time
+import datetime
+import threading
+import traceback
+from collections import Counter
+
+# Leaf frames in these modules are threads parked on a lock, socket or queue
+IDLE_MODULES = ("threading.py", "selectors.py", "socket.py", "queue.py", "ssl.py", "socketserver.py")
+
+
+# QThreads are invisible to threading.enumerate(); they name themselves here
+# instead of through threading.current_thread(), which would leave a
+# _DummyThread behind. ident -> (name, native_id)
+_named_threads = {}
+
+
+def name_thread(name):
+    """Label the calling QThread in stack dumps, profiles and traces."""
+    _named_threads[threading.get_ident()] = (name, threading.get_native_id())
+
+
+def current_thread_name():
+    named = _named_threads.get(threading.get_ident())
+    return named[0] if named else threading.current_thread().name
+
+
+def live_threads():
+    """Return {ident: (name, native_id)} for every thread that is running now."""
+    live = sys._current_frames().keys()
+    for ident in [ident for ident in list(_named_threads) if ident not in live]:
+        _named_threads.pop(ident, None)
+    threads = dict(_named_threads)
+    threads.update({thread.ident: (thread.name, thread.native_id) for thread in threading.enumerate()})
+    main = threading.main_thread()
+    threads[main.ident] = ("MainThread (Qt)", main.native_id)
+    return threads
+
+
+def thread_names():
+    return {ident: name for ident, (name, _) in live_threads().items()}
+
+
+def dump_all_stacks():
+    """Return a text dump of every Python thread's current stack, QThreads included."""
+    names = thread_names()
+    frames = sys._current_frames()
+    lines = [f"Thread stack dump at {datetime.datetime.now().isoformat(timespec='seconds')} ({len(frames)} threads)", ""]
+    for ident, frame in sorted(frames.items(), key=lambda item: names.get(item[0], "~")):
+        lines.append(f"--- {names.get(ident, 'unnamed')} (ident {ident}) ---")
+        lines.extend(line.rstrip("\n") for line in traceback.format_stack(frame))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _cpu_clock(native_id):
+    """
+    Per-thread CPU clock id on Linux, else None.
+
+    Built from the kernel thread id the way glibc does (CPUCLOCK_SCHED |
+    CPUCLOCK_PERTHREAD) rather than with pthread_getcpuclockid(), which
+    dereferences the pthread handle and can crash on a thread that has
+    just exited. A stale id here only makes clock_gettime raise OSError.
+    """
+    if native_id is None or not sys.platform.startswith("linux"):
+        return None
+    return (~native_id << 3) | 6
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler that samples every thread's stack on a timer.
+
+    Every ``interval`` seconds the sampler reads ``sys._current_frames()``
+    and counts the stacks, so the profiled code runs unmodified. A sample
+    counts as on-CPU when the thread's CPU clock advanced since the last
+    sample; without per-thread clocks (Windows, or threads the sampler
+    cannot identify) threads whose leaf frame is
+    a lock or socket wait are treated as idle instead. Only on-CPU samples
+    feed the hot-path report; the collapsed stacks keep everything.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_requested = threading.Event()
+        self.result = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, seconds=10, interval=0.01):
+        with self.lock:
+            if self.running:
+                return False
+            self.stop_requested.clear()
+            self.thread = threading.Thread(
+                target=self._run, args=(seconds, interval), name="SamplingProfiler", daemon=True
+            )
+            self.thread.start()
+            return True
+
+    def stop(self):
+        self.stop_requested.set()
+
+    def _run(self, seconds, interval):
+        own_ident = threading.get_ident()
+        stacks = Counter()
+        self_counts = Counter()
+        total_counts = Counter()
+        thread_samples = Counter()
+        cpu_times = {}
+        samples = 0
+        active_samples = 0
+        started = datetime.datetime.now()
+        start = time.perf_counter()
+        deadline = start + seconds
+        while time.perf_counter() < deadline and not self.stop_requested.is_set():
+            threads = live_threads()
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                leaf_file = os.path.basename(frame.f_code.co_filename)
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.reverse()
+                name, native_id = threads.get(ident, (f"thread-{ident}", None))
+                stacks[";".join([name] + labels)] += 1
+                samples += 1
+                if not self._on_cpu(ident, native_id, leaf_file, cpu_times):
+                    continue
+                active_samples += 1
+                thread_samples[name] += 1
+                self_counts[labels[-1]] += 1
+                for label in set(labels):
+                    total_counts[label] += 1
+            time.sleep(interval)
+        self.result = {
+            "started": started.isoformat(timespec="seconds"),
+            "seconds": round(time.perf_counter() - start, 1),
+            "interval_ms": interval * 1000,
+            "samples": samples,
+            "active_samples": active_samples,
+            "stacks": stacks,
+            "self_counts": self_counts,
+            "total_counts": total_counts,
+            "thread_samples": thread_samples,
+        }
+
+    @staticmethod
+    def _on_cpu(ident, native_id, leaf_file, cpu_times):
+        clock = _cpu_clock(native_id)
+        if clock is not None:
+            try:
+                now = time.clock_gettime(clock)
+            except OSError:
+                now = None
+            if now is not None:
+                previous = cpu_times.get(ident)
+                cpu_times[ident] = now
+                return previous is not None and now > previous
+        return leaf_file not in IDLE_MODULES
+
+    def collapsed(self):
+        """Folded stacks ("frame;frame;frame count" per line) for flamegraph.pl or speedscope."""
+        if not self.result:
+            return ""
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.result["stacks"].items()))
+
+    def hot_paths(self, limit=30):
+        """Functions ranked by on-CPU samples where they were the leaf, with inclusive counts."""
+        if not self.result:
+            return []
+        active = max(1, self.result["active_samples"])
+        rows = []
+        for label, total in self.result["total_counts"].most_common():
+            own = self.result["self_counts"].get(label, 0)
+            rows.append({
+                "function": label,
+                "self": own,
+                "total": total,
+                "self_pct": round(100 * own / active, 1),
+                "total_pct": round(100 * total / active, 1),
+            })
+        rows.sort(key=lambda row: (row["self"], row["total"]), reverse=True)
+        return rows[:limit]
+
+
+_profiler = SamplingProfiler()
+
+
+def get_profiler():
+    return _profiler
@@ -0,0 +1,341 @@
+# reports.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+import json
+import bisect
+import logging
+import datetime
+import threading
+from config import load_config
+from events import EVENT_CODES, get_event_store
+from utils import send_email
+
+# Geometric bucket bounds in seconds, 0.5s up to roughly 3 hours
+LATENCY_BUCKETS = [0.5 * 1.25 ** i for i in range(40)]
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket histogram of response times.
+
+    Adding a sample and reading a percentile both cost O(number of buckets),
+    independent of how many samples were seen, and two histograms merge by
+    adding their counts.
+    """
+
+    def __init__(self, counts=None):
+        self.counts = list(counts) if counts else [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = sum(self.counts)
+
+    def add(self, seconds, count=1):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += count
+        self.total += count
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+
+    def percentile(self, pct):
+        if not self.total:
+            return None
+        rank = pct / 100 * self.total
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return LATENCY_BUCKETS[min(index, len(LATENCY_BUCKETS) - 1)]
+        return LATENCY_BUCKETS[-1]
+
+
+def shift_window(config, when):
+    """Return the (start, end) datetimes of the shift containing ``when``, or None."""
+    start_time = datetime.datetime.strptime(config["start_time"], "%H:%M").time()
+    end_time = datetime.datetime.strptime(config["end_time"], "%H:%M").time()
+    for day_offset in (0, -1):
+        day = when.date() + datetime.timedelta(days=day_offset)
+        start_dt = datetime.datetime.combine(day, start_time)
+        end_dt = datetime.datetime.combine(day, end_time)
+        if end_dt <= start_dt:
+            end_dt += datetime.timedelta(days=1)
+        if start_dt <= when < end_dt:
+            return start_dt, end_dt
+    return None
+
+
+class ShiftAggregator:
+    """
+    Running totals for one shift, updated as alert events are committed.
+
+    Adding the same event twice has no effect, so a replay from the event
+    store may overlap with events delivered to the subscriber. Alerts
+    neither acknowledged nor closed by the end of the shift are counted
+    as missed by ``close()``.
+    """
+
+    def __init__(self, start_dt, end_dt, late_after_seconds):
+        self.start_dt = start_dt
+        self.end_dt = end_dt
+        self.start_ms = int(start_dt.timestamp() * 1000)
+        self.end_ms = int(end_dt.timestamp() * 1000)
+        self.late_after_seconds = late_after_seconds
+        self.alerts = 0
+        self.acknowledged = 0
+        self.missed = 0
+        self.closed_unacknowledged = 0
+        self.late = 0
+        self.escalated = 0
+        # alert_id -> operator for alerts fired this shift and not yet dealt with
+        self.open = {}
+        self.seen = set()
+        self.response_sum = 0.0
+        self.response_max = 0.0
+        self.histogram = LatencyHistogram()
+        self.operators = {}
+
+    def add(self, ts_ms, alert_id, event_code, operator, value):
+        if not self.start_ms <= ts_ms < self.end_ms:
+            return
+        key = (ts_ms, alert_id, event_code)
+        if key in self.seen:
+            return
+        self.seen.add(key)
+        stats = self.operators.setdefault(
+            operator or "unknown", {"alerts": 0, "acknowledged": 0, "missed": 0, "late": 0}
+        )
+        if event_code == EVENT_CODES["fired"]:
+            self.alerts += 1
+            stats["alerts"] += 1
+            self.open[alert_id] = operator or "unknown"
+        elif event_code == EVENT_CODES["acknowledged"] and value is not None:
+            self.open.pop(alert_id, None)
+            self.acknowledged += 1
+            stats["acknowledged"] += 1
+            self.response_sum += value
+            self.response_max = max(self.response_max, value)
+            self.histogram.add(value)
+            if value > self.late_after_seconds:
+                self.late += 1
+                stats["late"] += 1
+        elif event_code == EVENT_CODES["escalated"]:
+            self.escalated += 1
+        elif event_code == EVENT_CODES["closed_unacknowledged"]:
+            self.open.pop(alert_id, None)
+            self.closed_unacknowledged += 1
+        elif event_code == EVENT_CODES["missed"]:
+            self.open.pop(alert_id, None)
+
+    def close(self):
+        """Count the alerts still open as missed; returns {alert_id: operator} for them."""
+        missed = dict(self.open)
+        for operator in missed.values():
+            self.operators.setdefault(operator, {"alerts": 0, "acknowledged": 0, "missed": 0, "late": 0})
+            self.operators[operator]["missed"] += 1
+        self.missed += len(missed)
+        self.open.clear()
+        return missed
+
+    def report(self):
+        return {
+            "shift_start": self.start_dt.isoformat(timespec="minutes"),
+            "shift_end": self.end_dt.isoformat(timespec="minutes"),
+            "alerts": self.alerts,
+            "acknowledged": self.acknowledged,
+            "missed": self.missed,
+            "closed_unacknowledged": self.closed_unacknowledged,
+            "late": self.late,
+            "escalated": self.escalated,
+            "open": len(self.open),
+            "late_threshold_minutes": self.late_after_seconds / 60,
+            "response_mean_seconds": self.response_sum / self.acknowledged if self.acknowledged else None,
+            "response_p50_seconds": self.histogram.percentile(50),
+            "response_p90_seconds": self.histogram.percentile(90),
+            "response_p99_seconds": self.histogram.percentile(99),
+            "response_max_seconds": self.response_max if self.acknowledged else None,
+            "operators": self.operators,
+        }
+
+
+REPORTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shift_reports (
+    shift_start INTEGER PRIMARY KEY,
+    shift_end INTEGER NOT NULL,
+    report TEXT NOT NULL,
+    emailed INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def format_report(report):
+    def seconds(value):
+        return "n/a" if value is None else f"{value:.1f}s"
+
+    lines = [
+        f"Shift {report['shift_start']} - {report['shift_end']}",
+        f"Alerts: {report['alerts']}",
+        f"Acknowledged: {report['acknowledged']}",
+        f"Missed: {report['missed']}",
+        f"Closed without acknowledging: {report['closed_unacknowledged']}",
+        f"Late (> {report['late_threshold_minutes']:g} min): {report['late']}",
+        f"Escalated by email: {report.get('escalated', 0)}",
+        f"Response time p50/p90/p99: {seconds(report['response_p50_seconds'])} / "
+        f"{seconds(report['response_p90_seconds'])} / {seconds(report['response_p99_seconds'])}",
+        f"Response time mean/max: {seconds(report['response_mean_seconds'])} / {seconds(report['response_max_seconds'])}",
+    ]
+    for operator, stats in sorted(report["operators"].items()):
+        lines.append(
+            f"  {operator}: {stats['alerts']} alerts, {stats['acknowledged']} acknowledged, "
+            f"{stats['missed']} missed, {stats['late']} late"
+        )
+    return "\n".join(lines)
+
+
+class ShiftReporter:
+    """
+    Keeps a ShiftAggregator for the running shift and finalizes it at shift end.
+
+    Finished reports are stored in the event database and emailed once; the
+    emailed flag survives restarts so a report is never sent twice.
+    """
+
+    def __init__(self, store=None, check_interval=60):
+        self.store = store or get_event_store()
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.current = None
+        self.pending_checked = False
+        self.stopped = threading.Event()
+        conn = self.store.connect()
+        try:
+            conn.executescript(REPORTS_SCHEMA)
+        finally:
+            conn.close()
+        # Subscribe first so nothing committed during the replay is lost
+        self.store.subscribe(self.on_events)
+        self._roll(datetime.datetime.now(), rebuild=True)
+        self.thread = threading.Thread(target=self._run, name="ShiftReporter", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def _new_aggregator(self, now):
+        config = load_config()
+        window = shift_window(config, now)
+        if window is None:
+            return None
+        late_after = float(config.get("report_if_longer_than_minutes", 5)) * 60
+        return ShiftAggregator(window[0], window[1], late_after)
+
+    def _roll(self, now, rebuild=False):
+        aggregator = self._new_aggregator(now)
+        with self.lock:
+            if aggregator is not None and rebuild:
+                # Only the running shift is replayed, never the whole history. Under the
+                # lock, batches committed meanwhile wait for the swap and add() drops the overlap.
+                for event in self.store.iter_events(start=aggregator.start_ms / 1000, end=aggregator.end_ms / 1000):
+                    aggregator.add(
+                        round(event["ts"] * 1000),
+                        event["alert_id"],
+                        EVENT_CODES.get(event["event"]),
+                        event["operator"],
+                        event["value"],
+                    )
+            self.current = aggregator
+
+    def on_events(self, rows):
+        with self.lock:
+            if self.current is None:
+                return
+            for ts_ms, alert_id, event_code, operator, value, _ in rows:
+                self.current.add(ts_ms, alert_id, event_code, operator, value)
+
+    def current_report(self):
+        with self.lock:
+            return self.current.report() if self.current else None
+
+    def _run(self):
+        while not self.stopped.wait(self.check_interval):
+            try:
+                self.check()
+            except Exception as e:
+                logging.error(f"Shift report check failed: {str(e)}")
+
+    def check(self, now=None):
+        now = now or datetime.datetime.now()
+        with self.lock:
+            finished = self.current if self.current and now >= self.current.end_dt else None
+        if finished is not None:
+            self.store.flush()
+            self.finalize(finished)
+            # Events from the new shift may have landed before this check; replay them
+            self._roll(now, rebuild=True)
+        elif self.current is None:
+            self.store.flush()
+            self._roll(now, rebuild=True)
+        if finished is not None or not self.pending_checked:
+            # Retry reports whose email failed on startup and at each shift end
+            self.pending_checked = True
+            self.send_pending()
+
+    def finalize(self, aggregator):
+        with self.lock:
+            missed = aggregator.close()
+            report = aggregator.report()
+        conn = self.store.connect()
+        try:
+            with conn:
+                inserted = conn.execute(
+                    "INSERT OR IGNORE INTO shift_reports (shift_start, shift_end, report) VALUES (?, ?, ?)",
+                    (aggregator.start_ms, aggregator.end_ms, json.dumps(report)),
+                ).rowcount
+        finally:
+            conn.close()
+        if inserted:
+            # Recorded in the closing shift so rollups and history count the misses too
+            for alert_id, operator in missed.items():
+                self.store.record("missed", alert_id, operator, ts=(aggregator.end_ms - 1) / 1000)
+        logging.info(f"Shift report finalized for {report['shift_start']}")
+        return report
+
+    def send_pending(self):
+        conn = self.store.connect()
+        try:
+            pending = conn.execute(
+                "SELECT shift_start, report FROM shift_reports WHERE emailed = 0 ORDER BY shift_start"
+            ).fetchall()
+            for shift_start, report in pending:
+                report = json.loads(report)
+                if send_email(load_config(), f"Hoogland Shift Report {report['shift_start']}", format_report(report)):
+                    with conn:
+                        conn.execute("UPDATE shift_reports SET emailed = 1 WHERE shift_start = ?", (shift_start,))
+        finally:
+            conn.close()
+
+    def recent_reports(self, limit=14):
+        conn = self.store.connect()
+        try:
+            rows = conn.execute(
+                "SELECT report, emailed FROM shift_reports ORDER BY shift_start DESC LIMIT ?", (limit,)
+            ).fetchall()
+        finally:
+            conn.close()
+        reports = []
+        for report, emailed in rows:
+            report = json.loads(report)
+            report["emailed"] = bool(emailed)
+            reports.append(report)
+        return reports
+
+
+_reporter = None
+_reporter_lock = threading.Lock()
+
+
+def get_shift_reporter():
+    global _reporter
+    with _reporter_lock:
+        if _reporter is None:
+            _reporter = ShiftReporter()
+        return _reporter
@@ -0,0 +1,282 @@
+# rollups.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+import logging
+import datetime
+import threading
+from array import array
+from config import load_config
+from events import EVENT_CODES, get_event_store
+from reports import LATENCY_BUCKETS, LatencyHistogram
+
+GRANULARITIES = ("hour", "day")
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollup_{granularity} (
+    bucket_start INTEGER NOT NULL,
+    operator TEXT NOT NULL,
+    alerts INTEGER NOT NULL DEFAULT 0,
+    acknowledged INTEGER NOT NULL DEFAULT 0,
+    missed INTEGER NOT NULL DEFAULT 0,
+    closed_unacknowledged INTEGER NOT NULL DEFAULT 0,
+    late INTEGER NOT NULL DEFAULT 0,
+    response_sum REAL NOT NULL DEFAULT 0,
+    response_max REAL NOT NULL DEFAULT 0,
+    histogram BLOB,
+    PRIMARY KEY (bucket_start, operator)
+);
+"""
+
+# Highest events rowid already folded into the rollups, updated in the same transaction
+STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollup_state (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+COUNTERS = ("alerts", "acknowledged", "missed", "closed_unacknowledged", "late")
+
+
+def bucket_start(ts, granularity):
+    """Start of the local hour or day containing Unix time ``ts``, as Unix seconds."""
+    moment = datetime.datetime.fromtimestamp(ts)
+    if granularity == "hour":
+        moment = moment.replace(minute=0, second=0, microsecond=0)
+    else:
+        moment = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return int(moment.timestamp())
+
+
+def pack_histogram(counts):
+    return array("I", counts).tobytes()
+
+
+def unpack_histogram(blob):
+    counts = array("I")
+    if blob:
+        counts.frombytes(blob)
+    if len(counts) != len(LATENCY_BUCKETS) + 1:
+        return array("I", [0] * (len(LATENCY_BUCKETS) + 1))
+    return counts
+
+
+def new_row():
+    return {
+        "alerts": 0,
+        "acknowledged": 0,
+        "missed": 0,
+        "closed_unacknowledged": 0,
+        "late": 0,
+        "response_sum": 0.0,
+        "response_max": 0.0,
+        "histogram": LatencyHistogram(),
+    }
+
+
+def merge_row(target, source):
+    for name in COUNTERS:
+        target[name] += source[name]
+    target["response_sum"] += source["response_sum"]
+    target["response_max"] = max(target["response_max"], source["response_max"])
+    target["histogram"].merge(source["histogram"])
+
+
+class HistoryRollups:
+    """
+    Hourly and daily aggregates of alert events, kept current as events commit.
+
+    Each batch from the event store is folded into per-bucket deltas in memory
+    and then upserted, so dashboard queries only ever read these small tables.
+    Response-time sketches are fixed-bucket histograms packed as uint32 arrays
+    and merged bucket by bucket.
+
+    The rowid of the last event folded is stored with the rollups. Each
+    commit folds everything after it, so events committed before the
+    subscription started, or just before a crash, are picked up later.
+    """
+
+    def __init__(self, store=None):
+        self.store = store or get_event_store()
+        self.lock = threading.Lock()
+        conn = self.store.connect()
+        try:
+            for granularity in GRANULARITIES:
+                conn.executescript(ROLLUP_SCHEMA.format(granularity=granularity))
+            conn.executescript(STATE_SCHEMA)
+            tracked = self._watermark(conn) is not None
+            has_events = conn.execute("SELECT 1 FROM events LIMIT 1").fetchone() is not None
+        finally:
+            conn.close()
+        self.store.subscribe(self.on_events)
+        if not tracked and has_events:
+            # Rollups from before the watermark existed cannot be trusted to be complete
+            self.rebuild()
+        else:
+            self.catch_up()
+
+    @staticmethod
+    def _watermark(conn):
+        row = conn.execute("SELECT value FROM rollup_state WHERE name = 'last_event_rowid'").fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _set_watermark(conn, rowid):
+        conn.execute("INSERT OR REPLACE INTO rollup_state (name, value) VALUES ('last_event_rowid', ?)", (rowid,))
+
+    def _fold(self, rows, late_after):
+        deltas = {}
+        for _, ts_ms, _, event_code, operator, value, _ in rows:
+            ts = ts_ms / 1000
+            for granularity in GRANULARITIES:
+                key = (granularity, bucket_start(ts, granularity), operator or "unknown")
+                row = deltas.get(key)
+                if row is None:
+                    row = deltas[key] = new_row()
+                if event_code == EVENT_CODES["fired"]:
+                    row["alerts"] += 1
+                elif event_code == EVENT_CODES["acknowledged"] and value is not None:
+                    row["acknowledged"] += 1
+                    row["response_sum"] += value
+                    row["response_max"] = max(row["response_max"], value)
+                    row["histogram"].add(value)
+                    if value > late_after:
+                        row["late"] += 1
+                elif event_code == EVENT_CODES["missed"]:
+                    row["missed"] += 1
+                elif event_code == EVENT_CODES["closed_unacknowledged"]:
+                    row["closed_unacknowledged"] += 1
+        return deltas
+
+    def _apply(self, conn, deltas):
+        for (granularity, start, operator), delta in deltas.items():
+            existing = conn.execute(
+                f"SELECT alerts, acknowledged, missed, closed_unacknowledged, late, response_sum, response_max, histogram "
+                f"FROM rollup_{granularity} WHERE bucket_start = ? AND operator = ?",
+                (start, operator),
+            ).fetchone()
+            if existing:
+                row = dict(zip(COUNTERS, existing[:5]))
+                row["response_sum"], row["response_max"] = existing[5], existing[6]
+                row["histogram"] = LatencyHistogram(unpack_histogram(existing[7]))
+                merge_row(row, delta)
+            else:
+                row = delta
+            conn.execute(
+                f"INSERT OR REPLACE INTO rollup_{granularity} "
+                f"(bucket_start, operator, alerts, acknowledged, missed, closed_unacknowledged, late, response_sum, response_max, histogram) "
+                f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (start, operator, *(row[name] for name in COUNTERS), row["response_sum"], row["response_max"],
+                 pack_histogram(row["histogram"].counts)),
+            )
+
+    def on_events(self, rows):
+        # The committed batch only signals that there is something new; the rows folded
+        # are read back by rowid, so nothing is counted twice or skipped
+        self.catch_up()
+
+    def catch_up(self, chunk_size=5000):
+        """Fold every event committed after the stored watermark."""
+        late_after = float(load_config().get("report_if_longer_than_minutes", 5)) * 60
+        with self.lock:
+            conn = self.store.connect()
+            try:
+                with conn:
+                    watermark = self._watermark(conn) or 0
+                    newest = conn.execute("SELECT MAX(rowid) FROM events").fetchone()[0] or 0
+                    if newest < watermark:
+                        # Retention emptied the table and rowids started again from 1
+                        watermark = 0
+                    self._fold_after(conn, watermark, late_after, chunk_size)
+            finally:
+                conn.close()
+
+    def _fold_after(self, conn, watermark, late_after, chunk_size):
+        cursor = conn.execute(
+            "SELECT rowid, ts, alert_id, event, operator, value, detail FROM events WHERE rowid > ? ORDER BY rowid",
+            (watermark,),
+        )
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            self._apply(conn, self._fold(rows, late_after))
+            watermark = rows[-1][0]
+        self._set_watermark(conn, watermark)
+
+    def rebuild(self, chunk_size=5000):
+        """Recompute every rollup from the raw event log; only needed once after upgrading."""
+        logging.info("Rebuilding alert history rollups from the event log")
+        late_after = float(load_config().get("report_if_longer_than_minutes", 5)) * 60
+        with self.lock:
+            conn = self.store.connect()
+            try:
+                with conn:
+                    for granularity in GRANULARITIES:
+                        conn.execute(f"DELETE FROM rollup_{granularity}")
+                    self._fold_after(conn, 0, late_after, chunk_size)
+            finally:
+                conn.close()
+
+    def series(self, granularity="day", start=None, end=None, operator=None):
+        """
+        Return one point per bucket between ``start`` and ``end`` (Unix seconds).
+
+        Without an operator filter the per-operator rows of each bucket are merged.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("bucket_start >= ?")
+            params.append(int(start))
+        if end is not None:
+            clauses.append("bucket_start < ?")
+            params.append(int(end))
+        if operator:
+            clauses.append("operator = ?")
+            params.append(operator)
+        sql = (
+            f"SELECT bucket_start, alerts, acknowledged, missed, closed_unacknowledged, late, "
+            f"response_sum, response_max, histogram FROM rollup_{granularity}"
+        )
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY bucket_start"
+
+        buckets = {}
+        conn = self.store.connect()
+        try:
+            for record in conn.execute(sql, params):
+                row = dict(zip(COUNTERS, record[1:6]))
+                row["response_sum"], row["response_max"] = record[6], record[7]
+                row["histogram"] = LatencyHistogram(unpack_histogram(record[8]))
+                if record[0] in buckets:
+                    merge_row(buckets[record[0]], row)
+                else:
+                    buckets[record[0]] = row
+        finally:
+            conn.close()
+
+        points = []
+        for start_ts, row in sorted(buckets.items()):
+            histogram = row.pop("histogram")
+            row["bucket_start"] = start_ts
+            row["response_mean_seconds"] = row["response_sum"] / row["acknowledged"] if row["acknowledged"] else None
+            row["response_p50_seconds"] = histogram.percentile(50)
+            row["response_p90_seconds"] = histogram.percentile(90)
+            row["response_p99_seconds"] = histogram.percentile(99)
+            points.append(row)
+        return points
+
+
+_rollups = None
+_rollups_lock = threading.Lock()
+
+
+def get_rollups():
+    global _rollups
+    with _rollups_lock:
+        if _rollups is None:
+            _rollups = HistoryRollups()
+        return _rollups
@@ -2,30 +2,53 @@
 # Copyright (c) 2025 DJ Kruger
 # Licensed under the MIT License.
 import os
+import re
+import hmac
 import json
-import random
+import time
+import datetime
 import queue
 import logging
-from flask import Flask, render_template, request, redirect, url_for, send_file, flash
+from flask import (
+    Flask, Response, render_template, stream_template, request, redirect, url_for, send_file, flash, jsonify,
+    get_flashed_messages,
+)
 from flask_login import login_required, logout_user, current_user, login_user
 from werkzeug.utils import secure_filename
 from mutagen.mp3 import MP3
 from config import load_config, save_config, cipher, app_data_dir, config_path
 from auth import User, validate_password, ph
 from utils import send_credentials_email, send_email, resource_path
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-
-def register_routes(app: Flask):
+from challenges import next_challenge
+from events import get_event_store, new_alert_id
+from reports import get_shift_reporter
+from rollups import get_rollups
+from export import iter_export, parse_time, export_filename
+from logviewer import tail, LEVELS
+from logindex import get_log_index
+from notifications import get_notification_feed, get_notification_stream, stream_token
+from tracing import trace, get_tracer
+from profiling import get_profiler, dump_all_stacks
+from memdiag import get_memory_monitor, subsystem_counts
+from updater import mirror_dir
+import metrics
+
+def register_routes(app: Flask, popup_queue=None):
     """
     Register all Flask routes for the Hoogland application.
 
     Args:
         app (Flask): The Flask application instance.
+        popup_queue (queue.Queue): Queue consumed by ManualPopupThread for manual popup triggers.
     """
     # Initialize queue for manual popup triggers
-    popup_queue = queue.Queue()
+    if popup_queue is None:
+        popup_queue = queue.Queue()
+
+    startup_config = load_config()
+    # Read once so scrapes never touch config.json; a new token needs a restart
+    metrics_token = startup_config.get("metrics_token", "")
+    update_mirror_serve = startup_config.get("update_mirror_serve", False)
 
     @app.route("/", methods=["GET"])
     def index():
@@ -176,7 +199,9 @@ def register_routes(app: Flask):
                         "random_sound_max_seconds": int(request.form["random_sound_max_seconds"]),
                         "use_custom_sounds": "use_custom_sounds" in request.form,
                         "expected_hash": request.form["expected_hash"],
-                        "enable_math_popup": "enable_math_popup" in request.form
+                        "enable_math_popup": "enable_math_popup" in request.form,
+                        "max_concurrent_popups": int(request.form.get("max_concurrent_popups", config.get("max_concurrent_popups", 3))),
+                        "math_difficulty": int(request.form.get("math_difficulty", config.get("math_difficulty", 2)))
                     }
                     save_config(new_config)
                     flash("Configuration updated successfully.", "success")
@@ -288,16 +313,14 @@ def register_routes(app: Flask):
         message = request.form.get("message", "Manual Popup Triggered")
         play_sound = request.form.get("play_sound", "on") == "on"
 
+        alert_id = new_alert_id()
+        trace(alert_id, "manual_trigger", user=current_user.id, message=message)
         if message == "Solve a math problem" and config.get("enable_math_popup"):
-            num1 = random.randint(1, 100)
-            num2 = random.randint(1, 100)
-            operation = random.choice(["+", "-"])
-            problem = f"{num1} {operation} {num2}"
-            solution = eval(problem)
-            popup_queue.put({"message": f"Solve this: {problem}", "play_sound": play_sound, "solution": solution})
+            challenge = next_challenge(config)
+            popup_queue.put({"message": f"Solve this: {challenge.prompt}", "play_sound": play_sound, "solution": challenge.answer, "alert_id": alert_id})
             flash("Math popup triggered successfully.", "success")
         else:
-            popup_queue.put({"message": message, "play_sound": play_sound})
+            popup_queue.put({"message": message, "play_sound": play_sound, "alert_id": alert_id})
             flash("Popup triggered successfully.", "success")
 
         return redirect(url_for("admin" if current_user.role == "admin" else "user_dashboard"))
@@ -427,14 +450,221 @@ def register_routes(app: Flask):
             return redirect(url_for("user_dashboard"))
 
         log_file = os.path.join(app_data_dir, "app.log")
-        logs = []
-        if os.path.exists(log_file):
-            try:
-                with open(log_file, "r", encoding="utf-8") as f:
-                    logs = f.readlines()
-            except Exception as e:
-                flash(f"Failed to read logs: {str(e)}", "error")
-        return render_template("logs.html", logs=logs)
+        lines = min(max(request.args.get("lines", 200, type=int), 1), 5000)
+        before = request.args.get("before", type=int)
+        level = request.args.get("level") if request.args.get("level") in LEVELS else None
+        logs, next_before = [], None
+        try:
+            since = datetime.datetime.fromisoformat(request.args["since"]) if request.args.get("since") else None
+            until = datetime.datetime.fromisoformat(request.args["until"]) if request.args.get("until") else None
+            if request.args.get("q"):
+                # Search covers rotated segments too, newest first
+                logs = list(reversed(get_log_index().search(request.args["q"], since, until, lines, level)))
+            else:
+                logs, next_before = tail(log_file, lines, before, level, since, until)
+        except ValueError:
+            flash("Invalid time filter. Use YYYY-MM-DD or YYYY-MM-DDTHH:MM.", "error")
+        except Exception as e:
+            flash(f"Failed to read logs: {str(e)}", "error")
+        filters = {key: request.args.get(key) for key in ("lines", "level", "since", "until", "q") if request.args.get(key)}
+        # The session cookie is sent before a streamed body renders, so flashes are taken here
+        messages = get_flashed_messages(with_categories=True)
+        return stream_template(
+            "logs.html", logs=logs, next_before=next_before, filters=filters, levels=LEVELS, messages=messages
+        )
+
+    @app.route("/alert_events", methods=["GET"])
+    @login_required
+    def alert_events():
+        """Return alert lifecycle events as JSON, filtered by time range and operator."""
+        if current_user.role != "admin":
+            flash("Access denied: Admin privileges required.", "error")
+            return redirect(url_for("user_dashboard"))
+
+        try:
+            start = request.args.get("start", type=float)
+            end = request.args.get("end", type=float)
+            limit = min(request.args.get("limit", 1000, type=int), 10000)
+            events = get_event_store().query(
+                start=start, end=end, operator=request.args.get("operator") or None, limit=limit
+            )
+        except Exception as e:
+            logging.error(f"Failed to query alert events: {str(e)}")
+            return jsonify({"error": str(e)}), 400
+        return jsonify(events)
+
+    @app.route("/shift_report", methods=["GET"])
+    @login_required
+    def shift_report():
+        """Display the running shift totals and recent end-of-shift reports."""
+        if current_user.role != "admin":
+            flash("Access denied: Admin privileges required.", "error")
+            return redirect(url_for("user_dashboard"))
+
+        reporter = get_shift_reporter()
+        return render_template(
+            "shift_report.html", current=reporter.current_report(), reports=reporter.recent_reports()
+        )
+
+    @app.route("/alert_trace", methods=["GET"])
+    @app.route("/alert_trace/<alert_id>", methods=["GET"])
+    @login_required
+    def alert_trace(alert_id=None):
+        """Show the traced timeline of one alert, or a list of recently traced alerts."""
+        if current_user.role != "admin":
+            flash("Access denied: Admin privileges required.", "error")
+            return redirect(url_for("user_dashboard"))
+
+        tracer = get_tracer()
+        if alert_id:
+            return render_template("alert_trace.html", alert_id=alert_id, spans=tracer.timeline(alert_id), alerts=None)
+        return render_template("alert_trace.html", alert_id=None, spans=None, alerts=tracer.recent_alerts())
+
+    @app.route("/profiling", methods=["GET", "POST"])
+    @login_required
+    def profiling():
+        """Start or stop the sampling profiler and show its hot-path report."""
+        if current_user.role != "admin":
+            flash("Access denied: Admin privileges required.", "error")
+            return redirect(url_for("user_dashboard"))
+
+        profiler = get_profiler()
+        if request.method == "POST":
+            if request.form.get("action") == "stop":
+                profiler.stop()
+                flash("Profiler stopping.", "success")
+            else:
+                try:
+                    seconds = min(300, max(1, int(request.form.get("seconds", 10))))
+                    interval_ms = min(1000, max(1, int(request.form.get("interval_ms", 10))))
+                except ValueError:
+                    flash("Duration and interval must be whole numbers.", "error")
+                    return redirect(url_for("profiling"))
+                if profiler.start(seconds, interval_ms / 1000):
+                    logging.info(f"Sampling profiler started by {current_user.id} for {seconds}s")
+                    flash(f"Profiling for {seconds} seconds.", "success")
+                else:
+                    flash("The profiler is already running.", "error")
+            return redirect(url_for("profiling"))
+
+        return render_template(
+            "profiling.html", running=profiler.running, result=profiler.result, hot_paths=profiler.hot_paths()
+        )
+
+    @app.route("/profiling/collapsed", methods=["GET"])
+    @login_required
+    def profiling_collapsed():
+        """Download the last profile as collapsed stacks for flamegraph tools."""
+        if current_user.role != "admin":
+            flash("Access denied: Admin privileges required.", "error")
+            return redirect(url_for("user_dashboard"))
+
+        profiler = get_profiler()
+        if not profiler.result:
+            flash("No profile has been recorded yet.", "error")
+            return redirect(url_for("profiling"))
+        return Response(
+            profiler.collapsed(),
+            mimetype="text/plain",
+            headers={"Content-Disposition": f"attachment; filename=hoogland_{time.strftime('%Y%m%d_%H%M%S')}.folded"},
+        )
+
+    @app.route("/profiling/stacks", methods=["GET"])
+    @login_required
+    def profiling_stacks():
+        """Show the current stack of every thread."""
+        if current_user.role != "admin":
+            flash("Access denied: Admin privileges required.", "error")
+            return redirect(url_for("user_dashboard"))
+
+        return Response(dump_all_stacks(), mimetype="text/plain")
+
+    @app.route("/memory", methods=["GET", "POST"])
+    @login_required
+    def memory():
+        """Show RSS, tracemalloc growth sites and subsystem object counts."""
+        if current_user.role != "admin":
+            flash("Access denied: Admin privileges required.", "error")
+            return redirect(url_for("user_dashboard"))
+
+        monitor = get_memory_monitor(load_config())
+        if request.method == "POST":
+            action = request.form.get("action")
+            if action == "start":
+                monitor.start()
+                flash("Memory diagnostics started.", "success")
+            elif action == "stop":
+                monitor.stop()
+                flash("Memory diagnostics stopped.", "success")
+            elif action == "snapshot":
+                if monitor.take_snapshot() is None:
+                    flash("Start memory diagnostics before taking a snapshot.", "error")
+                else:
+                    flash("Snapshot taken.", "success")
+            elif action == "count_objects":
+                monitor.count_objects()
+                flash("Objects counted.", "success")
+            return redirect(url_for("memory"))
+
+        return render_template("memory.html", status=monitor.status(), counts=subsystem_counts())
+
+    @app.route("/history", methods=["GET"])
+    @login_required
+    def history():
+        """Display response-time and miss charts built from the history rollups."""
+        if current_user.role != "admin":
+            flash("Access denied: Admin privileges required.", "error")
+            return redirect(url_for("user_dashboard"))
+
+        return render_template("history.html")
+
+    @app.route("/history.json", methods=["GET"])
+    @login_required
+    def history_json():
+        """Return hourly or daily rollups as JSON; never touches the raw event log."""
+        if current_user.role != "admin":
+            return jsonify({"error": "Admin privileges required."}), 403
+
+        granularity = request.args.get("granularity", "day")
+        days = request.args.get("days", 28 if granularity == "day" else 2, type=int)
+        end = time.time()
+        try:
+            points = get_rollups().series(
+                granularity, start=end - days * 86400, end=end + 86400, operator=request.args.get("operator") or None
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({"granularity": granularity, "points": points})
+
+    @app.route("/export_history", methods=["GET"])
+    @login_required
+    def export_history():
+        """Stream alert history as CSV or JSONL, optionally gzipped."""
+        if current_user.role != "admin":
+            flash("Access denied: Admin privileges required.", "error")
+            return redirect(url_for("user_dashboard"))
+
+        fmt = request.args.get("format", "csv")
+        compress = request.args.get("gzip") in ("1", "true", "on")
+        try:
+            chunks = iter_export(
+                get_event_store(),
+                start=parse_time(request.args.get("start")),
+                end=parse_time(request.args.get("end")),
+                operator=request.args.get("operator") or None,
+                fmt=fmt,
+                compress=compress,
+            )
+        except ValueError as e:
+            flash(f"Invalid export request: {str(e)}", "error")
+            return redirect(url_for("history"))
+
+        mimetype = "application/gzip" if compress else ("text/csv" if fmt == "csv" else "application/x-ndjson")
+        return Response(
+            chunks,
+            mimetype=mimetype,
+            headers={"Content-Disposition": f"attachment; filename={export_filename(fmt, compress)}"},
+        )
 
     @app.route("/get_notifications", methods=["GET"])
     @login_required
@@ -444,9 +674,37 @@ def register_routes(app: Flask):
             flash("Access denied: Admin privileges required.", "error")
             return redirect(url_for("user_dashboard"))
 
-        # Placeholder: Replace with actual notification storage if implemented
-        notifications = []  # Example: ["Alert missed at 10:00", "Update available"]
-        return render_template("notifications.html", notifications=notifications)
+        notifications = list(reversed(get_notification_feed().recent()))
+        last_id = notifications[0]["id"] if notifications else 0
+        # Live updates come from the notification stream's own port, never a waitress worker.
+        # It speaks plain HTTP, which a page served over HTTPS may not load.
+        stream = get_notification_stream()
+        stream_url = None
+        if stream is not None and request.scheme == "http":
+            host = request.host.rpartition(":")[0] if request.host.rpartition(":")[2].isdigit() else request.host
+            stream_url = stream.url(host, stream_token(app.secret_key, current_user.id), last_id)
+        return render_template("notifications.html", notifications=notifications, stream_url=stream_url)
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics_endpoint():
+        """Expose internal counters and histograms in Prometheus text format."""
+        if metrics_token:
+            supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+            if not hmac.compare_digest(supplied, metrics_token):
+                return Response(status=401)
+        elif request.remote_addr not in ("127.0.0.1", "::1"):
+            return Response(status=403)
+        return Response(metrics.expose(), mimetype="text/plain; version=0.0.4")
+
+    @app.route("/updates/files/<file_hash>", methods=["GET"])
+    def update_mirror_file(file_hash):
+        """Serve a verified update file to other stations on the LAN by its SHA-256."""
+        if not update_mirror_serve or not re.fullmatch(r"[0-9a-f]{64}", file_hash):
+            return Response(status=404)
+        path = os.path.join(mirror_dir, file_hash)
+        if not os.path.isfile(path):
+            return Response(status=404)
+        return send_file(path, mimetype="application/octet-stream", conditional=True, max_age=86400)
 
     @app.route("/download_backup", methods=["GET"])
     @login_required
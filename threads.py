@@ -8,77 +8,141 @@ import logging
 import sys
 import subprocess
 import queue
-import requests
 import threading
 from PyQt6.QtCore import QThread, pyqtSignal
-from config import load_config
+from config import load_config, save_config
 from utils import calculate_executable_hash, send_email
-import hashlib
+from challenges import next_challenge, start_shift
+from events import new_alert_id
+from integrity import get_integrity_verifier
+from tracing import trace
+from profiling import name_thread
+from updater import (
+    UpdateError,
+    download_release,
+    fetch_manifest,
+    initial_check_delay,
+    install_staged,
+    installed_version,
+    is_newer,
+    next_check_delay,
+    publish_to_mirror,
+    record_installed_version,
+    recover_interrupted_update,
+    retry_after_seconds,
+    stage_executable,
+    update_lock,
+)
+import metrics
 
 
-class MainLogicThread(QThread):
-    trigger_popup = pyqtSignal(str, bool)
+def schedule_window(config, now):
+    """Return the (start, end) datetimes MainLogicThread schedules against at ``now``."""
+    start_time = datetime.datetime.strptime(config["start_time"], "%H:%M").time()
+    end_time = datetime.datetime.strptime(config["end_time"], "%H:%M").time()
+
+    if start_time > end_time:
+        start_dt = now.replace(hour=start_time.hour, minute=start_time.minute, second=0)
+        if now.time() < end_time:
+            start_dt -= datetime.timedelta(days=1)
+        end_dt = start_dt + datetime.timedelta(days=1)
+        end_dt = end_dt.replace(hour=end_time.hour, minute=end_time.minute, second=0)
+    else:
+        start_dt = now.replace(hour=start_time.hour, minute=start_time.minute, second=0)
+        end_dt = now.replace(hour=end_time.hour, minute=end_time.minute, second=0)
+    return start_dt, end_dt
+
+
+class WorkerThread(QThread):
+    """
+    Long-running worker that reports heartbeats to the watchdog.
+
+    Workers call ``sleep()`` instead of ``time.sleep()`` so they keep
+    beating while idle and wake promptly on shutdown. A worker the watchdog
+    has replaced is ``retired`` and leaves its loop as soon as it unblocks.
+    """
 
     def __init__(self, stop_event):
         super().__init__()
-        self.config = load_config()
         self.stop_event = stop_event
+        self.retired = threading.Event()
+        self.thread_ident = None
+
+    @property
+    def watch_name(self):
+        return type(self).__name__
+
+    def running(self):
+        return not (self.stop_event.is_set() or self.retired.is_set())
+
+    def beat(self):
+        if self.thread_ident is None:
+            self.thread_ident = threading.get_ident()
+            name_thread(self.watch_name)
+        metrics.heartbeat(self.watch_name)
+
+    def sleep(self, seconds, step=15):
+        """Sleep up to ``seconds``, beating every ``step``; False if the worker should stop."""
+        deadline = time.monotonic() + max(0, seconds)
+        while self.running():
+            self.beat()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True
+            self.stop_event.wait(min(step, remaining))
+        return False
+
+    def retire(self):
+        self.retired.set()
+
+
+class MainLogicThread(WorkerThread):
+    trigger_popup = pyqtSignal(str, bool, object, str)
+
+    def __init__(self, stop_event):
+        super().__init__(stop_event)
+        self.config = load_config()
+        self.shift_start = None
         logging.info("MainLogicThread initialized successfully")
 
     def run(self):
         logging.info("MainLogicThread started")
-        current_hash = calculate_executable_hash()
-        if current_hash and current_hash != self.config["expected_hash"]:
-            send_email(
-                self.config,
-                "Integrity Check Failed",
-                f"Hash mismatch: expected {self.config['expected_hash']}, got {current_hash}",
-            )
-
-        while not self.stop_event.is_set():
+        while self.running():
+            self.beat()
             try:
                 self.config = load_config()
                 now = datetime.datetime.now()
-                start_time = datetime.datetime.strptime(
-                    self.config["start_time"], "%H:%M"
-                ).time()
-                end_time = datetime.datetime.strptime(
-                    self.config["end_time"], "%H:%M"
-                ).time()
-
-                if start_time > end_time:
-                    start_dt = now.replace(
-                        hour=start_time.hour, minute=start_time.minute, second=0
-                    )
-                    if now.time() < end_time:
-                        start_dt -= datetime.timedelta(days=1)
-                    end_dt = start_dt + datetime.timedelta(days=1)
-                    end_dt = end_dt.replace(
-                        hour=end_time.hour, minute=end_time.minute, second=0
-                    )
-                else:
-                    start_dt = now.replace(
-                        hour=start_time.hour, minute=start_time.minute, second=0
-                    )
-                    end_dt = now.replace(
-                        hour=end_time.hour, minute=end_time.minute, second=0
-                    )
+                start_dt, end_dt = schedule_window(self.config, now)
 
                 if now < start_dt:
-                    time.sleep((start_dt - now).total_seconds())
+                    self.sleep((start_dt - now).total_seconds())
                     continue
 
                 if now < end_dt:
+                    if start_dt != self.shift_start:
+                        self.shift_start = start_dt
+                        start_shift()
                     total_seconds = (end_dt - now).total_seconds()
                     if total_seconds <= 0:
-                        time.sleep(60)
+                        self.sleep(60)
                         continue
                     wait_time = random.uniform(0, total_seconds)
-                    time.sleep(wait_time)
-                    self.trigger_popup.emit("Security Alert", True)
-                    time.sleep((end_dt - datetime.datetime.now()).total_seconds() + 60)
+                    if not self.sleep(wait_time):
+                        break
+                    # The ID is created here so every span, from this decision
+                    # to the escalation email, shares it
+                    alert_id = new_alert_id()
+                    if self.config.get("enable_math_popup"):
+                        challenge = next_challenge(self.config)
+                        message, solution = f"Solve this: {challenge.prompt}", challenge.answer
+                    else:
+                        message, solution = "Security Alert", None
+                    trace(alert_id, "decision", waited_s=round(wait_time, 1), message=message)
+                    trace(alert_id, "emit")
+                    self.trigger_popup.emit(message, True, solution, alert_id)
+                    self.sleep((end_dt - datetime.datetime.now()).total_seconds() + 60)
                 else:
-                    time.sleep(60)
+                    self.sleep(60)
             except Exception as e:
                 logging.error(f"Error in MainLogicThread: {str(e)}")
                 send_email(
@@ -86,18 +150,18 @@ class MainLogicThread(QThread):
                     "Thread Error",
                     f"MainLogicThread encountered an error: {str(e)}",
                 )
-                time.sleep(60)
+                self.sleep(60)
 
 
-class SoundThread(QThread):
+class SoundThread(WorkerThread):
     def __init__(self, config, stop_event):
-        super().__init__()
+        super().__init__(stop_event)
         self.config = config
-        self.stop_event = stop_event
 
     def run(self):
         logging.info("SoundThread started")
-        while not self.stop_event.is_set():
+        while self.running():
+            self.beat()
             now = datetime.datetime.now()
             start_time = datetime.datetime.strptime(
                 self.config["start_time"], "%H:%M"
@@ -116,7 +180,8 @@ class SoundThread(QThread):
                     self.config["random_sound_min_seconds"],
                     self.config["random_sound_max_seconds"],
                 )
-                time.sleep(wait_time)
+                if not self.sleep(wait_time):
+                    break
                 try:
                     from pygame import mixer
 
@@ -137,17 +202,21 @@ class SoundThread(QThread):
                         f"Failed to play random sound: {str(e)}",
                     )
             else:
-                time.sleep(60)
+                self.sleep(60)
 
 
-class UpdateCheckerThread(QThread):
+class UpdateCheckerThread(WorkerThread):
     update_available = pyqtSignal(str)
+    # Command line to start once the GUI thread has shut the app down
+    restart_requested = pyqtSignal(list)
 
     def __init__(self, config, stop_event):
-        super().__init__()
+        super().__init__(stop_event)
         self.config = config
-        self.stop_event = stop_event
-        self.current_version = "1.0.0"
+        self.current_version = installed_version(
+            calculate_executable_hash() if getattr(sys, "frozen", False) else None
+        )
+        self.last_retry_after = None
         self.app_dir = (
             os.path.dirname(sys.executable)
             if getattr(sys, "frozen", False)
@@ -157,43 +226,109 @@ class UpdateCheckerThread(QThread):
 
     def run(self):
         logging.info("UpdateCheckerThread started")
-        while not self.stop_event.is_set():
+        self.beat()
+        try:
+            # Waits for a checker the watchdog replaced, rather than rolling back its install
+            with update_lock(self.app_dir, self.beat):
+                recover_interrupted_update(self.app_dir)
+        except Exception as e:
+            logging.error(f"Failed to recover interrupted update: {str(e)}")
+        # Stations that boot together should not all check at the same moment
+        if not self.sleep(initial_check_delay(self.config)):
+            return
+        failures = 0
+        while self.running():
+            self.beat()
+            check_started = time.perf_counter()
+            retry_after = None
             try:
-                response = requests.get(self.config["update_url"], timeout=5)
-                response.raise_for_status()
-                update_data = response.json()
-                latest_version = update_data.get("version")
-                if latest_version and latest_version > self.current_version:
-                    self.apply_update(update_data)
+                update_data = self.check_for_update()
+                if not update_data:
+                    logging.info("No update available")
+                    failures = 0
+                elif self.apply_update(update_data):
+                    latest_version = update_data["version"]
                     self.update_available.emit(f"Updated to {latest_version}")
                     self.current_version = latest_version
+                    failures = 0
                 else:
-                    logging.info("No update available")
+                    failures += 1
+                    retry_after = self.last_retry_after
             except Exception as e:
+                failures += 1
+                retry_after = retry_after_seconds(getattr(e, "response", None))
                 logging.error(f"Update check failed: {str(e)}")
-            time.sleep(3600)
+            metrics.UPDATE_CHECK_SECONDS.observe(time.perf_counter() - check_started)
+            delay = next_check_delay(self.config, failures, retry_after)
+            logging.info(f"Next update check in {delay / 60:.1f} minutes")
+            self.sleep(delay)
+
+    def check_for_update(self):
+        """Fetch the update manifest; return it if it offers a newer version, else None."""
+        update_data = fetch_manifest(self.config["update_url"])
+        latest_version = update_data.get("version")
+        if latest_version and is_newer(latest_version, self.current_version):
+            return update_data
+        return None
 
     def apply_update(self, update_data):
+        """Download, verify and install an update; returns False if the install was left unchanged."""
         from utils import send_email
 
         changes = update_data.get("changes", {})
-        expected_hashes = update_data.get("hashes", {})
-        for file_name, url in changes.items():
-            response = requests.get(url, timeout=5)
-            response.raise_for_status()
-            content = response.content
-            if hashlib.sha256(content).hexdigest() == expected_hashes.get(file_name):
-                with open(os.path.join(self.app_dir, file_name), "wb") as f:
-                    f.write(content)
-                logging.info(f"Updated {file_name}")
-            else:
-                logging.error(f"Hash mismatch for {file_name}")
-                send_email(
-                    self.config, "Update Error", f"Hash mismatch for {file_name}"
+        version = update_data.get("version")
+        frozen = getattr(sys, "frozen", False)
+        mirror_url = self.config.get("update_mirror_url") or None
+        executable = None
+        self.last_retry_after = None
+        try:
+            # Beat per downloaded chunk, so a slow link is not mistaken for a hang
+            with update_lock(self.app_dir, self.beat):
+                staged = download_release(
+                    update_data,
+                    self.app_dir,
+                    workers=self.config.get("update_download_workers", 4),
+                    mirror_url=mirror_url,
+                    progress=self.beat,
                 )
+                if frozen and update_data.get("executable"):
+                    staged_executable = stage_executable(
+                        update_data,
+                        self.app_dir,
+                        sys.executable,
+                        calculate_executable_hash(),
+                        mirror_url=mirror_url,
+                        progress=self.beat,
+                    )
+                    if staged_executable:
+                        executable, staged_path = staged_executable
+                        staged[executable] = staged_path
+                if self.config.get("update_mirror_serve"):
+                    publish_to_mirror(update_data, staged)
+                install_staged(staged, self.app_dir, version, self.beat)
+        except UpdateError as e:
+            self.last_retry_after = e.retry_after
+            logging.error(f"Update to {version} aborted: {str(e)}")
+            send_email(self.config, "Update Error", f"Update to {version} aborted: {str(e)}")
+            return False
+
+        if executable:
+            self.record_executable_hash(update_data["executable"]["hash"])
+        record_installed_version(
+            version, update_data["executable"]["hash"] if frozen and update_data.get("executable") else None
+        )
+        try:
+            # The new files are the installation now; hashing them also warms the cache
+            get_integrity_verifier(self.config).verify(rebaseline=True, progress=self.beat)
+        except Exception as e:
+            logging.error(f"Failed to record integrity baseline after update: {str(e)}")
+        if executable:
+            logging.info("Restarting into the updated executable")
+            self.request_restart([os.path.join(self.app_dir, executable)] + sys.argv[1:])
+            return True
 
         if "requirements.txt" in changes:
-            if getattr(sys, "frozen", False):
+            if frozen:
                 self.update_available.emit(
                     f"New dependencies detected. Please download the latest installer from {update_data.get('download_url', 'unknown URL')}"
                 )
@@ -218,27 +353,53 @@ class UpdateCheckerThread(QThread):
                         f"Failed to update dependencies: {str(e)}",
                     )
 
-        if "app.py" in changes:
+        # Any changed module only takes effect once the process is restarted
+        if any(name.endswith(".py") for name in changes):
             logging.info("Restarting app to apply update")
-            subprocess.Popen([sys.executable] + sys.argv)
-            sys.exit(0)
+            self.request_restart([sys.executable] + sys.argv)
+        return True
 
+    def request_restart(self, command):
+        """
+        Ask the GUI thread to shut down and start ``command``. sys.exit() here
+        would only end this QThread; retiring first keeps the watchdog from
+        rebuilding the checker while the app winds down.
+        """
+        self.retire()
+        self.restart_requested.emit(command)
 
-class ManualPopupThread(QThread):
-    trigger_popup = pyqtSignal(str, bool)
+    def record_executable_hash(self, new_hash):
+        """Keep the integrity check from flagging the executable we just installed."""
+        config = load_config()
+        if config.get("expected_hash"):
+            config["expected_hash"] = new_hash
+            save_config(config)
+        self.config["expected_hash"] = config["expected_hash"]
 
-    def __init__(self, stop_event):
-        super().__init__()
-        self.stop_event = stop_event
+
+class ManualPopupThread(WorkerThread):
+    trigger_popup = pyqtSignal(str, bool, object, str)
+
+    def __init__(self, stop_event, popup_queue):
+        super().__init__(stop_event)
+        self.popup_queue = popup_queue
         logging.info("ManualPopupThread initialized successfully")
 
     def run(self):
         logging.info("ManualPopupThread started")
-        while not self.stop_event.is_set():
+        while self.running():
+            self.beat()
             try:
-                popup_data = queue.Queue().get(timeout=1.0)
-                self.trigger_popup.emit(popup_data["message"], popup_data["play_sound"])
-                queue.task_done()
+                popup_data = self.popup_queue.get(timeout=1.0)
+                alert_id = popup_data.get("alert_id") or new_alert_id()
+                trace(alert_id, "emit")
+                self.trigger_popup.emit(
+                    popup_data["message"],
+                    popup_data["play_sound"],
+                    popup_data.get("solution"),
+                    alert_id,
+                )
+                self.popup_queue.task_done()
             except queue.Empty:
                 continue
             except Exception as e:
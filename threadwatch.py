@@ -0,0 +1,150 @@
+# threadwatch.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+import os
+import sys
+import time
+import socket
+import logging
+import traceback
+from PyQt6.QtCore import QObject, QTimer
+import metrics
+from notifications import notify
+from utils import send_email_async
+
+
+def format_thread_stack(ident):
+    """Return the current stack of the thread with ``ident``, or None if it has exited."""
+    frame = sys._current_frames().get(ident)
+    if frame is None:
+        return None
+    return "".join(traceback.format_stack(frame))
+
+
+def sd_notify(state):
+    """Send ``state`` to systemd when running under a Type=notify unit; no-op elsewhere."""
+    address = os.environ.get("NOTIFY_SOCKET")
+    if not address or not hasattr(socket, "AF_UNIX"):
+        return False
+    if address.startswith("@"):
+        address = "\0" + address[1:]
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.connect(address)
+            sock.sendall(state.encode())
+        return True
+    except OSError as e:
+        logging.error(f"sd_notify failed: {str(e)}")
+        return False
+
+
+class _Watched:
+    def __init__(self, name, factory, deadline, max_restarts):
+        self.name = name
+        self.factory = factory
+        self.deadline = deadline
+        self.max_restarts = max_restarts
+        self.worker = None
+        self.started_at = 0.0
+        self.restarts = []
+
+
+class Watchdog(QObject):
+    """
+    Restarts workers that stop sending heartbeats.
+
+    Checks run on a QTimer, so they share the GUI thread with the Qt signal
+    connections that replacement workers need. When a worker misses its
+    deadline its stack is logged, admins are notified, the worker is retired
+    and a fresh one from its factory is started. A hung thread cannot be
+    killed from Python; the retired one exits whenever it unblocks.
+
+    With ``systemd_notify`` the same timer pings the systemd watchdog, so a
+    hung GUI thread or a worker that keeps stalling gets the whole service
+    restarted by systemd instead.
+    """
+
+    def __init__(self, config, interval_ms=5000, systemd_notify=False):
+        super().__init__()
+        self.config = config
+        self.watched = {}
+        self.retired = []
+        self.systemd_notify = systemd_notify and sys.platform.startswith("linux")
+        self.healthy = True
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.check)
+        watchdog_usec = os.environ.get("WATCHDOG_USEC")
+        if self.systemd_notify and watchdog_usec:
+            # Ping at least twice per systemd watchdog period
+            interval_ms = min(interval_ms, int(watchdog_usec) // 2000)
+        self.timer.start(max(1000, interval_ms))
+        if self.systemd_notify:
+            sd_notify("READY=1")
+
+    def watch(self, name, factory, deadline, max_restarts=5):
+        """Start ``factory()`` and restart it whenever it goes ``deadline`` seconds without a heartbeat."""
+        entry = _Watched(name, factory, deadline, max_restarts)
+        self.watched[name] = entry
+        self._start(entry)
+        return entry.worker
+
+    def worker(self, name):
+        return self.watched[name].worker
+
+    def _start(self, entry):
+        entry.worker = entry.factory()
+        entry.started_at = time.monotonic()
+        entry.worker.start()
+
+    def _age(self, entry):
+        since_start = time.monotonic() - entry.started_at
+        age = metrics.heartbeat_age(entry.name)
+        return since_start if age is None else min(age, since_start)
+
+    def check(self):
+        self.retired = [worker for worker in self.retired if not worker.isFinished()]
+        for entry in self.watched.values():
+            if not entry.worker.running():
+                continue
+            if entry.worker.isFinished() or self._age(entry) > entry.deadline:
+                self._restart(entry)
+        if self.systemd_notify and self.healthy:
+            sd_notify("WATCHDOG=1")
+
+    def _restart(self, entry):
+        worker = entry.worker
+        if worker.isFinished():
+            reason = f"{entry.name} exited unexpectedly"
+            stack = None
+        else:
+            reason = f"{entry.name} missed its heartbeat for {self._age(entry):.0f}s (deadline {entry.deadline}s)"
+            stack = format_thread_stack(worker.thread_ident) if worker.thread_ident else None
+        logging.error(f"Watchdog: {reason}" + (f"\nStack:\n{stack}" if stack else ""))
+
+        now = time.monotonic()
+        entry.restarts = [t for t in entry.restarts if now - t < 3600] + [now]
+        if len(entry.restarts) > entry.max_restarts:
+            # Keep the stalled worker; stop pinging so systemd restarts the service
+            if self.healthy:
+                self.healthy = False
+                message = f"{reason}. Restarted {entry.max_restarts} times in the last hour; giving up."
+                notify(f"Watchdog: {message}", "watchdog")
+                send_email_async(self.config, "Hoogland Watchdog", message + (f"\n\n{stack}" if stack else ""))
+            return
+
+        worker.retire()
+        if not worker.isFinished():
+            self.retired.append(worker)
+        self._start(entry)
+        metrics.WATCHDOG_RESTARTS.labels(entry.name).inc()
+        notify(f"Watchdog restarted {entry.name}: {reason}", "watchdog")
+        send_email_async(
+            self.config,
+            "Hoogland Watchdog Restart",
+            f"{reason}. A new {entry.name} has been started." + (f"\n\nStack of the stalled thread:\n{stack}" if stack else ""),
+        )
+
+    def stop(self):
+        self.timer.stop()
+        if self.systemd_notify:
+            sd_notify("STOPPING=1")
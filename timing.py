@@ -0,0 +1,137 @@
+# timing.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+import metrics
+
+REQUEST_SECONDS = metrics.histogram(
+    "hoogland_http_request_seconds", "Time to serve a request, including streamed bodies.", ["endpoint", "method"]
+)
+REQUESTS_IN_FLIGHT = metrics.gauge("hoogland_http_requests_in_flight", "Requests currently being served.", ["endpoint"])
+
+_local = threading.local()
+
+
+@contextmanager
+def phase(name):
+    """
+    Charge the time spent in the block to ``name`` for the current request.
+
+    Outside a request this only costs a thread-local lookup, so it can wrap
+    code that also runs on the Qt and worker threads.
+    """
+    phases = getattr(_local, "phases", None)
+    if phases is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+
+
+def _render_started(sender, template, context, **extra):
+    if getattr(_local, "phases", None) is not None:
+        _local.render_started = time.perf_counter()
+
+
+def _render_finished(sender, template, context, **extra):
+    phases = getattr(_local, "phases", None)
+    started = getattr(_local, "render_started", None)
+    if phases is not None and started is not None:
+        phases["template_render"] = phases.get("template_render", 0.0) + time.perf_counter() - started
+        _local.render_started = None
+
+
+class _TimedBody:
+    """Response iterable that stops the clock when the server closes it."""
+
+    def __init__(self, body, finish):
+        self.body = body
+        self.finish = finish
+
+    def __iter__(self):
+        return iter(self.body)
+
+    def close(self):
+        try:
+            if hasattr(self.body, "close"):
+                self.body.close()
+        finally:
+            self.finish()
+
+
+class TimingMiddleware:
+    """
+    WSGI middleware recording per-endpoint latency and in-flight counts.
+
+    A request slower than ``slow_ms`` is logged as one JSON entry with the
+    time spent loading config, rendering templates and hashing. Streamed
+    responses are timed until the server closes the body.
+    """
+
+    def __init__(self, wsgi_app, slow_ms=500):
+        self.wsgi_app = wsgi_app
+        self.slow_ms = slow_ms
+
+    def __call__(self, environ, start_response):
+        start = time.perf_counter()
+        _local.phases = {}
+        _local.render_started = None
+        status = []
+
+        def timed_start_response(status_line, headers, exc_info=None):
+            status[:] = [status_line.split(" ", 1)[0]]
+            return start_response(status_line, headers, exc_info)
+
+        finished = []
+
+        def finish():
+            if finished:
+                return
+            finished.append(True)
+            elapsed = time.perf_counter() - start
+            phases = _local.phases or {}
+            _local.phases = None
+            endpoint = environ.get("hoogland.endpoint", "unmatched")
+            if "hoogland.endpoint" in environ:
+                REQUESTS_IN_FLIGHT.labels(endpoint).dec()
+            REQUEST_SECONDS.labels(endpoint, environ.get("REQUEST_METHOD", "")).observe(elapsed)
+            if elapsed * 1000 >= self.slow_ms:
+                entry = {
+                    "method": environ.get("REQUEST_METHOD"),
+                    "path": environ.get("PATH_INFO"),
+                    "endpoint": endpoint,
+                    "status": status[0] if status else None,
+                    "ms": round(elapsed * 1000, 1),
+                    "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in phases.items()},
+                }
+                logging.warning(f"Slow request: {json.dumps(entry)}")
+
+        try:
+            body = self.wsgi_app(environ, timed_start_response)
+        except Exception:
+            finish()
+            raise
+        return _TimedBody(body, finish)
+
+
+def install_request_timing(app, slow_ms=500):
+    """Wrap ``app.wsgi_app`` in TimingMiddleware and hook template rendering."""
+    from flask import request, before_render_template, template_rendered
+
+    @app.before_request
+    def _note_endpoint():
+        endpoint = request.endpoint or "unmatched"
+        request.environ["hoogland.endpoint"] = endpoint
+        REQUESTS_IN_FLIGHT.labels(endpoint).inc()
+
+    before_render_template.connect(_render_started, app)
+    template_rendered.connect(_render_finished, app)
+    app.wsgi_app = TimingMiddleware(app.wsgi_app, slow_ms)
+    return app
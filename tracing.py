@@ -0,0 +1,194 @@
+# tracing.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import datetime
+import threading
+from collections import deque
+from config import app_data_dir
+from logviewer import iter_lines_backwards
+from profiling import current_thread_name
+
+traces_path = os.path.join(app_data_dir, "alert_traces.log")
+
+# Expected order along the alert path; breaks ties between spans with equal timestamps
+SPAN_ORDER = (
+    "decision",
+    "manual_trigger",
+    "emit",
+    "slot_entry",
+    "coalesced",
+    "queued",
+    "dialog_created",
+    "dialog_visible",
+    "sound_started",
+    "acknowledged",
+    "escalation_queued",
+    "escalation_sent",
+    "escalation_failed",
+)
+
+
+def _span_key(entry):
+    return entry["a"], entry["s"], entry["t"], entry.get("th")
+
+
+def _format_micros(micros):
+    return datetime.datetime.fromtimestamp(micros / 1e6).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+
+class AlertTracer:
+    """
+    Compact JSON-lines trace of every step an alert takes.
+
+    Each span is one short line ``{"a": alert_id, "s": span, "t": micros,
+    "th": thread, ...}``. ``span()`` only enqueues; a writer thread appends
+    to the log and rolls it over to ``.1`` once it passes ``max_bytes``.
+    Spans stay in ``pending`` until they are written, so readers see them
+    without waiting for the writer.
+    """
+
+    def __init__(self, path=traces_path, max_bytes=2 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.pending = deque()
+        self.writer = threading.Thread(target=self._write_loop, name="TraceWriter", daemon=True)
+        self.writer.start()
+
+    def span(self, alert_id, name, duration=None, **attrs):
+        if not alert_id:
+            return
+        entry = {"a": alert_id, "s": name, "t": time.time_ns() // 1000, "th": current_thread_name()}
+        if duration is not None:
+            entry["d"] = round(duration * 1000, 3)
+        entry.update(attrs)
+        # Under the lock so pending stays in the order the writer drains the queue
+        with self.lock:
+            self.pending.append(entry)
+            self.queue.put(entry)
+
+    def _write_loop(self):
+        while True:
+            entry = self.queue.get()
+            if entry is None:
+                self.queue.task_done()
+                return
+            batch = [entry]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            lines = [json.dumps(e, separators=(",", ":")) + "\n" for e in batch if e is not None]
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.writelines(lines)
+                    size = f.tell()
+                if size > self.max_bytes:
+                    os.replace(self.path, self.path + ".1")
+            except Exception as e:
+                logging.error(f"Failed to write alert traces: {str(e)}")
+            with self.lock:
+                for _ in lines:
+                    self.pending.popleft()
+            for _ in batch:
+                self.queue.task_done()
+            if stop:
+                return
+
+    def close(self):
+        if self.writer.is_alive():
+            self.queue.put(None)
+            self.writer.join(timeout=5)
+
+    def _files(self):
+        return [p for p in (self.path, self.path + ".1") if os.path.exists(p)]
+
+    def _unwritten(self):
+        """Spans not yet written; taken before reading the files, so nothing falls between the two."""
+        with self.lock:
+            return list(self.pending)
+
+    def timeline(self, alert_id):
+        """Spans for ``alert_id`` in time order, each with its offset from the first in ms."""
+        unwritten = [dict(entry) for entry in self._unwritten() if entry["a"] == alert_id]
+        needle = f'"a":"{alert_id}"'
+        spans = []
+        for path in self._files():
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if needle in line:
+                        spans.append(json.loads(line))
+        # A span written while the files were read is in both
+        seen = {_span_key(span) for span in spans}
+        spans.extend(entry for entry in unwritten if _span_key(entry) not in seen)
+        spans.sort(key=lambda s: (s["t"], SPAN_ORDER.index(s["s"]) if s["s"] in SPAN_ORDER else len(SPAN_ORDER)))
+        if spans:
+            first = spans[0]["t"]
+            previous = first
+            for span in spans:
+                span["offset_ms"] = (span["t"] - first) / 1000
+                span["gap_ms"] = (span["t"] - previous) / 1000
+                span["time"] = _format_micros(span["t"])
+                previous = span["t"]
+        return spans
+
+    def recent_alerts(self, limit=50):
+        """Newest traced alert IDs with their span count and the time of their first span."""
+        unwritten = self._unwritten()
+        pending_keys = {_span_key(entry) for entry in unwritten}
+        alerts = {}
+
+        def count(entry):
+            if entry["a"] not in alerts and len(alerts) >= limit:
+                return
+            alerts.setdefault(entry["a"], {"alert_id": entry["a"], "spans": 0})
+            alerts[entry["a"]]["spans"] += 1
+            alerts[entry["a"]]["t"] = entry["t"]
+            if entry.get("message"):
+                alerts[entry["a"]]["message"] = entry["message"]
+
+        for entry in reversed(unwritten):
+            count(entry)
+        for path in self._files():
+            for _, line in iter_lines_backwards(path):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                # Written while the file was read; already counted from the unwritten spans
+                if _span_key(entry) not in pending_keys:
+                    count(entry)
+            if len(alerts) >= limit:
+                break
+        for alert in alerts.values():
+            alert["time"] = _format_micros(alert["t"])
+        return sorted(alerts.values(), key=lambda a: a["t"], reverse=True)
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = AlertTracer()
+            atexit.register(_tracer.close)
+        return _tracer
+
+
+def trace(alert_id, name, duration=None, **attrs):
+    try:
+        get_tracer().span(alert_id, name, duration, **attrs)
+    except Exception as e:
+        logging.error(f"Failed to trace '{name}' for alert {alert_id}: {str(e)}")
@@ -0,0 +1,667 @@
+# updater.py
+# Copyright (c) 2025 DJ Kruger
+# Licensed under the MIT License.
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import logging
+import random
+import threading
+import requests
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from config import app_data_dir
+from delta import DeltaError, apply_delta
+import metrics
+
+manifest_cache_path = os.path.join(app_data_dir, "update_manifest.json")
+installed_version_path = os.path.join(app_data_dir, "installed_version.json")
+# Verified update files by SHA-256, served to other stations when update_mirror_serve is on
+mirror_dir = os.path.join(app_data_dir, "update_mirror")
+
+# Version this build shipped with; later updates are recorded in installed_version.json
+APP_VERSION = "1.0.0"
+
+# Working area inside app_dir, so staged files are renamed into place on the same volume
+UPDATE_DIR_NAME = ".hoogland_update"
+CHUNK_SIZE = 64 * 1024
+DOWNLOAD_ATTEMPTS = 3
+# Longest Retry-After waited out inside a download; longer ones defer to the next check
+MAX_DOWNLOAD_WAIT = 30
+# Never trust a manifest max-age for longer than this
+MAX_MANIFEST_AGE = 24 * 3600
+
+
+class UpdateError(Exception):
+    """An update could not be downloaded, verified or installed; the install is unchanged."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def retry_after_seconds(response):
+    """Seconds a response's Retry-After header asks for, or None."""
+    value = response.headers.get("Retry-After", "").strip() if response is not None else ""
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def max_age_seconds(response):
+    """Freshness lifetime from Cache-Control, capped at MAX_MANIFEST_AGE; 0 if none."""
+    directives = {}
+    for part in response.headers.get("Cache-Control", "").split(","):
+        name, _, value = part.strip().partition("=")
+        directives[name.lower()] = value.strip('"')
+    if "no-store" in directives or "no-cache" in directives:
+        return 0
+    try:
+        return min(MAX_MANIFEST_AGE, max(0, int(directives.get("max-age", 0))))
+    except ValueError:
+        return 0
+
+
+def initial_check_delay(config, rng=random):
+    """Random wait before the first check so stations that boot together spread out."""
+    interval = max(60.0, float(config.get("update_check_interval_minutes", 60)) * 60)
+    jitter = min(100.0, max(0.0, float(config.get("update_check_jitter_percent", 20)))) / 100
+    return rng.uniform(0, interval * jitter)
+
+
+def next_check_delay(config, failures=0, retry_after=None, rng=random):
+    """
+    Seconds until the next update check.
+
+    Healthy checks run every ``update_check_interval_minutes`` give or take
+    ``update_check_jitter_percent``. After consecutive failures the wait
+    starts at ``update_retry_minutes`` and doubles up to
+    ``update_backoff_max_minutes``, picked at random from the upper half of
+    that window. A server's Retry-After is always honoured.
+    """
+    if failures:
+        base = float(config.get("update_retry_minutes", 5)) * 60
+        ceiling = min(
+            float(config.get("update_backoff_max_minutes", 360)) * 60,
+            base * 2 ** min(failures - 1, 16),
+        )
+        delay = rng.uniform(ceiling / 2, ceiling)
+    else:
+        interval = max(60.0, float(config.get("update_check_interval_minutes", 60)) * 60)
+        jitter = min(100.0, max(0.0, float(config.get("update_check_jitter_percent", 20)))) / 100
+        delay = interval * rng.uniform(1 - jitter, 1 + jitter)
+    if retry_after:
+        delay = max(delay, retry_after)
+    return delay
+
+
+_SEMVER = re.compile(
+    r"^v?(\d+)(?:\.(\d+))?(?:\.(\d+))?(?:-([0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?$"
+)
+
+
+def parse_version(version):
+    """
+    Sortable key for a semantic version such as ``1.2.10`` or ``v2.0.0-rc.1``.
+
+    Missing minor/patch numbers count as 0, build metadata is ignored and a
+    pre-release sorts before its release, with numeric identifiers compared
+    as numbers. Raises ValueError for anything else.
+    """
+    match = _SEMVER.match(str(version).strip())
+    if not match:
+        raise ValueError(f"Invalid version: {version!r}")
+    major, minor, patch, prerelease = match.groups()
+    core = (int(major), int(minor or 0), int(patch or 0))
+    if prerelease is None:
+        return core + ((1,),)
+    identifiers = tuple(
+        (0, int(part), "") if part.isdigit() else (1, 0, part) for part in prerelease.split(".")
+    )
+    return core + ((0,) + identifiers,)
+
+
+def is_newer(latest, current):
+    """True if ``latest`` is a strictly higher version than ``current``."""
+    try:
+        return parse_version(latest) > parse_version(current)
+    except ValueError as e:
+        logging.error(f"Cannot compare versions: {str(e)}")
+        return False
+
+
+def installed_version(executable_hash=None):
+    """
+    Version recorded by the last successful update, or APP_VERSION.
+
+    For frozen builds pass the running executable's hash: a record made for
+    a different executable (say, after a reinstall from the installer) is
+    ignored.
+    """
+    try:
+        with open(installed_version_path, "r") as f:
+            record = json.load(f)
+    except FileNotFoundError:
+        return APP_VERSION
+    except Exception as e:
+        logging.error(f"Failed to read installed version: {str(e)}")
+        return APP_VERSION
+    if executable_hash and record.get("executable_hash") and record["executable_hash"] != executable_hash:
+        return APP_VERSION
+    return record.get("version") or APP_VERSION
+
+
+def record_installed_version(version, executable_hash=None):
+    try:
+        temp_path = f"{installed_version_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"version": version, "executable_hash": executable_hash}, f)
+        os.replace(temp_path, installed_version_path)
+    except Exception as e:
+        logging.error(f"Failed to record installed version: {str(e)}")
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Shared keep-alive session for the manifest and every update download."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["User-Agent"] = "Hoogland-Updater"
+            _session = session
+        return _session
+
+
+class ManifestCache:
+    """
+    Last update manifest and its HTTP validators, persisted across restarts.
+
+    The stored ETag and Last-Modified are sent back as If-None-Match and
+    If-Modified-Since, so an unchanged feed answers with an empty 304 and
+    the cached manifest is reused.
+    """
+
+    def __init__(self, path=manifest_cache_path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entry = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                entry = json.load(f)
+            return entry if isinstance(entry, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logging.error(f"Failed to read update manifest cache: {str(e)}")
+            return {}
+
+    def validators(self, url):
+        with self.lock:
+            if self.entry.get("url") != url or "manifest" not in self.entry:
+                return {}
+            headers = {}
+            if self.entry.get("etag"):
+                headers["If-None-Match"] = self.entry["etag"]
+            if self.entry.get("last_modified"):
+                headers["If-Modified-Since"] = self.entry["last_modified"]
+            return headers
+
+    def manifest(self, url):
+        with self.lock:
+            if self.entry.get("url") != url:
+                return None
+            return self.entry.get("manifest")
+
+    def fresh(self, url):
+        """True while the server's Cache-Control max-age says the cached manifest is current."""
+        with self.lock:
+            if self.entry.get("url") != url or "manifest" not in self.entry:
+                return False
+            return time.time() < self.entry.get("fetched_at", 0) + self.entry.get("max_age", 0)
+
+    def store(self, url, manifest, response):
+        entry = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+            "max_age": max_age_seconds(response),
+            "manifest": manifest,
+        }
+        with self.lock:
+            self.entry = entry
+            try:
+                temp_path = f"{self.path}.tmp"
+                with open(temp_path, "w") as f:
+                    json.dump(entry, f, indent=4)
+                os.replace(temp_path, self.path)
+            except Exception as e:
+                logging.error(f"Failed to save update manifest cache: {str(e)}")
+
+    def touch(self, response):
+        with self.lock:
+            self.entry["fetched_at"] = time.time()
+            self.entry["max_age"] = max_age_seconds(response)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_manifest_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ManifestCache()
+        return _cache
+
+
+def fetch_manifest(url, timeout=5):
+    """
+    Return the update manifest at ``url``. A copy still fresh under the
+    server's max-age is used without a request; otherwise the cached copy
+    is revalidated. HTTP errors propagate, carrying any Retry-After.
+    """
+    cache = get_manifest_cache()
+    if cache.fresh(url):
+        metrics.UPDATE_MANIFEST_FETCHES.labels("cached").inc()
+        return cache.manifest(url)
+    response = get_session().get(url, headers=cache.validators(url), timeout=timeout)
+    if response.status_code == 304:
+        manifest = cache.manifest(url)
+        if manifest is not None:
+            cache.touch(response)
+            metrics.UPDATE_MANIFEST_FETCHES.labels("not_modified").inc()
+            logging.info("Update manifest not modified")
+            return manifest
+        # A 304 we have nothing for; ask again without validators
+        response = get_session().get(url, timeout=timeout)
+    response.raise_for_status()
+    manifest = response.json()
+    cache.store(url, manifest, response)
+    metrics.UPDATE_MANIFEST_FETCHES.labels("fresh").inc()
+    return manifest
+
+
+def update_paths(app_dir):
+    root = os.path.join(app_dir, UPDATE_DIR_NAME)
+    return {
+        "root": root,
+        "staging": os.path.join(root, "staging"),
+        "backup": os.path.join(root, "backup"),
+        "previous": os.path.join(root, "previous"),
+        "journal": os.path.join(root, "journal.json"),
+        "lock": os.path.join(root, "lock"),
+    }
+
+
+def _try_lock(f):
+    try:
+        if os.name == "nt":
+            import msvcrt
+
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(f):
+    if os.name == "nt":
+        import msvcrt
+
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def update_lock(app_dir, progress=None, poll=1.0):
+    """
+    Hold the exclusive lock on ``app_dir``'s update area for staging,
+    installing or recovering. A second checker, such as one the watchdog
+    started beside a slow one, waits here instead of rolling back or
+    deleting files the first is still using; ``progress`` is called while
+    it waits.
+    """
+    paths = update_paths(app_dir)
+    os.makedirs(paths["root"], exist_ok=True)
+    with open(paths["lock"], "a+b") as f:
+        waiting = False
+        while not _try_lock(f):
+            if not waiting:
+                logging.info("Another update is in progress; waiting for it to finish")
+                waiting = True
+            if progress:
+                progress()
+            time.sleep(poll)
+        try:
+            yield
+        finally:
+            _unlock(f)
+
+
+def _safe_relative_path(file_name):
+    """Reject manifest entries that would write outside app_dir."""
+    path = os.path.normpath(file_name)
+    if os.path.isabs(path) or path.startswith("..") or path.split(os.sep)[0] == UPDATE_DIR_NAME:
+        raise UpdateError(f"Refusing to install {file_name!r} outside the application directory")
+    return path
+
+
+def _hash_existing(path, digest):
+    """Feed a partial download back into ``digest``; return its length."""
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return size
+
+
+def mirror_file_url(mirror_url, file_hash):
+    return f"{mirror_url.rstrip('/')}/files/{file_hash}"
+
+
+def download_file(url, dest, expected_hash, timeout=5, attempts=DOWNLOAD_ATTEMPTS, mirror_url=None, progress=None):
+    """
+    Stream ``url`` to ``dest`` while hashing it; resume with a Range request
+    after a dropped connection. Returns the number of bytes transferred.
+
+    Data goes to ``dest + ".part"`` and is renamed to ``dest`` only once the
+    SHA-256 matches ``expected_hash``. A partial file left by an earlier
+    attempt, even from a previous update check, is picked up where it stopped.
+    With ``mirror_url`` the file is first asked for by hash from a station's
+    mirror on the LAN, falling back to ``url``. ``progress`` is called
+    after every chunk, so a caller can keep its heartbeat going.
+    """
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    if os.path.exists(dest):
+        digest = hashlib.sha256()
+        _hash_existing(dest, digest)
+        if digest.hexdigest() == expected_hash:
+            return 0
+        os.remove(dest)
+    if mirror_url:
+        try:
+            transferred = _download(
+                mirror_file_url(mirror_url, expected_hash), dest, expected_hash, timeout, 1, progress
+            )
+            metrics.UPDATE_MIRROR_FETCHES.labels("hit").inc()
+            return transferred
+        except UpdateError as e:
+            metrics.UPDATE_MIRROR_FETCHES.labels("miss").inc()
+            logging.info(f"Mirror could not serve {os.path.basename(dest)}, using the origin: {str(e)}")
+    return _download(url, dest, expected_hash, timeout, attempts, progress)
+
+
+def _download(url, dest, expected_hash, timeout, attempts, progress=None):
+    part_path = f"{dest}.part"
+    transferred = 0
+    for attempt in range(1, attempts + 1):
+        digest = hashlib.sha256()
+        offset = _hash_existing(part_path, digest) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            with get_session().get(url, headers=headers, stream=True, timeout=timeout) as response:
+                if response.status_code == 416:
+                    # The partial file is already complete (or bogus); start over
+                    os.remove(part_path)
+                    continue
+                response.raise_for_status()
+                resumed = response.status_code == 206 and response.headers.get(
+                    "Content-Range", ""
+                ).startswith(f"bytes {offset}-")
+                if not resumed:
+                    digest = hashlib.sha256()
+                with open(part_path, "ab" if resumed else "wb") as f:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
+                        digest.update(chunk)
+                        transferred += len(chunk)
+                        if progress:
+                            progress()
+            break
+        except requests.RequestException as e:
+            status = getattr(e.response, "status_code", None)
+            wait = retry_after_seconds(e.response)
+            if (
+                attempt == attempts
+                or (status is not None and status < 500 and status != 429)
+                or (wait is not None and wait > MAX_DOWNLOAD_WAIT)
+            ):
+                raise UpdateError(f"Failed to download {url}: {str(e)}", retry_after=wait)
+            logging.warning(f"Download of {os.path.basename(dest)} interrupted (attempt {attempt}): {str(e)}")
+            time.sleep(wait if wait is not None else 0.5 * attempt)
+    else:
+        raise UpdateError(f"Failed to download {url}: server rejected the resume range")
+
+    metrics.UPDATE_DOWNLOAD_BYTES.inc(transferred)
+    if digest.hexdigest() != expected_hash:
+        os.remove(part_path)
+        raise UpdateError(f"Hash mismatch for {os.path.basename(dest)}")
+    os.replace(part_path, dest)
+    return transferred
+
+
+def download_release(update_data, app_dir, workers=4, timeout=5, mirror_url=None, progress=None):
+    """
+    Download and verify every file in ``update_data["changes"]`` into a
+    staging directory, several at a time. Returns ``{file_name: staged_path}``;
+    raises UpdateError if any file fails, after the others have finished.
+    """
+    version = str(update_data.get("version"))
+    changes = update_data.get("changes", {})
+    hashes = update_data.get("hashes", {})
+    paths = update_paths(app_dir)
+    staging = os.path.join(paths["staging"], version)
+    # Partial downloads of other versions can never be resumed
+    if os.path.isdir(paths["staging"]):
+        for entry in os.listdir(paths["staging"]):
+            if entry != version:
+                shutil.rmtree(os.path.join(paths["staging"], entry), ignore_errors=True)
+
+    staged = {}
+    for file_name in changes:
+        if not hashes.get(file_name):
+            raise UpdateError(f"No hash published for {file_name}")
+        staged[file_name] = os.path.join(staging, _safe_relative_path(file_name))
+
+    errors = []
+    retry_after = None
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="UpdateDownload") as pool:
+        futures = {
+            pool.submit(
+                download_file, changes[name], staged[name], hashes[name], timeout,
+                mirror_url=mirror_url, progress=progress,
+            ): name
+            for name in changes
+        }
+        for future, name in futures.items():
+            try:
+                future.result()
+            except UpdateError as e:
+                errors.append(str(e))
+                if e.retry_after is not None:
+                    retry_after = max(retry_after or 0, e.retry_after)
+            except Exception as e:
+                errors.append(f"Failed to stage {name}: {str(e)}")
+    if errors:
+        raise UpdateError("; ".join(errors), retry_after=retry_after)
+    return staged
+
+
+def stage_executable(update_data, app_dir, exe_path, current_hash, timeout=5, mirror_url=None, progress=None):
+    """
+    Stage the new executable described by ``update_data["executable"]``.
+
+    If the manifest has a delta keyed by ``current_hash`` it is downloaded
+    and applied to ``exe_path``; any failure there falls back to the full
+    build. Returns ``(file_name, staged_path)`` for ``install_staged``, or
+    None when ``current_hash`` already is the published build.
+    """
+    executable = update_data["executable"]
+    if current_hash and current_hash == executable.get("hash"):
+        return None
+    version = str(update_data.get("version"))
+    file_name = executable.get("name") or os.path.basename(exe_path)
+    dest = os.path.join(update_paths(app_dir)["staging"], version, _safe_relative_path(file_name))
+    delta = executable.get("deltas", {}).get(current_hash) if current_hash else None
+    if delta and not os.path.exists(dest):
+        delta_path, patched_path = f"{dest}.delta", f"{dest}.patched"
+        try:
+            download_file(delta["url"], delta_path, delta["hash"], timeout, mirror_url=mirror_url, progress=progress)
+            if apply_delta(exe_path, delta_path, patched_path, progress) != executable["hash"]:
+                raise DeltaError("Patched executable does not match the published hash")
+            os.replace(patched_path, dest)
+            metrics.UPDATE_DELTAS.labels("applied").inc()
+            logging.info(f"Patched {file_name} to {version} from a {delta.get('size', '?')} byte delta")
+            return file_name, dest
+        except (UpdateError, DeltaError, OSError) as e:
+            metrics.UPDATE_DELTAS.labels("fallback").inc()
+            logging.warning(f"Delta update of {file_name} failed, downloading the full build: {str(e)}")
+        finally:
+            for path in (delta_path, patched_path):
+                if os.path.exists(path):
+                    os.remove(path)
+    download_file(executable["url"], dest, executable["hash"], timeout, mirror_url=mirror_url, progress=progress)
+    return file_name, dest
+
+
+def publish_to_mirror(update_data, staged):
+    """
+    Copy verified staged files into ``mirror_dir`` under their SHA-256 so
+    other stations can fetch them over the LAN, and drop older releases.
+    """
+    hashes = dict(update_data.get("hashes", {}))
+    executable = update_data.get("executable")
+    if executable:
+        hashes[executable.get("name")] = executable.get("hash")
+    os.makedirs(mirror_dir, exist_ok=True)
+    keep = set()
+    for file_name, staged_path in staged.items():
+        file_hash = hashes.get(file_name)
+        if not file_hash:
+            continue
+        keep.add(file_hash)
+        target = os.path.join(mirror_dir, file_hash)
+        if os.path.exists(target):
+            continue
+        try:
+            shutil.copyfile(staged_path, f"{target}.tmp")
+            os.replace(f"{target}.tmp", target)
+        except Exception as e:
+            logging.error(f"Failed to publish {file_name} to the update mirror: {str(e)}")
+    for entry in os.listdir(mirror_dir):
+        if entry not in keep:
+            try:
+                os.remove(os.path.join(mirror_dir, entry))
+            except OSError:
+                pass
+
+
+def _write_journal(path, journal):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(journal, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def _roll_back(app_dir, journal):
+    paths = update_paths(app_dir)
+    for file_name, existed in reversed(list(journal["files"].items())):
+        target = os.path.join(app_dir, file_name)
+        backup = os.path.join(paths["backup"], file_name)
+        try:
+            if os.path.exists(backup):
+                os.replace(backup, target)
+            elif not existed and os.path.exists(target):
+                os.remove(target)
+        except Exception as e:
+            logging.error(f"Failed to roll back {file_name}: {str(e)}")
+    os.remove(paths["journal"])
+
+
+def install_staged(staged, app_dir, version, progress=None):
+    """
+    Swap verified files from staging into ``app_dir``.
+
+    Each replaced file is first moved into a backup directory and a journal
+    records the plan, so a failure part-way, or a crash picked up later by
+    ``recover_interrupted_update``, puts every file back as it was. After a
+    clean install the backups are kept as ``previous``.
+    """
+    paths = update_paths(app_dir)
+    shutil.rmtree(paths["backup"], ignore_errors=True)
+    os.makedirs(paths["backup"], exist_ok=True)
+    journal = {
+        "version": version,
+        "files": {name: os.path.exists(os.path.join(app_dir, name)) for name in staged},
+    }
+    _write_journal(paths["journal"], journal)
+    try:
+        for file_name, staged_path in staged.items():
+            target = os.path.join(app_dir, file_name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if journal["files"][file_name]:
+                backup = os.path.join(paths["backup"], file_name)
+                os.makedirs(os.path.dirname(backup), exist_ok=True)
+                os.replace(target, backup)
+            os.replace(staged_path, target)
+            if progress:
+                progress()
+    except Exception as e:
+        logging.error(f"Installing update {version} failed, rolling back: {str(e)}")
+        _roll_back(app_dir, journal)
+        raise UpdateError(f"Failed to install update {version}: {str(e)}")
+
+    os.remove(paths["journal"])
+    shutil.rmtree(paths["previous"], ignore_errors=True)
+    os.replace(paths["backup"], paths["previous"])
+    shutil.rmtree(os.path.join(paths["staging"], str(version)), ignore_errors=True)
+    logging.info(f"Installed update {version}: {', '.join(staged)}")
+
+
+def recover_interrupted_update(app_dir):
+    """Roll back an install that was cut off mid-swap; returns True if one was found."""
+    paths = update_paths(app_dir)
+    try:
+        with open(paths["journal"], "r") as f:
+            journal = json.load(f)
+    except FileNotFoundError:
+        return False
+    except Exception as e:
+        logging.error(f"Unreadable update journal, leaving files as they are: {str(e)}")
+        return False
+    logging.warning(f"Rolling back interrupted update to {journal.get('version')}")
+    _roll_back(app_dir, journal)
+    return True
@@ -1,11 +1,18 @@
 # utils.py
 import os
 import sys
-import hashlib
+import queue
 import smtplib
+import threading
+import time
+from contextlib import contextmanager
 from email.mime.text import MIMEText
 import logging
 from config import load_config, cipher
+import metrics
+from timing import phase
+from tracing import trace
+from integrity import get_hash_cache
 
 
 def resource_path(relative_path):
@@ -14,24 +21,155 @@ def resource_path(relative_path):
     return os.path.join(os.path.abspath("."), relative_path)
 
 
+def _build_message(config, subject, message):
+    msg = MIMEText(message)
+    msg["Subject"] = subject
+    msg["From"] = config["sender_email"]
+    msg["To"] = config["recipient_email"]
+    return msg.as_string()
+
+
+@contextmanager
+def smtp_session(config):
+    """Open, secure and log in to the configured SMTP server for one or more sends."""
+    # Without a timeout a dead SMTP server blocks the caller forever
+    with smtplib.SMTP(config["smtp_server"], config["smtp_port"], timeout=30) as server:
+        server.starttls()
+        server.login(
+            config["sender_email"],
+            cipher.decrypt(config["password"].encode()).decode(),
+        )
+        yield server
+
+
 def send_email(config, subject, message):
+    start = time.perf_counter()
     try:
-        msg = MIMEText(message)
-        msg["Subject"] = subject
-        msg["From"] = config["sender_email"]
-        msg["To"] = config["recipient_email"]
-        with smtplib.SMTP(config["smtp_server"], config["smtp_port"]) as server:
-            server.starttls()
-            server.login(
-                config["sender_email"],
-                cipher.decrypt(config["password"].encode()).decode(),
-            )
+        with smtp_session(config) as server:
             server.sendmail(
-                config["sender_email"], config["recipient_email"], msg.as_string()
+                config["sender_email"],
+                config["recipient_email"],
+                _build_message(config, subject, message),
             )
+        metrics.EMAIL_SEND_SECONDS.observe(time.perf_counter() - start)
         logging.info(f"Email sent: {subject}")
+        return True
     except Exception as e:
+        metrics.SMTP_FAILURES.inc()
         logging.error(f"Failed to send email: {str(e)}")
+        return False
+
+
+# Fresh connections send_batch may open in a row without getting a message through
+SMTP_RECONNECT_ATTEMPTS = 3
+
+
+def send_batch(config, messages):
+    """
+    Send (subject, message) pairs over a single SMTP connection.
+
+    Returns one bool per message. A message the server rejects is skipped.
+    If the connection drops, a new one is opened and the batch carries on
+    from the message that was in flight; the rest are failed only when
+    the server cannot be reached or SMTP_RECONNECT_ATTEMPTS connections
+    in a row drop before sending anything.
+    """
+    results = []
+    stalled = 0
+    while len(results) < len(messages):
+        sent_before = len(results)
+        connected = False
+        try:
+            with smtp_session(config) as server:
+                connected = True
+                for subject, message in messages[len(results):]:
+                    start = time.perf_counter()
+                    try:
+                        server.sendmail(
+                            config["sender_email"],
+                            config["recipient_email"],
+                            _build_message(config, subject, message),
+                        )
+                    except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused) as e:
+                        metrics.SMTP_FAILURES.inc()
+                        logging.error(f"Failed to send email '{subject}': {str(e)}")
+                        results.append(False)
+                        continue
+                    metrics.EMAIL_SEND_SECONDS.observe(time.perf_counter() - start)
+                    logging.info(f"Email sent: {subject}")
+                    results.append(True)
+        except Exception as e:
+            # A lost connection is worth reopening; SMTP errors and failing to connect at all are not
+            dropped = isinstance(e, smtplib.SMTPServerDisconnected) or (
+                isinstance(e, OSError) and not isinstance(e, smtplib.SMTPException)
+            )
+            stalled = 0 if len(results) > sent_before else stalled + 1
+            if not (connected and dropped) or stalled > SMTP_RECONNECT_ATTEMPTS:
+                logging.error(f"Failed to send email batch: {str(e)}")
+                break
+            logging.warning(
+                f"SMTP connection lost after {len(results)} of {len(messages)} emails, reconnecting: {str(e)}"
+            )
+    failed = len(messages) - len(results)
+    if failed:
+        metrics.SMTP_FAILURES.inc(failed)
+    return results + [False] * failed
+
+
+_email_queue = queue.Queue()
+metrics.EMAIL_QUEUE_DEPTH.set_function(_email_queue.qsize)
+_email_worker = None
+_email_worker_lock = threading.Lock()
+# Upper bound on emails sent over one connection by the background worker
+EMAIL_BATCH_SIZE = 20
+EMAIL_IDLE_BEAT_SECONDS = 30
+
+
+def _email_worker_loop():
+    while True:
+        metrics.heartbeat("EmailWorker")
+        # Wake up now and then so an idle worker still shows a fresh heartbeat
+        try:
+            batch = [_email_queue.get(timeout=EMAIL_IDLE_BEAT_SECONDS)]
+        except queue.Empty:
+            continue
+        # Whatever queued up while the last batch was sending goes out together
+        while len(batch) < EMAIL_BATCH_SIZE:
+            try:
+                batch.append(_email_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            start = time.perf_counter()
+            groups = {}
+            for config, subject, message, alert_id in batch:
+                key = tuple(config.get(k) for k in ("smtp_server", "smtp_port", "sender_email", "recipient_email"))
+                groups.setdefault(key, (config, []))[1].append((subject, message, alert_id))
+            for config, items in groups.values():
+                if len(items) == 1:
+                    results = [send_email(config, items[0][0], items[0][1])]
+                else:
+                    results = send_batch(config, [(subject, message) for subject, message, _ in items])
+                for (_, _, alert_id), sent in zip(items, results):
+                    trace(alert_id, "escalation_sent" if sent else "escalation_failed", time.perf_counter() - start)
+        except Exception as e:
+            logging.error(f"Email worker failed: {str(e)}")
+        finally:
+            for _ in batch:
+                _email_queue.task_done()
+
+
+def send_email_async(config, subject, message, alert_id=None):
+    """Queue an email for a background sender so the caller never waits on SMTP."""
+    global _email_worker
+    with _email_worker_lock:
+        if _email_worker is None or not _email_worker.is_alive():
+            _email_worker = threading.Thread(
+                target=_email_worker_loop, name="EmailWorker", daemon=True
+            )
+            _email_worker.start()
+    trace(alert_id, "escalation_queued", subject=subject, depth=_email_queue.qsize())
+    _email_queue.put((config, subject, message, alert_id))
 
 
 def send_credentials_email(to_email, username, password, role, smtp_config):
@@ -49,7 +187,7 @@ Access the web GUI at http://localhost:5000 to manage settings.
     msg["Subject"] = "Your Hoogland Credentials"
     msg["From"] = smtp_config["sender_email"]
     msg["To"] = to_email
-    with smtplib.SMTP(smtp_config["smtp_server"], smtp_config["smtp_port"]) as server:
+    with smtplib.SMTP(smtp_config["smtp_server"], smtp_config["smtp_port"], timeout=30) as server:
         server.starttls()
         server.login(smtp_config["sender_email"], smtp_config["password"])
         server.sendmail(smtp_config["sender_email"], to_email, msg.as_string())
@@ -59,8 +197,9 @@ def calculate_executable_hash():
     if getattr(sys, "frozen", False):
         exe_path = sys.executable
         try:
-            with open(exe_path, "rb") as f:
-                return hashlib.sha256(f.read()).hexdigest()
+            # Chunked, and skipped entirely while size/mtime/inode are unchanged
+            with phase("hashing"):
+                return get_hash_cache().hash(exe_path)
         except Exception as e:
             logging.error(f"Hash calculation failed: {str(e)}")
             send_email(
@@ -78,10 +217,16 @@ def cleanup(qt_app=None, stop_event=None):
     from pygame import mixer
 
     mixer.music.stop()
+    from events import get_event_store
+
+    get_event_store().close()
     send_email(
         config, "Program Stopped", "Program stopped due to user request or exception."
     )
     if qt_app:
         qt_app.quit()
     logging.info("Cleanup completed")
+    from logsetup import shutdown_logging
+
+    shutdown_logging()
     sys.exit(0)